@@ -1,5 +1,5 @@
 
-"""
+'''
 $ brownie console --network arbitrum-main
 >>> import json
 >>> ERC20_ABI = json.loads("""[paste the ABI here]""")
@@ -32,10 +32,12 @@ event Transfer(address indexed _from, address indexed _to, uint256 _value)
 event Approval(address indexed _owner, address indexed _spender, uint256 _value)
 
 
-See ERC-20 Standard ABI below:
-"""
+See ERC-20 Standard ABI below (importable as ERC20):
+'''
 
+import json
 
+ERC20 = json.loads("""
 [
     {
         "constant": true,
@@ -257,4 +259,5 @@ See ERC-20 Standard ABI below:
         "name": "Transfer",
         "type": "event"
     }
-]
\ No newline at end of file
+]
+""")
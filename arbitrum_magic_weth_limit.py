@@ -1,10 +1,13 @@
 import sys, time, os
 from decimal import Decimal
 from fractions import Fraction
-from brownie import accounts, network
+from brownie import Contract, accounts, network
 from degenbot import *
 from dotenv import dotenv_values
 
+from abis_unverified_contracts import ERC20
+from nonce_manager import NonceManager
+
 # Contract addresses (verify on Arbiscan)
 SUSHISWAP_ROUTER_CONTRACT_ADDRESS = "0x1b02da8cb0d097eb8d57a175b88c7d8b47997506"
 SUSHISWAP_POOL_CONTRACT_ADDRESS = "0xB7E50106A5bd3Cf21AF210A755F9C8740890A8c9"
@@ -83,12 +86,26 @@ def main():
         sushiswap_router,
     ]
 
+    # nonces are tracked locally, so the approvals are sent back-to-back without waiting for receipts
+    nonce_manager = NonceManager(degenbot)
+
     # Confirm approvals for all tokens on every router
     print()
     print("Approvals:")
+    approvals = []
     for router in routers:
         for token in tokens:
             if not token.get_approval(external_address=router.address) and not DRY_RUN:
-                token.set_approval(external_address=router.address, value=-1)
+                approvals.append(
+                    nonce_manager.transact(
+                        Contract.from_abi(name="", address=token.address, abi=ERC20).approve,
+                        router.address,
+                        2 ** 256 - 1,
+                    )
+                )
             else:
-                print(f"{token} on {router} OK")
\ No newline at end of file
+                print(f"{token} on {router} OK")
+
+    # every approval is in flight at once, wait for all of them together
+    for tx in nonce_manager.wait(approvals):
+        print(f"Approval reverted: {tx.txid}")
\ No newline at end of file
@@ -0,0 +1,295 @@
+"""
+Backtester (SPELL/sSPELL strategy replayed over recorded history)
+
+- DRY_RUN in the bots only skips the transaction, it says nothing about how a threshold would have performed
+- run_backtest() replays recorded reserves (sync_history.py) and a staking rate history through the same trigger
+  as pool_reserves/avalanche_sspell_spell.py: get_tokens_in_for_ratio_out() sizing capped by the balance,
+  get_tokens_out_for_tokens_in() quote, amountOutMin = quote * (1 - SLIPPAGE)
+- only blocks with a Sync or a staking rate change can trigger, and a vectorized float screen picks the
+  candidate blocks where the pool is past a threshold, exact integer math only runs on those
+- fills land latency_blocks later, against the reserves recorded at that block: below amountOutMin the swap
+  reverts and only the gas is spent
+- a fill is applied to a local copy of the pool, which stands until the next recorded Sync
+  (the recorded history does not contain our own trades)
+
+Staking rate history is a CSV of "block,rate" rows, block being the Avalanche block the rate took effect.
+
+Usage:
+
+$ python3 backtester.py rate_history.csv
+
+>>> result = run_backtest(history.pool_records(POOL), rate_blocks, rates, threshold_spell_to_sspell=Decimal("0.01"))
+>>> result["pnl"], result["fills"], result["gas"]
+"""
+
+import sys
+from decimal import Decimal
+from fractions import Fraction
+
+import numpy as np
+
+from pool_math import DEFAULT_FEE, get_amount_out, get_tokens_in_for_ratio_out, get_tokens_out_for_tokens_in
+from sync_history import SyncHistory, reserve_float, reserve_int
+
+POOL = "0x033C3Fc1fC13F803A233D262e24d1ec3fd4EFB48"
+
+# same defaults as pool_reserves/avalanche_sspell_spell.py
+THRESHOLD_SPELL_TO_SSPELL = Decimal("0.02")
+THRESHOLD_SSPELL_TO_SPELL = Decimal("0.05")
+SLIPPAGE = Decimal("0.001")
+
+# starting balances (18 decimals)
+SPELL_BALANCE = 100_000 * 10 ** 18
+SSPELL_BALANCE = 0
+
+# blocks between seeing an opportunity and the swap landing
+LATENCY_BLOCKS = 1
+
+# gas used by swapExactTokensForTokens, and the price paid per gas (base fee + 5 gwei priority), in wei
+GAS_PER_SWAP = 150_000
+GAS_PRICE = 30 * 10 ** 9
+
+# relative tolerance of the float screen, so no trade the exact math would take is screened out
+SCREEN_TOLERANCE = 1e-9
+
+
+def load_rate_history(filename: str):
+    """
+    Returns (blocks, rates) arrays from a "block,rate" CSV, sorted by block
+    """
+    data = np.loadtxt(filename, delimiter=",", skiprows=1, ndmin=2)
+    order = np.argsort(data[:, 0], kind="stable")
+    return data[order, 0].astype(np.int64), data[order, 1]
+
+
+def build_events(records: np.ndarray, rate_blocks: np.ndarray, rates: np.ndarray):
+    """
+    Every block where the pool or the staking rate changed, with the index of the pool's last record
+    at that block and the staking rate in effect.
+    """
+    if not len(records) or not len(rate_blocks):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+
+    record_blocks = records["block"].astype(np.int64)
+    blocks = np.union1d(record_blocks, rate_blocks)
+    # nothing to trade before the first recorded reserves or the first known rate
+    blocks = blocks[(blocks >= record_blocks[0]) & (blocks >= rate_blocks[0])]
+
+    record_index = np.searchsorted(record_blocks, blocks, side="right") - 1
+    rate_index = np.searchsorted(rate_blocks, blocks, side="right") - 1
+    return blocks, record_index, rates[rate_index]
+
+
+def prepare_events(records: np.ndarray, rate_blocks: np.ndarray, rates: np.ndarray):
+    """
+    The parameter-independent part of a backtest: events, plus the float reserves at every event for screen().
+    Pass the result as run_backtest(events=...) when running many parameter sets over the same history.
+    """
+    blocks, record_index, event_rates = build_events(records, rate_blocks, rates)
+    return (
+        blocks,
+        record_index,
+        event_rates,
+        reserve_float(records, 0)[record_index],
+        reserve_float(records, 1)[record_index],
+    )
+
+
+def screen(
+    reserve0: np.ndarray,
+    reserve1: np.ndarray,
+    event_rates: np.ndarray,
+    threshold_spell_to_sspell,
+    threshold_sspell_to_spell,
+    fee=DEFAULT_FEE,
+):
+    """
+    Float pre-check of both triggers for every event, returns (buy_sspell, sell_sspell) boolean arrays.
+
+    token0 (x) is sSPELL, token1 (y) is SPELL, C = 1 / (rate * (1 + threshold)):
+        SPELL -> sSPELL trades when x0/C - y0/(1 - fee) > 0, i.e. x0 * rate * (1 + threshold) * (1 - fee) > y0
+        sSPELL -> SPELL trades when y0*C - x0/(1 - fee) > 0, i.e. y0 * (1 - fee) > x0 * rate * (1 + threshold)
+    """
+    fee_multiplier = 1 - float(fee)
+    buy_sspell = (
+        reserve0 * event_rates * (1 + float(threshold_spell_to_sspell)) * fee_multiplier
+        > reserve1 * (1 - SCREEN_TOLERANCE)
+    )
+    sell_sspell = (
+        reserve1 * fee_multiplier
+        > reserve0 * event_rates * (1 + float(threshold_sspell_to_spell)) * (1 - SCREEN_TOLERANCE)
+    )
+    return buy_sspell, sell_sspell
+
+
+def run_backtest(
+    records: np.ndarray,
+    rate_blocks: np.ndarray,
+    rates: np.ndarray,
+    threshold_spell_to_sspell=THRESHOLD_SPELL_TO_SSPELL,
+    threshold_sspell_to_spell=THRESHOLD_SSPELL_TO_SPELL,
+    slippage=SLIPPAGE,
+    spell_balance: int = SPELL_BALANCE,
+    sspell_balance: int = SSPELL_BALANCE,
+    latency_blocks: int = LATENCY_BLOCKS,
+    gas_per_swap: int = GAS_PER_SWAP,
+    gas_price: int = GAS_PRICE,
+    fee: Fraction = DEFAULT_FEE,
+    keep_trades: bool = True,
+    events=None,
+) -> dict:
+    """
+    Replay the records of ONE pool (in chain order) through the SPELL/sSPELL trigger.
+    PnL is in SPELL (sSPELL valued at the last staking rate), against simply holding the starting balances.
+    Gas is in wei of AVAX.
+    """
+    if events is None:
+        events = prepare_events(records, rate_blocks, rates)
+    blocks, record_index, event_rates, event_reserve0, event_reserve1 = events
+    record_blocks = records["block"].astype(np.int64)
+
+    buy_sspell, sell_sspell = screen(
+        event_reserve0,
+        event_reserve1,
+        event_rates,
+        threshold_spell_to_sspell,
+        threshold_sspell_to_spell,
+        fee,
+    )
+
+    start_spell, start_sspell = spell_balance, sspell_balance
+    # accept floats from a parameter grid, the bot's math uses Decimals
+    threshold_spell_to_sspell = Decimal(str(threshold_spell_to_sspell))
+    threshold_sspell_to_spell = Decimal(str(threshold_sspell_to_spell))
+    slippage = Fraction(Decimal(str(slippage)))
+    fills = reverts = 0
+    trades = []
+    # (record index, reserve0, reserve1) of the local pool after our last fill
+    local_pool = None
+
+    def get_reserves(index: int):
+        if local_pool is not None and local_pool[0] == index:
+            return local_pool[1], local_pool[2]
+        return reserve_int(records[index], 0), reserve_int(records[index], 1)
+
+    def fill(block: int, amount_in: int, quote: int, token0_in: bool):
+        """
+        Execute at the reserves recorded latency_blocks later, returns the amount out or None on a revert
+        """
+        nonlocal local_pool
+        fill_index = int(np.searchsorted(record_blocks, block + latency_blocks, side="right")) - 1
+        reserve0, reserve1 = get_reserves(fill_index)
+
+        if token0_in:
+            amount_out = get_amount_out(amount_in, reserve0, reserve1, fee)
+        else:
+            amount_out = get_amount_out(amount_in, reserve1, reserve0, fee)
+        if amount_out < int(quote * (1 - slippage)):
+            return None
+
+        if token0_in:
+            local_pool = (fill_index, reserve0 + amount_in, reserve1 - amount_out)
+        else:
+            local_pool = (fill_index, reserve0 - amount_out, reserve1 + amount_in)
+        return amount_out
+
+    for event in np.flatnonzero(buy_sspell | sell_sspell):
+        # past a threshold, but nothing to sell in that direction
+        if not ((buy_sspell[event] and spell_balance) or (sell_sspell[event] and sspell_balance)):
+            continue
+
+        block = int(blocks[event])
+        # the bot compares against Decimal(str(rate))
+        rate = Decimal(str(event_rates[event]))
+        x0, y0 = get_reserves(int(record_index[event]))
+
+        # SPELL -> sSPELL
+        if buy_sspell[event] and spell_balance:
+            if spell_in := get_tokens_in_for_ratio_out(
+                pool_reserves_token0=x0,
+                pool_reserves_token1=y0,
+                token0_out=True,
+                token0_per_token1=1 / (rate * (1 + threshold_spell_to_sspell)),
+                fee=fee,
+            ):
+                spell_in = min(spell_in, spell_balance)
+                sspell_out = get_tokens_out_for_tokens_in(
+                    pool_reserves_token0=x0,
+                    pool_reserves_token1=y0,
+                    quantity_token1_in=spell_in,
+                    fee=fee,
+                )
+                if (amount_out := fill(block, spell_in, sspell_out, token0_in=False)) is None:
+                    reverts += 1
+                else:
+                    fills += 1
+                    spell_balance -= spell_in
+                    sspell_balance += amount_out
+                    if keep_trades:
+                        trades.append((block, "SPELL -> sSPELL", spell_in, amount_out))
+
+        # sSPELL -> SPELL
+        if sell_sspell[event] and sspell_balance:
+            if sspell_in := get_tokens_in_for_ratio_out(
+                pool_reserves_token0=x0,
+                pool_reserves_token1=y0,
+                token1_out=True,
+                token0_per_token1=1 / (rate * (1 + threshold_sspell_to_spell)),
+                fee=fee,
+            ):
+                sspell_in = min(sspell_in, sspell_balance)
+                spell_out = get_tokens_out_for_tokens_in(
+                    pool_reserves_token0=x0,
+                    pool_reserves_token1=y0,
+                    quantity_token0_in=sspell_in,
+                    fee=fee,
+                )
+                if (amount_out := fill(block, sspell_in, spell_out, token0_in=True)) is None:
+                    reverts += 1
+                else:
+                    fills += 1
+                    sspell_balance -= sspell_in
+                    spell_balance += amount_out
+                    if keep_trades:
+                        trades.append((block, "sSPELL -> SPELL", sspell_in, amount_out))
+
+    final_rate = Fraction(Decimal(str(rates[-1])))
+    pnl = (spell_balance + sspell_balance * final_rate) - (start_spell + start_sspell * final_rate)
+
+    return {
+        "blocks": int(blocks[-1] - blocks[0]) + 1 if len(blocks) else 0,
+        "events": len(blocks),
+        "candidates": int(np.count_nonzero(buy_sspell | sell_sspell)),
+        "fills": fills,
+        "reverts": reverts,
+        "gas": (fills + reverts) * gas_per_swap * gas_price,
+        "pnl": int(pnl),
+        "spell_balance": spell_balance,
+        "sspell_balance": sspell_balance,
+        "trades": trades,
+    }
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python3 backtester.py rate_history.csv (rows of block,rate)")
+
+    history = SyncHistory()
+    if POOL.lower() not in history.pools:
+        sys.exit(f"No recorded history for {POOL}, run `python3 sync_history.py` first")
+
+    records = history.pool_records(POOL)
+    rate_blocks, rates = load_rate_history(sys.argv[1])
+    result = run_backtest(records, rate_blocks, rates)
+
+    print(f"Replayed {result['blocks']} blocks ({result['events']} pool / rate changes)")
+    for block, direction, amount_in, amount_out in result["trades"]:
+        print(f"• block {block}: {direction} {amount_in / 10 ** 18:.2f} in, {amount_out / 10 ** 18:.2f} out")
+    print(f"Fills: {result['fills']}, reverts: {result['reverts']}")
+    print(f"Gas: {result['gas'] / 10 ** 18:.4f} AVAX")
+    print(f"PnL: {result['pnl'] / 10 ** 18:.2f} SPELL")
+
+
+# Only executes main loop if this file is called directly
+if __name__ == "__main__":
+    main()
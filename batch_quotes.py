@@ -0,0 +1,99 @@
+"""
+Vectorized Quotes (many pools x many trade sizes)
+
+- get_tokens_out_for_tokens_in() quotes one pool at one size, one Python call at a time
+- quote_matrix() takes the reserves of many pools (one row per pool) and many candidate input sizes,
+  and returns the full output matrix in a single NumPy pass
+- pool reserves are uint112, which do not fit any native NumPy integer dtype, so the matrix is float64
+- float64 is only used for SCREENING: scan() keeps the few (pool, size) candidates that clear the threshold,
+  then confirms each one with the exact integer math in pool_math.py before anything is returned
+
+Usage:
+
+>>> reserves_in = [pool.reserve1 for pool in pools]
+>>> reserves_out = [pool.reserve0 for pool in pools]
+>>> sizes = [n * 10 ** 18 for n in (1_000, 10_000, 100_000, 1_000_000)]
+>>> for pool_index, size_index, amount_in, amount_out in scan(reserves_in, reserves_out, sizes, min_out_per_in):
+...     print(pools[pool_index], amount_in, amount_out)
+"""
+
+from fractions import Fraction
+
+import numpy as np
+
+from pool_math import DEFAULT_FEE, get_amount_out
+
+# float64 has ~16 significant digits, so anything this close to the threshold is re-checked exactly
+SCREEN_TOLERANCE = 1e-9
+
+
+def to_float_array(values) -> np.ndarray:
+    """
+    Convert Python ints (which may be larger than uint64) to a float64 array
+    """
+    return np.fromiter((float(value) for value in values), dtype=np.float64, count=len(values))
+
+
+def quote_matrix(
+    reserves_in,
+    reserves_out,
+    amounts_in,
+    fee: Fraction = DEFAULT_FEE,
+) -> np.ndarray:
+    """
+    Approximate getAmountOut for every pool (rows) and every input size (columns).
+    Returns a float64 array of shape (len(reserves_in), len(amounts_in)).
+    """
+    fee = Fraction(fee)
+    fee_multiplier = float(fee.denominator - fee.numerator) / fee.denominator
+
+    reserves_in = to_float_array(reserves_in)[:, np.newaxis]
+    reserves_out = to_float_array(reserves_out)[:, np.newaxis]
+    amounts_in_with_fee = to_float_array(amounts_in)[np.newaxis, :] * fee_multiplier
+
+    return amounts_in_with_fee * reserves_out / (reserves_in + amounts_in_with_fee)
+
+
+def scan(
+    reserves_in,
+    reserves_out,
+    amounts_in,
+    min_out_per_in,
+    fee: Fraction = DEFAULT_FEE,
+):
+    """
+    Find every (pool, size) whose output is at least min_out_per_in * amount_in.
+    min_out_per_in is either one ratio for all pools or one ratio per pool.
+
+    Returns a list of (pool_index, size_index, amount_in, amount_out) tuples,
+    where amount_out is the exact getAmountOut result.
+    """
+    if not len(reserves_in):
+        return []
+
+    quotes = quote_matrix(reserves_in, reserves_out, amounts_in, fee)
+
+    if np.ndim(min_out_per_in):
+        ratios = [Fraction(ratio) for ratio in min_out_per_in]
+        float_ratios = np.array([float(ratio) for ratio in ratios])[:, np.newaxis]
+    else:
+        ratios = [Fraction(min_out_per_in)] * len(reserves_in)
+        float_ratios = float(ratios[0])
+
+    # screen in float64 with a little slack, so rounding can never hide a real candidate
+    targets = to_float_array(amounts_in)[np.newaxis, :] * float_ratios
+    candidates = np.argwhere(quotes >= targets * (1 - SCREEN_TOLERANCE))
+
+    # confirm the survivors with exact integer math
+    results = []
+    for pool_index, size_index in candidates.tolist():
+        amount_in = amounts_in[size_index]
+        amount_out = get_amount_out(
+            amount_in,
+            reserves_in[pool_index],
+            reserves_out[pool_index],
+            fee,
+        )
+        if amount_out >= ratios[pool_index] * amount_in:
+            results.append((pool_index, size_index, amount_in, amount_out))
+    return results
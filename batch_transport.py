@@ -0,0 +1,198 @@
+"""
+Batch Transport (JSON-RPC batch arrays for eth_call fan-out)
+
+- every brownie call (getReserves, balanceOf ...) is its own HTTP round-trip, dozens per tick
+- Multicall3 (see multicall.py) is not deployed everywhere, but most providers accept a JSON-RPC batch:
+  an array of requests in one HTTP POST, answered by an array of responses
+- BatchTransport queues requests and sends them as ONE batch:
+    • explicitly: everything submitted inside `with transport.group():` goes out together when the block exits
+    • implicitly: requests from any thread within BATCH_WINDOW seconds of the first one are coalesced
+- responses can come back in any order, they are matched to the waiting callers by request id
+- each caller gets a concurrent.futures.Future, so a thread can submit its reads and block only when it needs them
+- the endpoint is looked up on every send: brownie's current provider, and under use_rpc_pool() (see rpc_pool.py)
+  the batch goes through the pool, so it is routed, hedged and fails over like any other read
+
+Usage:
+
+>>> transport = get_batch_transport()
+>>> reserves = transport.call_many([(lp.getReserves, []) for lp in lps], block_identifier=block_number)
+
+>>> with transport.group():
+...     balance = transport.eth_call(spell.balanceOf, [user.address])
+...     block = transport.submit("eth_blockNumber", [])
+>>> balance.result(), block.result()
+"""
+
+import itertools
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+import requests
+from brownie import web3
+
+# seconds to wait for more requests after the first one before sending the batch
+BATCH_WINDOW = 0.002
+# requests per HTTP batch, providers commonly cap batches at 100-1000
+MAX_BATCH = 100
+REQUEST_TIMEOUT = 30
+
+
+def to_block_parameter(block_identifier) -> str:
+    if block_identifier is None:
+        return "latest"
+    if isinstance(block_identifier, int):
+        return hex(block_identifier)
+    return block_identifier
+
+
+class BatchTransport:
+    """
+    Coalesces JSON-RPC requests into batch arrays, thread-safe
+    """
+
+    def __init__(
+        self,
+        url: str = None,
+        window: float = BATCH_WINDOW,
+        max_batch: int = MAX_BATCH,
+    ) -> None:
+        # None follows brownie's provider at the time of each send
+        self.url = url
+        self.window = window
+        self.max_batch = max_batch
+        # (payload, future) waiting to be sent
+        self._queue = []
+        self._groups = 0
+        self._timer = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        # keep-alive connection
+        self._session = requests.Session()
+
+    def submit(self, method: str, params: list) -> Future:
+        """
+        Queue a request, the Future resolves to its result (or raises ValueError with the JSON-RPC error)
+        """
+        future = Future()
+        payload = {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params}
+        with self._lock:
+            self._queue.append((payload, future))
+            full = len(self._queue) >= self.max_batch
+            if not full and not self._groups and self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+        return future
+
+    def request(self, method: str, params: list):
+        return self.submit(method, params).result()
+
+    def eth_call(self, fn, args=(), block_identifier=None) -> Future:
+        """
+        Queue a brownie ContractCall as an eth_call, the Future resolves to the decoded output
+        """
+        decoded = Future()
+
+        def decode(future):
+            try:
+                decoded.set_result(fn.decode_output(future.result()))
+            except Exception as e:
+                decoded.set_exception(e)
+
+        self.submit(
+            "eth_call",
+            [{"to": fn._address, "data": fn.encode_input(*args)}, to_block_parameter(block_identifier)],
+        ).add_done_callback(decode)
+        return decoded
+
+    def call_many(self, calls, block_identifier=None) -> list:
+        """
+        (ContractCall, [args]) pairs in one batch, returns the decoded results in order (None for failed calls)
+        """
+        with self.group():
+            futures = [self.eth_call(fn, args, block_identifier) for fn, args in calls]
+
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception:
+                results.append(None)
+        return results
+
+    @contextmanager
+    def group(self):
+        """
+        Hold every request submitted inside the block, and send them together when it exits
+        """
+        with self._lock:
+            self._groups += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._groups -= 1
+                send = not self._groups
+            if send:
+                self.flush()
+
+    def flush(self) -> None:
+        """
+        Send everything queued, in batches of max_batch
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            queue, self._queue = self._queue, []
+
+        for start in range(0, len(queue), self.max_batch):
+            self._send(queue[start : start + self.max_batch])
+
+    def _post(self, payloads: list):
+        if self.url is None and (pool := getattr(web3.provider, "pool", None)) is not None:
+            # RpcPoolProvider
+            return pool.request_batch(payloads)
+        response = self._session.post(
+            self.url or web3.provider.endpoint_uri, json=payloads, timeout=REQUEST_TIMEOUT
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def _send(self, batch) -> None:
+        futures = {payload["id"]: future for payload, future in batch}
+        try:
+            replies = self._post([payload for payload, _ in batch])
+            # a provider that rejects the whole batch answers with a single error object
+            if isinstance(replies, dict):
+                raise ValueError(replies.get("error", replies))
+        except Exception as e:
+            for future in futures.values():
+                future.set_exception(e)
+            return
+
+        for reply in replies:
+            if (future := futures.pop(reply.get("id"), None)) is None:
+                continue
+            if "error" in reply:
+                future.set_exception(ValueError(reply["error"]))
+            else:
+                future.set_result(reply["result"])
+        for future in futures.values():
+            future.set_exception(ValueError("no response in batch"))
+
+
+_batch_transport = None
+
+
+def get_batch_transport() -> BatchTransport:
+    """
+    Shared BatchTransport for brownie's current network
+    """
+    global _batch_transport
+    if _batch_transport is None:
+        _batch_transport = BatchTransport()
+    return _batch_transport
@@ -0,0 +1,129 @@
+"""
+Block Scheduler (wake the strategy on events, not on a fixed LOOP_TIME)
+
+- every bot runs while True: ... time.sleep(LOOP_TIME - elapsed)
+- that either re-reads state that has not changed (wasting RPC quota),
+  or reacts up to one LOOP_TIME after the block that created the opportunity
+- the scheduler wakes the main loop when something happened instead:
+    • a new block, pushed by a newHeads subscription on an EventPipeline (see subscribe())
+    • a relevant event pushed in with notify() (e.g. SyncDispatcher(on_update=...) for a Sync log)
+    • a cheap local trigger (e.g. a new staking rate in the shared memory channel)
+- eth_blockNumber is polled every poll_time only as a fallback: without a subscription,
+  or while the subscription has been silent for fallback_time seconds (e.g. the websocket is reconnecting)
+- if nothing happens for fallback_time seconds, wait() returns anyway so the bot still re-checks its state
+
+Usage:
+
+>>> scheduler = BlockScheduler(triggers=[staking_rate_channel.pending])
+>>> scheduler.subscribe(pipeline)
+>>> dispatcher = SyncDispatcher(on_update=lambda pool: scheduler.notify(pool.position[0]))
+>>> pipeline.start()
+>>> scheduler.start()
+>>> while True:
+...     block_number = scheduler.wait()
+...     # evaluate strategy
+"""
+
+import threading
+import time
+
+from brownie import web3
+
+from log_backfill import to_int
+
+
+class BlockScheduler:
+    """
+    Blocks in wait() until a new block, a notify() call, a trigger, or the fallback timeout.
+    """
+
+    def __init__(
+        self,
+        fallback_time: float = 5.0,
+        poll_time: float = 0.25,
+        watch_blocks: bool = True,
+        triggers: list = None,
+    ) -> None:
+        self.fallback_time = fallback_time
+        self.poll_time = poll_time
+        self.block_number = None
+        self._watch_blocks = watch_blocks
+        # zero-argument callables returning True when the strategy should be evaluated,
+        # called from the background thread, so they must be cheap and must not make RPC calls
+        self._triggers = triggers if triggers else []
+        self._condition = threading.Condition()
+        self._pending = False
+        self._thread = None
+        self._stopped = False
+        # time.monotonic() of the last block pushed by a subscription
+        self._pushed_at = None
+
+    def start(self) -> None:
+        if not (self._watch_blocks or self._triggers):
+            return
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped = True
+
+    def subscribe(self, pipeline) -> None:
+        """
+        Wake on every block header pushed by the EventPipeline's newHeads subscription, call before pipeline.start()
+        """
+        pipeline.subscribe_new_heads(self._new_head)
+
+    def _new_head(self, header) -> None:
+        self._pushed_at = time.monotonic()
+        self.notify(to_int(header["number"]))
+
+    def _polling(self) -> bool:
+        """
+        True unless a subscription pushed a block within fallback_time
+        """
+        return self._pushed_at is None or time.monotonic() - self._pushed_at > self.fallback_time
+
+    def notify(self, block_number: int = None) -> None:
+        """
+        Wake the waiting loop. Safe to call from any thread.
+        """
+        with self._condition:
+            if block_number is not None and (
+                self.block_number is None or block_number > self.block_number
+            ):
+                self.block_number = block_number
+            self._pending = True
+            self._condition.notify_all()
+
+    def wait(self):
+        """
+        Returns the latest block number after an event, or None if the fallback timeout expired.
+        """
+        with self._condition:
+            if not self._pending:
+                self._condition.wait(timeout=self.fallback_time)
+            if not self._pending:
+                return None
+            self._pending = False
+            return self.block_number
+
+    def _watch(self) -> None:
+        while not self._stopped:
+            loop_start = time.time()
+
+            if self._watch_blocks and self._polling():
+                try:
+                    block_number = web3.eth.block_number
+                    if self.block_number is None or block_number > self.block_number:
+                        self.notify(block_number)
+                except Exception as e:
+                    print(f"Exception in BlockScheduler: {e}")
+
+            for trigger in self._triggers:
+                try:
+                    if trigger():
+                        self.notify()
+                except Exception as e:
+                    print(f"Exception in BlockScheduler trigger: {e}")
+
+            time.sleep(max(0, self.poll_time - (time.time() - loop_start)))
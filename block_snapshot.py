@@ -0,0 +1,102 @@
+"""
+Block Snapshot (one consistent view of the chain per block)
+
+- when each strategy leg issues its own getReserves / balanceOf / rate reads,
+  the legs can evaluate against different blocks, and the RPC load doubles with every leg
+- a BlockSnapshot captures everything the strategies need (reserves, balances, base fee, oracle prices ...)
+  for ONE block number, and every strategy evaluated in that tick reads from the same read-only view
+- contract reads are pinned to the snapshot's block and batched into one multicall
+- identical eth_calls are deduplicated by (block, to, calldata), across legs and across snapshots of the same block,
+  so each distinct datum is read at most once per block
+
+Usage:
+
+>>> snapshot = BlockSnapshot(
+...     scheduler.block_number,
+...     values={"reserves": lp_reserves.reserves, "staking_rate": base_staking_rate},
+...     calls={"spell_balance": (spell_contract.balanceOf, [user.address])},
+...     base_fee=True,
+... )
+>>> x0, y0 = snapshot["reserves"]
+>>> price = snapshot.call(spell_price_feed.latestRoundData)[1]
+"""
+
+from types import MappingProxyType
+
+from brownie import web3
+
+from multicall import multicall
+
+# how many blocks of eth_call results to keep for deduplication
+CALL_CACHE_BLOCKS = 2
+
+# (block number, to, calldata) -> decoded result
+_call_cache = {}
+
+
+def _prune_call_cache(block_number: int) -> None:
+    for key in [key for key in _call_cache if key[0] <= block_number - CALL_CACHE_BLOCKS]:
+        del _call_cache[key]
+
+
+def cached_multicall(calls, block_number: int) -> list:
+    """
+    multicall() pinned to block_number, skipping any (to, calldata) already read at that block
+    """
+    keys = [(block_number, fn._address.lower(), fn.encode_input(*args)) for fn, args in calls]
+
+    missing = {}
+    for key, call in zip(keys, calls):
+        if key not in _call_cache and key not in missing:
+            missing[key] = call
+
+    if missing:
+        _prune_call_cache(block_number)
+        results = multicall(list(missing.values()), block_identifier=block_number)
+        for key, result in zip(missing, results):
+            # failed calls are not cached, so the next reader retries them
+            if result is not None:
+                _call_cache[key] = result
+
+    return [_call_cache.get(key) for key in keys]
+
+
+class BlockSnapshot:
+    """
+    Read-only view of the values a strategy needs at one block number.
+    values are taken as-is and must still hold at that block (e.g. reserves from a ReserveCache with no Sync after
+    its position), calls are (ContractCall, [args]) read at the block. Failed calls read as None.
+    """
+
+    def __init__(
+        self,
+        block_number: int,
+        values: dict = None,
+        calls: dict = None,
+        base_fee: bool = False,
+    ) -> None:
+        self.block_number = block_number
+
+        data = dict(values) if values else {}
+        if calls:
+            results = cached_multicall(list(calls.values()), block_number)
+            data.update(zip(calls, results))
+        if base_fee:
+            data["base_fee"] = web3.eth.get_block(block_number).get("baseFeePerGas")
+
+        self._data = MappingProxyType(data)
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __contains__(self, key) -> bool:
+        return key in self._data
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def call(self, fn, *args):
+        """
+        A single contract read pinned to the snapshot's block, deduplicated with every other read at this block
+        """
+        return cached_multicall([(fn, list(args))], self.block_number)[0]
@@ -0,0 +1,111 @@
+"""
+logsBloom Pre-filter (polling mode without a websocket)
+
+- with a plain HTTPS endpoint (e.g. the Ankr endpoint in third_party_rpc.py) there are no subscriptions,
+  and calling eth_getLogs for every block just to find out nothing happened is a wasted request
+- every block header carries a 2048 bit logsBloom: for every log in the block, the address and each topic
+  set 3 bits (taken from their keccak256 hash)
+- if any of the 3 bits of every watched address is missing, no log from that address is in the block,
+  same for the topics, so eth_getLogs is only needed when the bloom MIGHT match (false positives are possible,
+  false negatives are not)
+- on Avalanche most blocks never touch our pools, so most log fetches are skipped
+
+Usage:
+
+>>> watcher = BloomLogWatcher(dispatcher.addresses, [SYNC_TOPIC], dispatcher.handle_log)
+>>> watcher.run()
+"""
+
+import time
+
+from brownie import web3
+from eth_utils import keccak
+
+# above this many addresses, fetch all logs with the watched topics and let the handler skip unknown addresses
+MAX_FILTER_ADDRESSES = 100
+
+
+def bloom_mask(value: bytes) -> int:
+    """
+    The 3 logsBloom bits set by an address or topic, as an int mask.
+    Bit i of the mask is bit i of the bloom read as a big-endian 2048 bit integer.
+    """
+    value_hash = keccak(value)
+    mask = 0
+    for i in (0, 2, 4):
+        mask |= 1 << (((value_hash[i] << 8) | value_hash[i + 1]) & 2047)
+    return mask
+
+
+def to_bytes(value) -> bytes:
+    if isinstance(value, str):
+        return bytes.fromhex(value[2:] if value.startswith("0x") else value)
+    return bytes(value)
+
+
+class BloomLogWatcher:
+    """
+    Polls new block headers, and only fetches the logs of blocks whose logsBloom might contain
+    one of the watched addresses AND one of the watched topics.
+    """
+
+    def __init__(
+        self,
+        addresses: list,
+        topics: list,
+        handle_log,
+        poll_time: float = 0.5,
+    ) -> None:
+        self._addresses = list(addresses)
+        self._topics = list(topics)
+        self._address_masks = [bloom_mask(to_bytes(address)) for address in self._addresses]
+        self._topic_masks = [bloom_mask(to_bytes(topic)) for topic in self._topics]
+        self._handle_log = handle_log
+        self.poll_time = poll_time
+        self.last_block = None
+        # blocks checked / blocks whose logs were fetched
+        self.blocks_checked = 0
+        self.blocks_fetched = 0
+
+    def might_match(self, logs_bloom) -> bool:
+        bloom = int.from_bytes(to_bytes(logs_bloom), "big")
+        return any(bloom & mask == mask for mask in self._topic_masks) and any(
+            bloom & mask == mask for mask in self._address_masks
+        )
+
+    def check_block(self, block) -> list:
+        """
+        Returns the watched logs of a block (a header from web3.eth.get_block), fetching them only on a bloom match
+        """
+        self.blocks_checked += 1
+        if not self.might_match(block["logsBloom"]):
+            return []
+
+        self.blocks_fetched += 1
+        log_filter = {"blockHash": block["hash"], "topics": [self._topics]}
+        if len(self._addresses) <= MAX_FILTER_ADDRESSES:
+            log_filter["address"] = self._addresses
+        return web3.eth.get_logs(log_filter)
+
+    def poll(self) -> None:
+        """
+        Check every block since the last poll
+        """
+        block_number = web3.eth.block_number
+        if self.last_block is None:
+            self.last_block = block_number - 1
+
+        while self.last_block < block_number:
+            block = web3.eth.get_block(self.last_block + 1)
+            for log in self.check_block(block):
+                self._handle_log(log)
+            self.last_block += 1
+
+    def run(self) -> None:
+        while True:
+            loop_start = time.time()
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Exception in BloomLogWatcher: {e}")
+            time.sleep(max(0, self.poll_time - (time.time() - loop_start)))
@@ -3,6 +3,11 @@ import time
 import os 
 from brownie import * 
 
+# shared helpers (rate_channel.py) live in the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rate_channel import RatePublisher
+from multicall import multicall
+
 # use python-dotenv to get API key 
 from dotenv import load_dotenv 
 load_dotenv()
@@ -16,6 +21,15 @@ SSPELL_CONTRACT_ADDRESS = "0x26FA3fFFB6EfE8c1E69103aCb4044C26B9A106a9"
 
 FILENAME = '.abra_rate'
 
+# Watch every new block for SPELL transfers into / out of sSPELL, and only then read the rate
+# (both values pinned to the same block), instead of reading it every 60 seconds
+BLOCK_SUBSCRIPTION = True
+# How often to check for a new block (in seconds), Ethereum blocks are ~12 seconds apart
+BLOCK_POLL_TIME = 2
+
+# keccak256("Transfer(address,address,uint256)")
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+
 def main():
 
     try:
@@ -33,10 +47,14 @@ def main():
     with open(FILENAME, "w") as file:
         file.write(str(0.0) + "\n")
 
-    while True:
+    # the trading bots subscribe to this shared memory slot instead of polling the file
+    staking_rate_channel = RatePublisher()
+    abra_rate = 0.0
 
-        with open(FILENAME, "r") as file:
-            abra_rate = float(file.read().strip())
+    if BLOCK_SUBSCRIPTION:
+        watch_blocks(spell_contract, sspell_contract, staking_rate_channel)
+
+    while True:
 
         try:
             result = round(
@@ -46,16 +64,92 @@ def main():
             print(f"{e}")
             continue
 
-        if abra_rate and result == abra_rate:
-            pass
-        else:
-            print(f"Updated rate found: {result}")
-            abra_rate = result 
-            with open(FILENAME, "w") as file:
-                file.write(str(abra_rate) + "\n")
+        abra_rate = publish_rate(result, abra_rate, staking_rate_channel)
 
         time.sleep(60)
 
+def watch_blocks(spell_contract, sspell_contract, staking_rate_channel):
+    """
+    The rate only changes when SPELL moves into or out of the sSPELL contract (staking, unstaking, rewards).
+    Check each new block range for those Transfer logs and re-read the rate only when one occurred,
+    with balanceOf and totalSupply pinned to the same block in one batched call.
+    A failed read is retried on the next poll, the blocks since the last successful one are checked again.
+    """
+    # None until the first rate is published, which is read without waiting for a Transfer
+    last_block = None
+    abra_rate = 0.0
+
+    while True:
+
+        try:
+            block_number = chain.height
+            if last_block is None or block_number > last_block:
+                if last_block is None or get_sspell_transfer_logs(
+                    spell_contract, sspell_contract, last_block + 1, block_number
+                ):
+                    abra_rate = publish_rate(
+                        get_rate_at_block(spell_contract, sspell_contract, block_number),
+                        abra_rate,
+                        staking_rate_channel,
+                    )
+                last_block = block_number
+        except Exception as e:
+            print(f"{e}")
+
+        time.sleep(BLOCK_POLL_TIME)
+
+def get_sspell_transfer_logs(spell_contract, sspell_contract, from_block, to_block):
+    """
+    SPELL Transfer logs with sSPELL as the sender or the recipient
+    """
+    sspell_topic = "0x" + sspell_contract.address[2:].lower().rjust(64, "0")
+    logs = []
+    # a filter can't OR across topic positions, so one query for each direction
+    for topics in [
+        [TRANSFER_TOPIC, sspell_topic],
+        [TRANSFER_TOPIC, None, sspell_topic],
+    ]:
+        logs += web3.eth.get_logs(
+            {
+                "address": spell_contract.address,
+                "fromBlock": from_block,
+                "toBlock": to_block,
+                "topics": topics,
+            }
+        )
+    return logs
+
+def get_rate_at_block(spell_contract, sspell_contract, block_number):
+    """
+    SPELL held by sSPELL / sSPELL supply, both read at the same block in one request.
+    Raises ValueError if either read failed.
+    """
+    spell_balance, sspell_supply = multicall(
+        [
+            (spell_contract.balanceOf, [sspell_contract.address]),
+            (sspell_contract.totalSupply, []),
+        ],
+        block_identifier=block_number,
+    )
+    # multicall() returns None for a failed call
+    if spell_balance is None or not sspell_supply:
+        raise ValueError(f"Could not read the staking rate at block {block_number}")
+    return round(spell_balance / sspell_supply, 4)
+
+def publish_rate(result, abra_rate, staking_rate_channel):
+    """
+    Publish the rate if it changed, returns the current rate
+    """
+    if abra_rate and result == abra_rate:
+        return abra_rate
+
+    print(f"Updated rate found: {result}")
+    staking_rate_channel.publish(result)
+    # still written for the bots that read the rate from FILENAME
+    with open(FILENAME, "w") as file:
+        file.write(str(result) + "\n")
+    return result
+
 def contract_load(address, alias):
     """
     Attempts to load saved contract.
@@ -16,12 +16,8 @@ Bot Building - Structure and Helper Functions
 
 - Helper Functions (covered later)
     • account_get_balance(account)
-    • contract_load(address, alias)
-    • get_approval(token, router, user)
-    • get_token_name(token)
-    • get_token_symbol(token)
-    • get_token_balance(token, user)
-    • get_token_decimals(token)
+    • contract_load(address, alias)  -- ABIs from the on-disk cache, the explorer only on the first run (contract_cache.py)
+    • get_token_info_batch(token_contracts, user, spender_addresses)  -- name, symbol, balance, decimals and allowances in one request (multicall.py)
     • get_swap_rate(token_in_quantity, token_in_address, token_out_address, router)
     • token_approve(token, router, value="unlimited")  -- default value unlimited, unless set otherwise * not safe
     • token_swap(token_in_quantity, token_in_address, token_out_quantity, token_out_address, router)
@@ -37,12 +33,30 @@ import requests
 import os
 from brownie import *
 
+# shared helpers live in the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# staking rate published by ethereum_abra_staking_watcher.py into shared memory
+from rate_channel import RateSubscriber
+from block_scheduler import BlockScheduler
+from event_pipeline import EventPipeline
+from nonce_manager import NonceManager
+from swap_templates import SwapTemplate
+from broadcast_fanout import ENDPOINTS, BroadcastFanout
+from rpc_pool import use_rpc_pool
+from batch_transport import get_batch_transport
+from multicall import get_token_info_batch
+# contract_load() reads ABIs from the on-disk cache, so a restart needs no explorer calls
+from contract_cache import contract_load
+
 # use python-dotenv to get API key
 from dotenv import load_dotenv
 load_dotenv()
 
 os.environ.get('SNOWTRACE_TOKEN')
 
+# websocket endpoint for the newHeads subscription, without it the scheduler polls (see block_scheduler.py)
+WEBSOCKET_URL = os.environ.get("WEBSOCKET_URL")
+
 # conract addresses (verify on Snowtrace)
 TRADERJOE_ROUTER_CONTRACT_ADDRESS = "0x60aE616a2155Ee3d9A68541Ba4544862310933d4"
 SPELL_CONTRACT_ADDRESS = "0xce1bffbd5374dac86a2893119683f4911a2f7814"
@@ -63,7 +77,7 @@ DRY_RUN = False
 # Quite after first successful trade
 ONE_SHOT = False
 
-# How often to run the main loop (in seconds)
+# How often the scheduler checks for a new block (in seconds), see block_scheduler.py
 LOOP_TIME = 1.0
 
 # ---- Swap Thresholds and Slippage ----
@@ -82,7 +96,6 @@ THRESHOLD_SSPELL_TO_SPELL = 0.5 * PERCENT
 # tolerated slippage in swap price (used to calculate amountOutMin) which is passed to swapExactTokensForTokens()
 SLIPPAGE = 0.1 * PERCENT
 
-STAKING_RATE_FILENAME = '.abra_rate'
 
 # Simulate swaps and approvals
 DRY_RUN = True
@@ -90,9 +103,15 @@ DRY_RUN = True
 # Quit after the first successful trade
 ONE_SHOT = False
 
-# How often to run the main loop (in seconds)
+# How often the scheduler checks for a new block (in seconds), see block_scheduler.py
 LOOP_TIME = 1.0
 
+# Sign and broadcast swaps from pre-built templates (see swap_templates.py) instead of brownie's transaction builder
+FAST_SEND = True
+
+# priority fee bid for every transaction, brownie's and the templates'
+PRIORITY_FEE = "5 gwei"
+
 # ----- Function Definitions -------
 
 def main():
@@ -109,7 +128,7 @@ def main():
         network.connect("avax-main")
         # Avalanche support EIP-1559 transactions, so we set the priority fee
         # and allow the base fee to adjust as needed 
-        network.priority_fee('5 gwei')
+        network.priority_fee(PRIORITY_FEE)
         # Can set a limit on maximum fee, if desired 
         # network.max_fee('200 gwei')
     except:
@@ -117,9 +136,16 @@ def main():
             "Could not connect to Avalanche! Verify that brownie lists the Avalanche Mainnet using 'brownie networks list'"
         )
 
+    # with RPC_ENDPOINTS in .env, reads go to the fastest healthy endpoint and slow ones are hedged
+    if ENDPOINTS:
+        use_rpc_pool(ENDPOINTS)
+
     try: 
         global user 
         user = accounts.load("trade_account")
+        # nonces are tracked locally, so transactions are sent back-to-back without waiting for receipts
+        global nonce_manager
+        nonce_manager = NonceManager(user)
     except:
         sys.exit(
             "Could not load account! Verify that your account is listed using 'brownie accounts list' and that you are using the correct password. If you have not added an account, run 'brownie accounts' now."
@@ -150,64 +176,132 @@ def main():
         "decimals": None,
     }
 
-    spell["symbol"] = get_token_symbol(spell["contract"])
-    spell["name"] = get_token_name(spell["contract"])
-    spell["balance"] = get_token_balance(spell_contract, user)
-    spell["decimals"] = get_token_decimals(spell_contract)
-
-    sspell["symbol"] = get_token_symbol(sspell["contract"])
-    sspell["name"] = get_token_name(sspell["contract"])
-    sspell["balance"] = get_token_balance(sspell_contract, user)
-    sspell["decimals"] = get_token_decimals(sspell_contract)
+    # symbol, name, balance, decimals and router allowance for both tokens in one request
+    token_info = get_token_info_batch(
+        [spell_contract, sspell_contract], user, [router_contract.address]
+    )
+    for token, info in zip([spell, sspell], token_info):
+        if None in (info["symbol"], info["name"], info["balance"], info["decimals"]):
+            sys.exit(f"Could not load token data for {token['address']}!")
+        token["symbol"] = info["symbol"]
+        token["name"] = info["name"]
+        token["balance"] = info["balance"]
+        token["decimals"] = info["decimals"]
+        token["allowance"] = info["allowances"][router_contract.address]
+        if DRY_RUN:
+            # pretend we have a balance and unlimited approval for testing
+            token["balance"] = 10000 * 10**18
+            token["allowance"] = 2**256 - 1
 
     if (spell["balance"] == 0) and (sspell["balance"] == 0):
         sys.exit("No tokens found!")
 
     # Confirm approval for tokens
     print("\nChecking Approvals:")
+    approvals = []
 
-    if get_approval(spell["contract"], router_contract, user):
+    if spell["allowance"]:
         print(f"• {spell['symbol']} OK")
     else:
-        token_approve(spell["contract"], router_contract)
+        approvals.append(token_approve(spell["contract"], router_contract))
 
-    if get_approval(sspell["contract"], router_contract, user):
+    if sspell["allowance"]:
         print(f"• {sspell['symbol']} OK")
     else:
-        token_approve(sspell["contract"], router_contract)
+        approvals.append(token_approve(sspell["contract"], router_contract))
+
+    # both approvals are in flight together, wait for them once
+    nonce_manager.wait([tx for tx in approvals if tx is not True])
+
+    # pre-built swaps for both directions, a trigger only encodes the amounts and deadline, signs and sends
+    global swap_templates
+    swap_templates = {}
+    if FAST_SEND:
+        # with RPC_ENDPOINTS in .env, every swap is pushed to all of them at once
+        broadcaster = BroadcastFanout(ENDPOINTS) if ENDPOINTS else None
+        for path in (
+            [spell["address"], sspell["address"]],
+            [sspell["address"], spell["address"]],
+        ):
+            swap_templates[tuple(path)] = SwapTemplate(
+                router_contract.address,
+                path,
+                user,
+                nonce_manager,
+                priority_fee=Wei(PRIORITY_FEE),
+                broadcaster=broadcaster,
+            )
 
+    # the staking watcher publishes the rate into shared memory, no file I/O in the loop
     try:
-        with open(STAKING_RATE_FILENAME, "r") as file:
-            base_staking_rate = float(file.read().strip())
-            print(f"\nEthereum L1 Staking Rate: {base_staking_rate}")
+        staking_rate_channel = RateSubscriber()
     except FileNotFoundError:
         sys.exit(
-            "Cannot load the base Abracadabra SPELL/sSPELL staking rate. Run `python3 abra_rate.py` and try again."
+            "Cannot load the base Abracadabra SPELL/sSPELL staking rate. Run `python3 ethereum_abra_staking_watcher.py` and try again."
         )
+    if (base_staking_rate := staking_rate_channel.poll()) is None:
+        sys.exit(
+            "The staking watcher has not published a SPELL/sSPELL staking rate yet. Wait for it and try again."
+        )
+    print(f"\nEthereum L1 Staking Rate: {base_staking_rate}")
+
+    # wake the main loop on new blocks and new staking rates
+    scheduler = BlockScheduler(
+        poll_time=LOOP_TIME, triggers=[staking_rate_channel.pending]
+    )
+    if WEBSOCKET_URL:
+        # blocks wake the loop as they are pushed, polling eth_blockNumber is only the fallback
+        pipeline = EventPipeline(WEBSOCKET_URL)
+        scheduler.subscribe(pipeline)
+        pipeline.start()
+    scheduler.start()
 
     balance_refresh = True
+    # swaps sent by token_swap() that are not confirmed yet
+    global pending_swaps
+    pending_swaps = []
+    # block of the last template fee refresh
+    template_block = None
 
     #
     # Start of arbitrage loop 
     # 
     while True:
 
-        loop_start = time.time()
-
-        try:
-            with open(STAKING_RATE_FILENAME, "r") as file:
-                if (result := float(file.read().strip())) != base_staking_rate:
-                    base_staking_rate = result 
-                    print(f"Updated staking rate: {base_staking_rate}")
-        except FileNotFoundError:
-            sys.exit(
-                "Cannot load the base Abracadabra SPELL/sSPELL staking rate. Run `python3 abra_rate.py` and try again."
-            )
+        if (result := staking_rate_channel.poll()) is not None:
+            if result != base_staking_rate:
+                base_staking_rate = result 
+                print(f"Updated staking rate: {base_staking_rate}")
+
+        # keep the template fees current once per block, outside the trigger -> broadcast path
+        if swap_templates and scheduler.block_number != template_block:
+            template_block = scheduler.block_number
+            try:
+                base_fee = web3.eth.get_block("latest")["baseFeePerGas"]
+                for template in swap_templates.values():
+                    template.refresh(base_fee)
+            except Exception as e:
+                print(f"Exception in template refresh: {e}")
 
         if balance_refresh:
-            time.sleep(10)
-            spell["balance"] = get_token_balance(spell_contract, user)
-            sspell["balance"] = get_token_balance(sspell_contract, user)
+            # wait for the swaps to be mined instead of sleeping a fixed 10 seconds
+            nonce_manager.wait(pending_swaps)
+            pending_swaps.clear()
+            # DRY_RUN keeps the pretend balances set at startup
+            if not DRY_RUN:
+                # both balanceOf reads in one JSON-RPC batch request
+                balances = get_batch_transport().call_many(
+                    [
+                        (spell_contract.balanceOf, [user.address]),
+                        (sspell_contract.balanceOf, [user.address]),
+                    ]
+                )
+                if None in balances:
+                    # keep balance_refresh set and try again on the next block
+                    print("Exception in balance refresh: balanceOf failed")
+                    scheduler.wait()
+                    continue
+                spell["balance"], sspell["balance"] = balances
             print("\nAccount Balance:")
             print(
                 f"• Token #1: {int(spell['balance']/(10**spell['decimals']))} {spell['symbol']} ({spell['name']})"
@@ -300,14 +394,8 @@ def main():
                         if ONE_SHOT:
                             sys.exit("single shot complete!")
 
-            loop_end = time.time()
-
-            # Control the loop timing more precisely by measuring start and end time and sleeping as needed
-            if (loop_end - loop_start) >= LOOP_TIME:
-                continue 
-            else: 
-                time.sleep(LOOP_TIME - (loop_end - loop_start))
-                continue 
+        # wait for the next block (or a new staking rate) instead of sleeping a fixed LOOP_TIME
+        scheduler.wait()
 
     # 
     # End of arbitrage loop
@@ -321,95 +409,21 @@ def account_get_balance(account):
         print(f"Exception in account_get_balance: {e}")
 
 
-def contract_load(address, alias):
-    """
-    Attempts to load the saved contract by alias.
-    If not found, fetch from network explorer and set alias.
-    """
-    try:
-        contract = Contract(alias)
-    except ValueError:
-        contract = Contract.from_explorer(address, owner=user)
-        contract.set_alias(alias)
-    finally:
-        print(f"• {alias}")
-        return contract
-
-
-def get_approval(token, router, user):
-    if DRY_RUN:
-        # pretend we have unlimited approval
-        return 2**256 - 1
-    try:
-        return token.allowance.call(user, router.address)
-    except Exception as e:
-        print(f"Exception in get_approval: {e}")
-        return False
-
-
-def get_token_name(token):
-    try:
-        return token.name.call()
-    except Exception as e:
-        print(f"Exception in get_token_name: {e}")
-        raise
-
-
-def get_token_symbol(token):
-    try:
-        return token.symbol.call()
-    except Exception as e:
-        print(f"Exception in get_token_symbol: {e}")
-        raise
-
-
-def get_token_balance(token, user):
+def token_approve(token, router, value="unlimited"):
     if DRY_RUN:
-        # return a fake balance for testing
-        return 10000 * 10**18
-    try:
-        return token.balanceOf.call(user)
-    except Exception as e:
-        print(f"Exception in get_token_balance: {e}")
-        raise
+        return True
 
+    if value == "unlimited":
+        value = 2 ** 256 - 1
 
-def get_token_decimals(token):
+    # broadcast with the next local nonce, confirmed later with nonce_manager.wait()
     try:
-        return token.decimals.call()
+        return nonce_manager.transact(token.approve, router, value)
     except Exception as e:
-        print(f"Exception in get_token_decimals: {e}")
+        print(f"Exception in token_approve: {e}")
         raise
 
 
-def token_approve(token, router, value="unlimited"):
-    if DRY_RUN:
-        return True
-
-    if value == "unlimited":
-        try:
-            token.approve(
-                router,
-                2 ** 256 - 1,
-                {"from": user},
-            )
-            return True
-        except Exception as e:
-            print(f"Exception in token_approve: {e}")
-            raise
-    else:
-        try:
-            token.approve(
-                router,
-                value,
-                {"from": user},
-            )
-            return True
-        except Exception as e:
-            print(f"Exception in token_approve: {e}")
-            raise
-
-
 def get_swap_rate(token_in_quantity, token_in_address, token_out_address, router):
     try:
         return router.getAmountsOut(
@@ -431,13 +445,26 @@ def token_swap(
         return True
 
     try:
-        router.swapExactTokensForToken(
-            token_in_quantity,
-            int(token_out_quantity * (1 - SLIPPAGE)),
-            [token_in_address, token_out_address],
-            user.address,
-            int(1000 * (time.time()) + 30 * SECOND),
-            {"from": user},
+        # the router compares the deadline with block.timestamp, which is in seconds
+        if FAST_SEND:
+            pending_swaps.append(
+                swap_templates[(token_in_address, token_out_address)].send(
+                    token_in_quantity,
+                    int(token_out_quantity * (1 - SLIPPAGE)),
+                    int(time.time() + 30 * SECOND),
+                )
+            )
+            return True
+
+        pending_swaps.append(
+            nonce_manager.transact(
+                router.swapExactTokensForToken,
+                token_in_quantity,
+                int(token_out_quantity * (1 - SLIPPAGE)),
+                [token_in_address, token_out_address],
+                user.address,
+                int(time.time() + 30 * SECOND),
+            )
         )
         return True
     except Exception as e:
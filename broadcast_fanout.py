@@ -0,0 +1,271 @@
+"""
+Broadcast Fan-out (one signed transaction, every RPC endpoint at once)
+
+- third_party_rpc.py switches between Moralis / Ankr by re-adding brownie networks, so a transaction only ever
+  reaches the mempool through ONE provider, and in a gas war propagation speed decides who is included first
+- a signed raw transaction can be sent to any number of endpoints: BroadcastFanout posts it to all of them
+  concurrently (one keep-alive session per endpoint), returns as soon as the first one accepts it,
+  and lets the others finish in the background
+- the transaction hash is computed locally (keccak of the raw transaction), not taken from a reply
+- "already known" means this exact transaction is in the node's mempool (another endpoint's copy may have reached
+  it first), which is an acceptance
+- "nonce too low" is not an error for an endpoint either, but it is not an acceptance: it also means a DIFFERENT
+  transaction took the nonce, so send() only returns once an endpoint has accepted the transaction, and raises otherwise
+- EndpointStats tracks the acceptance latency of every endpoint (EWMA and recent samples for percentiles),
+  how often it was first, and how often it failed, so slow or unreliable providers show up over time
+
+Endpoints are read from RPC_ENDPOINTS (comma separated) in .env.
+
+Usage:
+
+>>> fanout = BroadcastFanout(ENDPOINTS)
+>>> tx_hash, endpoint = fanout.send(raw_transaction)
+>>> fanout.print_stats()
+
+$ python3 broadcast_fanout.py      (demo against local stand-in JSON-RPC servers)
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from dotenv import load_dotenv
+from web3 import Web3
+
+load_dotenv()
+ENDPOINTS = [url for url in os.environ.get("RPC_ENDPOINTS", "").split(",") if url]
+
+# weight of the newest sample in the latency EWMA
+EWMA_ALPHA = 0.2
+# latency samples kept per endpoint for percentiles
+LATENCY_SAMPLES = 200
+# seconds to wait for any endpoint to accept a transaction
+BROADCAST_TIMEOUT = 5
+
+# errors meaning the node already has this transaction (accepted through another endpoint)
+ALREADY_KNOWN_ERRORS = (
+    "already known",
+    "known transaction",
+    "already imported",
+)
+
+# errors meaning the nonce is used, by this transaction or by another one
+NONCE_USED_ERRORS = ("nonce too low",)
+
+
+class EndpointStats:
+    """
+    Latency and reliability of one endpoint, thread-safe
+    """
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.ewma = None
+        self.requests = 0
+        self.errors = 0
+        # errors since the last success, used to eject failing endpoints (see rpc_pool.py)
+        self.consecutive_errors = 0
+        # broadcasts where this endpoint accepted first
+        self.first = 0
+        self._samples = deque(maxlen=LATENCY_SAMPLES)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float) -> None:
+        with self._lock:
+            self.requests += 1
+            self.consecutive_errors = 0
+            self._samples.append(latency)
+            self.ewma = latency if self.ewma is None else EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.ewma
+
+    def record_error(self) -> None:
+        with self._lock:
+            self.requests += 1
+            self.errors += 1
+            self.consecutive_errors += 1
+
+    @property
+    def samples(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, percent: float):
+        with self._lock:
+            if not self._samples:
+                return None
+            samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.requests if self.requests else 0.0
+
+    def __str__(self):
+        ewma = f"{1000 * self.ewma:.1f}ms" if self.ewma is not None else "-"
+        p95 = self.percentile(95)
+        p95 = f"{1000 * p95:.1f}ms" if p95 is not None else "-"
+        return f"{self.url}: ewma {ewma}, p95 {p95}, first {self.first}/{self.requests}, errors {self.errors}"
+
+
+def is_already_known(error) -> bool:
+    message = str(error).lower()
+    return any(text in message for text in ALREADY_KNOWN_ERRORS)
+
+
+def is_nonce_used(error) -> bool:
+    message = str(error).lower()
+    return any(text in message for text in NONCE_USED_ERRORS)
+
+
+class BroadcastFanout:
+    """
+    Sends each raw transaction to every endpoint concurrently
+    """
+
+    def __init__(self, endpoints: list, timeout: float = BROADCAST_TIMEOUT) -> None:
+        if not endpoints:
+            raise ValueError("BroadcastFanout needs at least one endpoint")
+        self.endpoints = list(endpoints)
+        self.timeout = timeout
+        self.stats = {url: EndpointStats(url) for url in self.endpoints}
+        # keep-alive connection per endpoint, no TCP / TLS handshake on the critical path
+        self._sessions = {url: requests.Session() for url in self.endpoints}
+        self._executor = ThreadPoolExecutor(max_workers=len(self.endpoints) * 4)
+
+    def _post(self, url: str, raw_transaction: str) -> bool:
+        """
+        True if the endpoint accepted (or already has) the transaction, False if the nonce is used, raises otherwise
+        """
+        start = time.perf_counter()
+        try:
+            response = self._sessions[url].post(
+                url,
+                json={"jsonrpc": "2.0", "id": 1, "method": "eth_sendRawTransaction", "params": [raw_transaction]},
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            reply = response.json()
+            if "error" in reply and not (is_already_known(reply["error"]) or is_nonce_used(reply["error"])):
+                raise ValueError(reply["error"])
+        except Exception:
+            self.stats[url].record_error()
+            raise
+        self.stats[url].record(time.perf_counter() - start)
+        return "error" not in reply or is_already_known(reply["error"])
+
+    def send(self, raw_transaction) -> tuple:
+        """
+        Broadcast to every endpoint, returns (transaction hash, first endpoint to accept) as soon as one accepts.
+        Raises if no endpoint accepts the transaction.
+        """
+        if not isinstance(raw_transaction, str):
+            raw_transaction = "0x" + bytes(raw_transaction).hex()
+        tx_hash = Web3.keccak(hexstr=raw_transaction).hex()
+
+        futures = {self._executor.submit(self._post, url, raw_transaction): url for url in self.endpoints}
+        pending = set(futures)
+        errors = []
+        deadline = time.perf_counter() + self.timeout
+
+        while pending:
+            done, pending = wait(pending, timeout=max(0, deadline - time.perf_counter()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                url = futures[future]
+                if future.exception() is not None:
+                    errors.append(f"{url}: {future.exception()}")
+                    continue
+                if not future.result():
+                    # "nonce too low", wait for an endpoint that really accepts it
+                    errors.append(f"{url}: nonce already used")
+                    continue
+                self.stats[url].first += 1
+                # the other endpoints keep going in the background and still update their stats
+                return tx_hash, url
+
+        raise ValueError(f"Broadcast not accepted by any endpoint: {errors}")
+
+    def print_stats(self) -> None:
+        for stats in sorted(self.stats.values(), key=lambda stats: stats.ewma or float("inf")):
+            print(f"• {stats}")
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        for session in self._sessions.values():
+            session.close()
+
+
+def start_stand_in_server(
+    delay: float,
+    jitter: float = 0.0,
+    reject: str = None,
+    spike_probability: float = 0.0,
+    spike_delay: float = 0.0,
+):
+    """
+    Local JSON-RPC server answering any request after delay (+ random jitter) seconds,
+    and after an extra spike_delay for a spike_probability fraction of requests (a slow tail).
+    With reject, every request gets a JSON-RPC error with that message.
+    Returns (server, url), stop it with server.shutdown().
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(
+                delay
+                + random.uniform(0, jitter)
+                + (spike_delay if random.random() < spike_probability else 0)
+            )
+            if reject:
+                reply = {"jsonrpc": "2.0", "id": request["id"], "error": {"code": -32000, "message": reject}}
+            else:
+                reply = {"jsonrpc": "2.0", "id": request["id"], "result": "0x" + "ab" * 32}
+            body = json.dumps(reply).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    # stand-ins for a fast, a jittery, a slow and a rejecting provider
+    servers = [
+        start_stand_in_server(delay=0.010),
+        start_stand_in_server(delay=0.005, jitter=0.030),
+        start_stand_in_server(delay=0.050),
+        start_stand_in_server(delay=0.001, reject="transaction underpriced"),
+    ]
+    fanout = BroadcastFanout([url for _, url in servers])
+
+    for _ in range(50):
+        start = time.perf_counter()
+        tx_hash, url = fanout.send("0x02f8")
+        print(f"{tx_hash[:10]}... accepted by {url} in {1000 * (time.perf_counter() - start):.1f}ms")
+
+    # let the slower endpoints finish before reading the stats
+    time.sleep(0.2)
+    print("\nEndpoint stats:")
+    fanout.print_stats()
+
+    fanout.close()
+    for server, _ in servers:
+        server.shutdown()
+
+
+# Only executes main loop if this file is called directly
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Contract Cache (ABIs and token metadata on disk)
+
+- contract_load() falls back to Contract.from_explorer(), a rate-limited HTTP request to Snowtrace / Arbiscan
+- every bot re-queries name(), symbol() and decimals() on each start, even though they never change
+- this keeps both in a local SQLite file keyed by (chain id, address),
+  so a cold restart after a crash needs zero explorer calls and zero metadata calls
+- the ERC-20 ABI from abis_unverified_contracts.py is the fallback for any token the explorer does not have
+
+Usage:
+
+>>> spell_contract = contract_load(SPELL_CONTRACT_ADDRESS, "Avalanche Token: SPELL")
+>>> spell_metadata, sspell_metadata = load_token_metadata([spell_contract, sspell_contract])
+"""
+
+import json
+import os
+import sqlite3
+
+from brownie import Contract, chain
+
+from abis_unverified_contracts import ERC20
+from multicall import multicall
+
+CONTRACT_CACHE_FILENAME = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".contract_cache.db"
+)
+
+
+class ContractCache:
+    """
+    SQLite store of contract ABIs and immutable ERC-20 metadata (name, symbol, decimals).
+    Everything is keyed by (chain id, lowercase address).
+    """
+
+    def __init__(self, filename: str = CONTRACT_CACHE_FILENAME) -> None:
+        self._db = sqlite3.connect(filename)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS abis ("
+            "chain_id INTEGER, address TEXT, abi TEXT, "
+            "PRIMARY KEY (chain_id, address))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS tokens ("
+            "chain_id INTEGER, address TEXT, name TEXT, symbol TEXT, decimals INTEGER, "
+            "PRIMARY KEY (chain_id, address))"
+        )
+        self._db.commit()
+
+    def get_abi(self, chain_id: int, address: str):
+        row = self._db.execute(
+            "SELECT abi FROM abis WHERE chain_id = ? AND address = ?",
+            (chain_id, address.lower()),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_abi(self, chain_id: int, address: str, abi: list) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO abis VALUES (?, ?, ?)",
+            (chain_id, address.lower(), json.dumps(abi)),
+        )
+        self._db.commit()
+
+    def get_token(self, chain_id: int, address: str):
+        row = self._db.execute(
+            "SELECT name, symbol, decimals FROM tokens WHERE chain_id = ? AND address = ?",
+            (chain_id, address.lower()),
+        ).fetchone()
+        if not row:
+            return None
+        return {"name": row[0], "symbol": row[1], "decimals": row[2]}
+
+    def set_token(self, chain_id: int, address: str, name: str, symbol: str, decimals: int) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO tokens VALUES (?, ?, ?, ?, ?)",
+            (chain_id, address.lower(), name, symbol, decimals),
+        )
+        self._db.commit()
+
+
+_contract_cache = None
+
+
+def get_contract_cache():
+    global _contract_cache
+    if _contract_cache is None:
+        _contract_cache = ContractCache()
+    return _contract_cache
+
+
+def contract_load(address, alias, erc20_fallback=False):
+    """
+    Load a contract from the local ABI cache.
+    If not cached, try the saved brownie alias, then the explorer, and cache the ABI for next time.
+    With erc20_fallback, use the standard ERC-20 ABI if the explorer has no verified ABI.
+    """
+    cache = get_contract_cache()
+
+    if abi := cache.get_abi(chain.id, address):
+        contract = Contract.from_abi(name=alias, address=address, abi=abi)
+    else:
+        try:
+            contract = Contract(alias)
+        except ValueError:
+            try:
+                contract = Contract.from_explorer(address)
+                contract.set_alias(alias)
+            except Exception as e:
+                if not erc20_fallback:
+                    raise
+                print(f"Exception in contract_load (using ERC-20 ABI): {e}")
+                contract = Contract.from_abi(name=alias, address=address, abi=ERC20)
+        cache.set_abi(chain.id, address, contract.abi)
+
+    print(f"• {alias}")
+    return contract
+
+
+def load_token_metadata(token_contracts):
+    """
+    name, symbol and decimals for every token, from the cache if present,
+    otherwise fetched in one multicall and saved.
+    """
+    cache = get_contract_cache()
+
+    metadata = [cache.get_token(chain.id, token.address) for token in token_contracts]
+    missing = [token for token, data in zip(token_contracts, metadata) if data is None]
+
+    if missing:
+        calls = []
+        for token in missing:
+            calls += [(token.name, []), (token.symbol, []), (token.decimals, [])]
+        results = iter(multicall(calls))
+        fetched = {}
+        for token in missing:
+            name, symbol, decimals = next(results), next(results), next(results)
+            if None in (name, symbol, decimals):
+                raise ValueError(f"Could not load token metadata for {token.address}")
+            cache.set_token(chain.id, token.address, name, symbol, decimals)
+            fetched[token.address] = {"name": name, "symbol": symbol, "decimals": decimals}
+        metadata = [
+            data if data else fetched[token.address]
+            for token, data in zip(token_contracts, metadata)
+        ]
+
+    return metadata
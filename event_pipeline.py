@@ -0,0 +1,284 @@
+"""
+Event Pipeline (asyncio websocket subscriptions)
+
+- listening_for_events.py polls w3.eth.filter('latest') with get_new_entries() and time.sleep(poll_interval),
+  so every event arrives up to poll_interval late, and eth_newFilter is not available on every provider
+- eth_subscribe pushes newHeads and logs over the websocket the moment the node sees them
+- one coroutine only RECEIVES: it reads each message and puts it on a bounded queue
+- consumer coroutines take events off the queues and run the handlers, so a slow handler never blocks reception
+- backpressure instead of dropping: when a queue is full the receiver waits for room,
+  which pauses reading from the socket (the node buffers) rather than losing events in a burst
+- so handlers cannot await pipeline.request(): its response would queue behind the receiver waiting on that handler,
+  a handler that needs a request starts its own task (asyncio.create_task) instead
+- events are sharded across the consumers by contract address, so the events of one pool are always handled in order
+- when the connection drops or a request fails, run() reconnects (backing off while it keeps failing), re-subscribes,
+  and backfills the logs of the gap with eth_getLogs (see log_backfill.py) from the last processed block,
+  live events are held back until the backfill is queued
+- if the gap cannot be fetched, a logs subscription's on_gap() is called instead (e.g. SyncDispatcher.reseed(),
+  which re-reads the reserves), without one the pipeline reconnects and tries the backfill again
+
+Usage:
+
+>>> pipeline = EventPipeline("wss://...")
+>>> pipeline.subscribe_new_heads(handle_block)
+>>> pipeline.subscribe_logs(handle_sync, address=[lp.address], topics=[SYNC_TOPIC])
+>>> asyncio.run(pipeline.run())
+
+From a synchronous bot, run it on its own event loop in a background thread:
+
+>>> pipeline.start()
+"""
+
+import asyncio
+import itertools
+import json
+import threading
+
+import websockets
+
+from log_backfill import get_logs_backfill, to_int
+
+# events buffered per consumer before the receiver waits (backpressure)
+QUEUE_SIZE = 10_000
+
+# seconds to wait before reconnecting a dropped websocket, doubled after every failed connection up to the maximum
+RECONNECT_DELAY = 1
+MAX_RECONNECT_DELAY = 30
+
+
+class EventPipeline:
+    """
+    One websocket connection, any number of eth_subscribe subscriptions.
+    Handlers are called with the subscription result (a block header or a log), and may be plain functions or coroutines.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        consumers: int = 1,
+        queue_size: int = QUEUE_SIZE,
+        reconnect: bool = True,
+        reconnect_delay: float = RECONNECT_DELAY,
+    ) -> None:
+        self.url = url
+        self._consumers = consumers
+        self._queue_size = queue_size
+        self.reconnect = reconnect
+        self.reconnect_delay = reconnect_delay
+        # newest block of any handled event, the backfill after a reconnect starts here
+        self.last_block = None
+        # (eth_subscribe params, handler, on_gap) for every subscription, re-sent on every connection
+        self._subscriptions = []
+        # subscription id -> handler, for the current connection
+        self._handlers = {}
+        # request id -> future, for requests waiting on a response
+        self._pending = {}
+        # request id -> handler, for eth_subscribe requests waiting on their subscription id
+        self._subscribing = {}
+        self._ids = itertools.count(1)
+        self._websocket = None
+        self._queues = []
+        self._consumer_tasks = set()
+        # True once the current connection subscribed (and backfilled)
+        self._subscribed = False
+        # subscription events received during a backfill, queued after it
+        self._held = None
+
+    def subscribe_new_heads(self, handler) -> None:
+        self._subscriptions.append((["newHeads"], handler, None))
+
+    def subscribe_logs(self, handler, address=None, topics=None, on_gap=None) -> None:
+        """
+        on_gap() is called (in a worker thread) when the logs missed while disconnected cannot be backfilled
+        """
+        log_filter = {}
+        if address:
+            log_filter["address"] = address
+        if topics:
+            log_filter["topics"] = topics
+        self._subscriptions.append((["logs", log_filter], handler, on_gap))
+
+    async def request(self, method: str, params: list):
+        """
+        Send a JSON-RPC request over the websocket and wait for its response.
+        Not from a handler: the response may be behind events the receiver is waiting to queue for it.
+        """
+        if asyncio.current_task() in self._consumer_tasks:
+            raise RuntimeError("a handler cannot await pipeline.request(), start a task for it instead")
+        return await self._request(method, params)
+
+    async def _request(self, method: str, params: list, handler=None):
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        if handler is not None:
+            self._subscribing[request_id] = handler
+        await self._websocket.send(
+            json.dumps({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params})
+        )
+        response = await future
+        if "error" in response:
+            raise ValueError(response["error"])
+        return response["result"]
+
+    def start(self) -> threading.Thread:
+        """
+        run() on a new event loop in a daemon thread, handlers are called from that thread
+        """
+        thread = threading.Thread(target=asyncio.run, args=(self.run(),), daemon=True)
+        thread.start()
+        return thread
+
+    async def run(self) -> None:
+        """
+        Connect, subscribe and process events, reconnecting (and backfilling) whenever the connection drops
+        """
+        self._queues = [asyncio.Queue(maxsize=self._queue_size) for _ in range(self._consumers)]
+        consumers = [asyncio.create_task(self._consume(queue)) for queue in self._queues]
+        self._consumer_tasks = set(consumers)
+        delay = self.reconnect_delay
+
+        try:
+            while True:
+                try:
+                    await self._connect()
+                except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException) as e:
+                    print(f"Websocket disconnected: {e}")
+                except Exception as e:
+                    # e.g. a JSON-RPC error (ValueError) from eth_subscribe or the backfill, reconnecting retries both
+                    print(f"Exception in event pipeline: {e}")
+                if not self.reconnect:
+                    break
+                if self._subscribed:
+                    delay = self.reconnect_delay
+                await asyncio.sleep(delay)
+                # back off while connecting keeps failing, until a connection gets subscribed again
+                delay = min(MAX_RECONNECT_DELAY, delay * 2)
+        finally:
+            for consumer in consumers:
+                consumer.cancel()
+
+    async def _connect(self) -> None:
+        """
+        One connection: subscribe, backfill the gap since the last connection, process events until it closes
+        """
+        self._subscribed = False
+        try:
+            async with websockets.connect(self.url, max_size=None) as websocket:
+                self._websocket = websocket
+                receiver = asyncio.create_task(self._receive())
+                try:
+                    await self._subscribe()
+                    await receiver
+                finally:
+                    receiver.cancel()
+                    # handle everything already received before returning
+                    await asyncio.gather(*(queue.join() for queue in self._queues))
+        finally:
+            self._websocket = None
+            self._handlers = {}
+            self._subscribing = {}
+            self._held = None
+            for future in self._pending.values():
+                future.cancel()
+            self._pending = {}
+
+    async def _subscribe(self) -> None:
+        # hold live events back until the missed logs are queued, so each pool still sees its logs in order
+        backfill = self.last_block is not None
+        if backfill:
+            self._held = []
+
+        for params, handler, _ in self._subscriptions:
+            await self._request("eth_subscribe", params, handler=handler)
+
+        if backfill:
+            await self._backfill()
+            held, self._held = self._held, None
+            for handler, result in held:
+                await self._put(handler, result)
+        self._subscribed = True
+
+    async def _backfill(self) -> None:
+        """
+        Queue the logs of every logs subscription from the last processed block to the current head.
+        The last processed block is fetched again, as some of its logs may not have arrived before the drop.
+        """
+        from_block = self.last_block
+        to_block = to_int(await self.request("eth_blockNumber", []))
+
+        for params, handler, on_gap in self._subscriptions:
+            if params[0] != "logs":
+                continue
+            try:
+                logs = await get_logs_backfill(self.request, params[1], from_block, to_block)
+            except Exception as e:
+                if on_gap is None:
+                    raise
+                print(f"Exception in backfill of blocks {from_block} to {to_block}, re-reading the state: {e}")
+                await asyncio.to_thread(on_gap)
+                continue
+            print(f"Backfilled {len(logs)} logs from blocks {from_block} to {to_block}")
+            for log in logs:
+                await self._put(handler, log)
+
+    async def _receive(self) -> None:
+        try:
+            await self._receive_messages()
+        finally:
+            # a closed connection never answers, fail the waiting requests so run() can reconnect
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("websocket closed"))
+            self._pending = {}
+
+    async def _receive_messages(self) -> None:
+        async for message in self._websocket:
+            message = json.loads(message)
+
+            if "id" in message:
+                # register the handler before any event of the new subscription is read
+                handler = self._subscribing.pop(message["id"], None)
+                if handler is not None and "result" in message:
+                    self._handlers[message["result"]] = handler
+                if future := self._pending.pop(message["id"], None):
+                    future.set_result(message)
+                continue
+
+            if message.get("method") != "eth_subscription":
+                continue
+
+            params = message["params"]
+            handler = self._handlers.get(params["subscription"])
+            if handler is None:
+                continue
+
+            result = params["result"]
+            if self._held is not None:
+                self._held.append((handler, result))
+                continue
+            await self._put(handler, result)
+
+    async def _put(self, handler, result) -> None:
+        # keep every log of one contract on the same consumer, so they are handled in order
+        shard = hash(result.get("address", "").lower()) % self._consumers
+
+        # waits here when the consumer is behind (backpressure), events are never dropped
+        await self._queues[shard].put((handler, result))
+
+    async def _consume(self, queue) -> None:
+        while True:
+            handler, result = await queue.get()
+            try:
+                if asyncio.iscoroutinefunction(handler):
+                    await handler(result)
+                else:
+                    handler(result)
+            except Exception as e:
+                print(f"Exception in event handler: {e}")
+            finally:
+                # newHeads results carry "number", logs carry "blockNumber"
+                block_number = result.get("blockNumber", result.get("number"))
+                if block_number is not None:
+                    self.last_block = max(self.last_block or 0, to_int(block_number))
+                queue.task_done()
@@ -1,20 +1,17 @@
-from web3 import Web3, IPCProvider 
-import time 
+import asyncio
 
-w3 = Web3(Web3.WebsocketProvider('wss://...', websocket_timeout=60))
+from event_pipeline import EventPipeline
+
+# eth_subscribe pushes new blocks as they arrive, instead of polling w3.eth.filter('latest') every poll_interval
+WEBSOCKET_URL = 'wss://...'
 
 def handle_event(event):
     print(event)
 
-def log_loop(event_filter, poll_interval):
-    while True:
-        for event in event_filter.get_new_entries():
-            handle_event(event)
-        time.sleep(poll_interval)
-
 def main():
-    block_filter = w3.eth.filter('latest')
-    log_loop(block_filter, 2)
+    pipeline = EventPipeline(WEBSOCKET_URL)
+    pipeline.subscribe_new_heads(handle_event)
+    asyncio.run(pipeline.run())
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,110 @@
+"""
+Log Backfill (catching up after a websocket reconnect)
+
+- a websocket drop leaves every subscription blind until it reconnects, and the logs emitted in the gap are never pushed
+- instead of re-reading every pool with getReserves(), the missed logs are fetched with eth_getLogs,
+  from the last processed block to the current head, with the same filter as the subscription,
+  so only the pools that actually emitted a Sync in the gap are touched
+- providers cap eth_getLogs by block range or result count ("query returned more than 10000 results", ...),
+  the range size adapts: a capped range is split in half and retried, every successful range grows the next one
+- ranges are fetched in parallel, then sorted by (block, log index) before they are handled
+- any other error (an overloaded node, a dropped connection ...) is retried with backoff,
+  a range that still fails raises, and the caller falls back to re-reading the state (see EventPipeline)
+
+Usage:
+
+>>> logs = await get_logs_backfill(pipeline.request, {"topics": [SYNC_TOPIC]}, from_block, to_block)
+"""
+
+import asyncio
+
+# blocks per eth_getLogs range to start with, and the bounds it adapts between
+CHUNK_SIZE = 2_000
+MIN_CHUNK_SIZE = 1
+MAX_CHUNK_SIZE = 100_000
+
+# ranges fetched at the same time
+CONCURRENCY = 4
+
+# attempts after a failed eth_getLogs, and the seconds before the first one (doubled for every next one)
+RETRIES = 3
+RETRY_DELAY = 0.5
+
+# provider error messages meaning the range must be smaller
+TOO_MANY_RESULTS_ERRORS = (
+    "more than",
+    "too many",
+    "limit exceeded",
+    "range",
+    "response size",
+    "timeout",
+)
+
+
+def to_int(value) -> int:
+    # websocket and raw RPC logs use hex strings, web3.py-formatted logs use ints
+    return int(value, 16) if isinstance(value, str) else value
+
+
+def is_too_many_results(error) -> bool:
+    message = str(error).lower()
+    return any(text in message for text in TOO_MANY_RESULTS_ERRORS)
+
+
+async def get_logs_backfill(
+    request,
+    log_filter: dict,
+    from_block: int,
+    to_block: int,
+    chunk_size: int = CHUNK_SIZE,
+    concurrency: int = CONCURRENCY,
+    retries: int = RETRIES,
+    retry_delay: float = RETRY_DELAY,
+) -> list:
+    """
+    All logs matching log_filter between from_block and to_block (inclusive), in chain order.
+    request(method, params) is an async JSON-RPC call, e.g. EventPipeline.request.
+    Raises the last error of a range that still fails after the retries.
+    """
+    logs = []
+    # shared between the workers: the next unfetched block, and the current range size
+    cursor = from_block
+    size = chunk_size
+
+    async def fetch(start: int, end: int) -> None:
+        nonlocal size
+        for attempt in range(retries + 1):
+            try:
+                result = await request(
+                    "eth_getLogs",
+                    [{**log_filter, "fromBlock": hex(start), "toBlock": hex(end)}],
+                )
+                break
+            except (ValueError, OSError, asyncio.TimeoutError) as e:
+                if start < end and is_too_many_results(e):
+                    # capped, shrink and split the range
+                    size = max(MIN_CHUNK_SIZE, (end - start + 1) // 2)
+                    middle = (start + end) // 2
+                    await fetch(start, middle)
+                    await fetch(middle + 1, end)
+                    return
+                if attempt == retries:
+                    raise
+                print(f"Exception in eth_getLogs for blocks {start} to {end}, retrying: {e}")
+                await asyncio.sleep(retry_delay * 2 ** attempt)
+
+        logs.extend(result)
+        size = min(MAX_CHUNK_SIZE, max(size, (end - start + 1) * 2))
+
+    async def worker() -> None:
+        nonlocal cursor
+        while cursor <= to_block:
+            start = cursor
+            end = min(to_block, start + size - 1)
+            cursor = end + 1
+            await fetch(start, end)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    logs.sort(key=lambda log: (to_int(log["blockNumber"]), to_int(log["logIndex"])))
+    return logs
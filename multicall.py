@@ -0,0 +1,146 @@
+"""
+Multicall (batched contract reads)
+
+- every token.name.call(), token.symbol.call(), token.balanceOf.call(user) ... is its own RPC round-trip
+- startup with 20 tokens is 80 sequential round-trips before the bot does anything useful
+- Multicall3 is a contract deployed at the same address on almost every chain (Ethereum, Avalanche, Arbitrum ...)
+  that executes a list of calls and returns all of the results in ONE eth_call
+- if Multicall3 is not available, fall back to a JSON-RPC batch: a list of eth_call requests in one HTTP request
+
+Usage:
+
+>>> results = multicall([
+...     (spell_contract.symbol, []),
+...     (spell_contract.balanceOf, [user.address]),
+... ])
+>>> symbol, balance = results
+"""
+
+from brownie import Contract
+
+from batch_transport import get_batch_transport
+
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+MULTICALL3_ABI = [
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"internalType": "address", "name": "target", "type": "address"},
+                    {"internalType": "bool", "name": "allowFailure", "type": "bool"},
+                    {"internalType": "bytes", "name": "callData", "type": "bytes"},
+                ],
+                "internalType": "struct Multicall3.Call3[]",
+                "name": "calls",
+                "type": "tuple[]",
+            }
+        ],
+        "name": "aggregate3",
+        "outputs": [
+            {
+                "components": [
+                    {"internalType": "bool", "name": "success", "type": "bool"},
+                    {"internalType": "bytes", "name": "returnData", "type": "bytes"},
+                ],
+                "internalType": "struct Multicall3.Result[]",
+                "name": "returnData",
+                "type": "tuple[]",
+            }
+        ],
+        "stateMutability": "payable",
+        "type": "function",
+    }
+]
+
+_multicall_contract = None
+
+
+def get_multicall_contract():
+    global _multicall_contract
+    if _multicall_contract is None:
+        _multicall_contract = Contract.from_abi(
+            name="Multicall3",
+            address=MULTICALL3_ADDRESS,
+            abi=MULTICALL3_ABI,
+        )
+    return _multicall_contract
+
+
+def multicall(calls, block_identifier=None):
+    """
+    Execute a list of (brownie ContractCall, [args]) pairs in a single request.
+    Returns the decoded results in the same order, None for any call that failed.
+    """
+    if not calls:
+        return []
+
+    try:
+        results = get_multicall_contract().aggregate3.call(
+            [(fn._address, True, fn.encode_input(*args)) for fn, args in calls],
+            block_identifier=block_identifier,
+        )
+    except Exception as e:
+        print(f"Exception in multicall (falling back to JSON-RPC batch): {e}")
+        return batch_eth_call(calls, block_identifier)
+
+    decoded = []
+    for (fn, _), (success, return_data) in zip(calls, results):
+        if not success:
+            decoded.append(None)
+            continue
+        try:
+            decoded.append(fn.decode_output(return_data))
+        except Exception:
+            decoded.append(None)
+    return decoded
+
+
+def batch_eth_call(calls, block_identifier=None):
+    """
+    Fallback for chains without Multicall3: send every eth_call in one JSON-RPC batch request.
+    Only works with HTTP providers, which expose an endpoint_uri.
+    """
+    # batch_transport.py matches the responses back to the calls by id
+    return get_batch_transport().call_many(calls, block_identifier)
+
+
+def get_token_info_batch(token_contracts, user, spender_addresses=(), block_identifier=None):
+    """
+    name, symbol, decimals, balance and allowances (for each spender, e.g. routers) for every token in one request.
+    Returns one dict per token, with allowances keyed by spender address.
+    """
+    calls = []
+    for token in token_contracts:
+        calls.append((token.name, []))
+        calls.append((token.symbol, []))
+        calls.append((token.decimals, []))
+        calls.append((token.balanceOf, [user.address]))
+        for spender in spender_addresses:
+            calls.append((token.allowance, [user.address, spender]))
+
+    results = iter(multicall(calls, block_identifier))
+
+    token_info = []
+    for token in token_contracts:
+        info = {
+            "name": next(results),
+            "symbol": next(results),
+            "decimals": next(results),
+            "balance": next(results),
+            "allowances": {},
+        }
+        for spender in spender_addresses:
+            info["allowances"][spender] = next(results)
+        token_info.append(info)
+    return token_info
+
+
+def get_token_balances_batch(token_contracts, user, block_identifier=None):
+    """
+    balanceOf(user) for every token in one request
+    """
+    return multicall(
+        [(token.balanceOf, [user.address]) for token in token_contracts],
+        block_identifier,
+    )
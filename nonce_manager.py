@@ -0,0 +1,93 @@
+"""
+Nonce Manager (pipelined transaction submission)
+
+- router.swapExactTokensForTokens(..., {"from": user}) fetches the nonce, broadcasts, then BLOCKS until the receipt
+  is mined, so N transactions (e.g. the startup approvals for every router x token) take N block times
+- the next nonce is tracked locally instead: each transaction takes the next number, is broadcast with
+  required_confs=0 (brownie returns the pending TransactionReceipt immediately), and the next one follows
+  without waiting, so N transactions take N signing operations
+- confirmations are awaited only where the result matters (e.g. before refreshing balances), all at once with wait()
+- if a transaction fails to broadcast (nonce too low, underpriced, dropped ...) the local nonce is re-read from the
+  chain's pending count, so the next transaction does not leave a gap
+
+Usage:
+
+>>> nonce_manager = NonceManager(user)
+>>> txs = [nonce_manager.transact(token.approve, router.address, 2 ** 256 - 1) for token in tokens]
+>>> nonce_manager.wait(txs)
+"""
+
+import threading
+
+from brownie import web3
+
+
+class NonceManager:
+    """
+    Hands out consecutive nonces for one account, thread-safe
+    """
+
+    def __init__(self, account) -> None:
+        self._account = account
+        self._lock = threading.Lock()
+        self._next_nonce = None
+
+    @property
+    def address(self):
+        return self._account.address
+
+    def sync(self) -> int:
+        """
+        Re-read the next nonce from the chain (including pending transactions)
+        """
+        with self._lock:
+            self._next_nonce = web3.eth.get_transaction_count(self._account.address, "pending")
+            return self._next_nonce
+
+    def next_nonce(self) -> int:
+        if self._next_nonce is None:
+            self.sync()
+        with self._lock:
+            nonce = self._next_nonce
+            self._next_nonce += 1
+            return nonce
+
+    def transact(self, fn, *args, gas_limit: int = None, tx_params: dict = None):
+        """
+        Call a state-changing ContractTx with the next local nonce, without waiting for it to be mined.
+        Returns the pending TransactionReceipt.
+        A known gas_limit skips brownie's eth_estimateGas round-trip.
+        """
+        tx = {"from": self._account, "required_confs": 0}
+        if tx_params:
+            tx.update(tx_params)
+        if gas_limit:
+            tx["gas_limit"] = gas_limit
+        tx["nonce"] = self.next_nonce()
+
+        try:
+            return fn(*args, tx)
+        except Exception:
+            # the nonce was not used, re-sync so the next transaction does not leave a gap
+            self.sync()
+            raise
+
+    def wait(self, transactions, required_confs: int = 1) -> list:
+        """
+        Block until every pending transaction has required_confs confirmations.
+        Accepts brownie TransactionReceipts and transaction hashes (e.g. from swap_templates.py).
+        Returns the transactions that reverted.
+        """
+        reverted = []
+        for tx in transactions:
+            if tx is None:
+                continue
+            if isinstance(tx, str):
+                # raw transactions sent without brownie only have a hash
+                if web3.eth.wait_for_transaction_receipt(tx)["status"] != 1:
+                    reverted.append(tx)
+                continue
+            tx.wait(required_confs)
+            if tx.status != 1:
+                reverted.append(tx)
+        return reverted
@@ -2,12 +2,20 @@
 ERC20 Token Class
 """
 
+from brownie import Contract, chain, network
+
+from abis_unverified_contracts import ERC20
+from contract_cache import get_contract_cache, load_token_metadata
+from multicall import get_token_balances_batch, get_token_info_batch
+
 class Erc20Token:
     """
     Represents an ERC-20 token. Must be initialized with an address. 
     Brownie will load the Contract object from the supplied ABI (if given),
-    then attempt to load the verified ABI from the block explorer.
+    then the on-disk ABI cache (see contract_cache.py), then attempt to load the verified ABI from the block explorer.
     If both methods fail, it will attempt to use a supplied ERC-20 ABI
+    If metadata is supplied (see load_erc20_tokens), the name, symbol,
+    decimals and balance are taken from it instead of four separate calls
     """
     def __init__(
         self, 
@@ -15,6 +23,7 @@ class Erc20Token:
         user: network.account.LocalAccount, 
         abi: list = None, 
         oraacle_address: str = None,
+        metadata: dict = None,
         ) -> None:
         self.address = address 
         self._user = user 
@@ -27,6 +36,12 @@ class Erc20Token:
                 )
             except:
                 raise 
+        elif cached_abi := get_contract_cache().get_abi(chain.id, self.address):
+            self._brownie_contract = Contract.from_abi(
+                name="",
+                address=self.address,
+                abi=cached_abi
+            )
         else:
             try:
                 self._brownie_contract = Contract.from_explorer(
@@ -38,10 +53,24 @@ class Erc20Token:
                     address=self.address,
                     abi=ERC20
                 )
-        self.name = self._brownie_contract.name.call()
-        self.symbol = self._brownie_contract.symbol.call()
-        self.decimals = self._brownie_contract.decimals.call()
-        self.balance = self._brownie_contract.balanceOf.call(self._user)
+            get_contract_cache().set_abi(chain.id, self.address, self._brownie_contract.abi)
+        if metadata:
+            self.name = metadata["name"]
+            self.symbol = metadata["symbol"]
+            self.decimals = metadata["decimals"]
+            self.balance = metadata["balance"]
+            self.allowances = metadata.get("allowances", {})
+        else:
+            # name, symbol and decimals never change, so they come from the on-disk cache after the first run
+            cached_metadata = load_token_metadata([self._brownie_contract])[0]
+            self.name = cached_metadata["name"]
+            self.symbol = cached_metadata["symbol"]
+            self.decimals = cached_metadata["decimals"]
+            self.balance = self._brownie_contract.balanceOf.call(self._user)
+            self.allowances = {}
+        # multicall() returns None for a failed read
+        if None in (self.name, self.symbol, self.decimals, self.balance):
+            raise ValueError(f"Could not load token data for {self.address}!")
         self.normalized_balance = self.balance / (10 ** self.decimals)
         if oraacle_address:
             self._price_oracle = ChainlinkPriceContract(
@@ -54,13 +83,23 @@ class Erc20Token:
         return self.symbol
 
     def get_approval(self, external_address: str):
+        # allowances fetched by load_erc20_tokens() are kept until set_approval() changes them
+        if (allowance := self.allowances.get(external_address)) is not None:
+            return allowance
         return self._brownie_contract.allowance.call(self._user.address, external_address)
 
-    def set_approval(self, external_address: str, value: int):
+    def set_approval(self, external_address: str, value: int, nonce_manager=None):
         if value == "unlimited":
             value = 2 ** 256 - 1
+        # the next get_approval() reads the new allowance from the chain
+        self.allowances.pop(external_address, None)
 
         try:
+            # with a NonceManager the approval is broadcast without waiting, returns the pending transaction
+            if nonce_manager:
+                return nonce_manager.transact(
+                    self._brownie_contract.approve, external_address, value
+                )
             self._brownie_contract.approve(
                 external_address,
                 value,
@@ -78,4 +117,40 @@ class Erc20Token:
     def update_price(self):
         self.price = self._price_oracle.update_price()
 
-        
\ No newline at end of file
+
+def load_erc20_tokens(
+    addresses: list,
+    user: network.account.LocalAccount,
+    abi: list = None,
+    spender_addresses: list = (),
+) -> list:
+    """
+    Build an Erc20Token for every address, fetching all of the names, symbols,
+    decimals, balances and allowances (for each spender, e.g. routers) in one batched request
+    """
+    if not abi:
+        abi = ERC20
+    contracts = [
+        Contract.from_abi(name="", address=address, abi=abi)
+        for address in addresses
+    ]
+    token_info = get_token_info_batch(contracts, user, spender_addresses)
+    return [
+        Erc20Token(address=address, user=user, abi=abi, metadata=metadata)
+        for address, metadata in zip(addresses, token_info)
+    ]
+
+
+def update_balances(tokens: list) -> None:
+    """
+    Refresh the balance of every Erc20Token in one batched request
+    """
+    if not tokens:
+        return
+    balances = get_token_balances_batch(
+        [token._brownie_contract for token in tokens], tokens[0]._user
+    )
+    for token, balance in zip(tokens, balances):
+        if balance is not None:
+            token.balance = balance
+            token.normalized_balance = token.balance / (10 ** token.decimals)
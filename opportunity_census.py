@@ -0,0 +1,187 @@
+"""
+Opportunity Census (how often, and how large, were the mispricings of a pool)
+
+- for every block where a pool's reserves or its fair price changed (the staking rate for SPELL/sSPELL),
+  using the pool's last reserve state in that block, compute in both directions:
+    • the profit-maximizing arbitrage size and its profit (price target, see get_tokens_in_for_price_target)
+    • the largest size that does not lose against the fair price (ratio target, see get_tokens_in_for_ratio_out)
+- the blocks are the union of Sync blocks and price change blocks, as in backtester.build_events()
+- everything is float64 NumPy over whole columns, no Python loop per row, millions of rows take seconds
+- any number of pools, each with its own price history, rows of all pools are combined
+- results: a histogram of the profit, a histogram of the optimal size, and a time series of
+  opportunities and profit per BUCKET_BLOCKS, printed and written as CSV
+
+Formulas (x = reserve in, y = reserve out, g = 1 - fee, p = fair price of the input in output tokens):
+
+    optimal input:      dx = (sqrt(g * x * y / p) - x) / g
+    profit:             g * dx * y / (x + g * dx) - p * dx      (in output tokens)
+    break-even input:   dx = y / p - x / g
+
+Usage:
+
+$ python3 opportunity_census.py rate_history.csv                    (the SPELL/sSPELL pool)
+$ python3 opportunity_census.py 0xPOOL=prices.csv 0xPOOL2=prices2.csv   (price files are rows of block,price)
+
+>>> result = census(history.pool_records(POOL), price_blocks, prices)
+>>> result = census_pools(history, {POOL: (price_blocks, prices), ...})
+"""
+
+import csv
+import sys
+
+import numpy as np
+
+from backtester import POOL, build_events, load_rate_history
+from pool_math import DEFAULT_FEE
+from sync_history import SyncHistory, reserve_float
+
+# ~1 day of Avalanche blocks (2 second blocks)
+BUCKET_BLOCKS = 43_200
+# histogram bins per decade of profit / size
+BINS_PER_DECADE = 4
+# profits below this (in output tokens, 18 decimals) are not counted as opportunities
+MIN_PROFIT = 1e15
+
+HISTOGRAM_FILENAME = "census_histogram.csv"
+TIME_SERIES_FILENAME = "census_time_series.csv"
+
+
+def optimal_arbitrage(reserve_in: np.ndarray, reserve_out: np.ndarray, price: np.ndarray, fee=DEFAULT_FEE):
+    """
+    Returns (optimal input, profit in output tokens, break-even input), all 0 where there is no opportunity
+    """
+    fee_multiplier = 1 - float(fee)
+    size = np.maximum((np.sqrt(fee_multiplier * reserve_in * reserve_out / price) - reserve_in) / fee_multiplier, 0)
+    profit = fee_multiplier * size * reserve_out / (reserve_in + fee_multiplier * size) - price * size
+    break_even = np.maximum(reserve_out / price - reserve_in / fee_multiplier, 0)
+    return size, np.maximum(profit, 0), break_even
+
+
+def census(records: np.ndarray, price_blocks: np.ndarray, prices: np.ndarray, fee=DEFAULT_FEE) -> dict:
+    """
+    Arbitrage size and profit for ONE pool at every block where its reserves or its price changed.
+    prices are the fair price of token0 in token1 (e.g. SPELL per sSPELL) from price_blocks on.
+    Profit is reported in token1.
+    """
+    # one row per block: the last record of the block, and blocks where only the price changed
+    blocks, record_index, price = build_events(records, price_blocks, prices)
+    reserve0 = reserve_float(records, 0)[record_index]
+    reserve1 = reserve_float(records, 1)[record_index]
+
+    # token0 in (token0 cheap in the pool), profit in token1
+    size0, profit0, break_even0 = optimal_arbitrage(reserve0, reserve1, price, fee)
+    # token1 in (token1 cheap in the pool), profit in token0, converted to token1
+    size1, profit1, break_even1 = optimal_arbitrage(reserve1, reserve0, 1 / price, fee)
+    profit1 = profit1 * price
+
+    token0_in = profit0 >= profit1
+    return {
+        "block": blocks,
+        "token0_in": token0_in,
+        "size": np.where(token0_in, size0, size1),
+        "profit": np.where(token0_in, profit0, profit1),
+        "break_even_size": np.where(token0_in, break_even0, break_even1),
+    }
+
+
+def census_pools(history: SyncHistory, pool_prices: dict, fee=DEFAULT_FEE) -> dict:
+    """
+    census() of every pool (address -> (price blocks, prices)), rows of all pools combined.
+    "pool" is the index of the row's pool in pool_prices.
+    """
+    results = [census(history.pool_records(address), *prices, fee) for address, prices in pool_prices.items()]
+    combined = {
+        key: np.concatenate([result[key] for result in results])
+        for key in ("block", "token0_in", "size", "profit", "break_even_size")
+    }
+    combined["pool"] = np.repeat(np.arange(len(results)), [len(result["block"]) for result in results])
+    return combined
+
+
+def log_histogram(values: np.ndarray, minimum: float):
+    """
+    Histogram of the values at or above minimum, on log10 bins. Returns (counts, bin edges).
+    """
+    values = values[values >= minimum]
+    if not len(values):
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    low = np.floor(np.log10(minimum))
+    high = np.ceil(np.log10(values.max())) + 1 / BINS_PER_DECADE
+    edges = 10 ** np.arange(low, high, 1 / BINS_PER_DECADE)
+    counts, edges = np.histogram(values, bins=edges)
+    return counts, edges
+
+
+def time_series(result: dict, bucket_blocks: int = BUCKET_BLOCKS, min_profit: float = MIN_PROFIT):
+    """
+    Opportunities, total profit and largest profit per bucket of blocks.
+    Returns (bucket start blocks, counts, total profit, max profit).
+    """
+    blocks = result["block"]
+    if not len(blocks):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0)
+
+    profit = np.where(result["profit"] >= min_profit, result["profit"], 0)
+    # rows of several pools are not in block order
+    first_block = blocks.min()
+    bucket = (blocks - first_block) // bucket_blocks
+    buckets = int(bucket.max()) + 1
+
+    counts = np.bincount(bucket, weights=profit > 0, minlength=buckets).astype(np.int64)
+    totals = np.bincount(bucket, weights=profit, minlength=buckets)
+    maxima = np.zeros(buckets)
+    np.maximum.at(maxima, bucket, profit)
+    return first_block + np.arange(buckets) * bucket_blocks, counts, totals, maxima
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit(
+            "Usage: python3 opportunity_census.py rate_history.csv | pool_address=price_history.csv ... (rows of block,price)"
+        )
+
+    # pool address -> price history file, a bare file name is the SPELL/sSPELL staking rate history
+    pool_files = dict(arg.split("=", 1) if "=" in arg else (POOL, arg) for arg in sys.argv[1:])
+
+    history = SyncHistory()
+    for address in pool_files:
+        if address.lower() not in history.pools:
+            sys.exit(f"No recorded history for {address}, run `python3 sync_history.py` first")
+
+    result = census_pools(history, {address: load_rate_history(filename) for address, filename in pool_files.items()})
+
+    # profits are in each pool's token1 (SPELL for SPELL/sSPELL)
+    profitable = result["profit"] >= MIN_PROFIT
+    print(f"{len(result['block'])} pool states, {np.count_nonzero(profitable)} with profit >= {MIN_PROFIT / 10 ** 18} token1")
+    for pool, address in enumerate(pool_files):
+        rows = profitable & (result["pool"] == pool)
+        print(f"\n{address}:")
+        print(f"• token0 -> token1: {np.count_nonzero(rows & result['token0_in'])}")
+        print(f"• token1 -> token0: {np.count_nonzero(rows & ~result['token0_in'])}")
+        print(f"• total profit: {result['profit'][rows].sum() / 10 ** 18:.2f} token1")
+
+    profit_counts, profit_edges = log_histogram(result["profit"], MIN_PROFIT)
+    size_counts, size_edges = log_histogram(result["size"][profitable], 1.0)
+
+    print("\nProfit (token1):")
+    for count, low, high in zip(profit_counts, profit_edges, profit_edges[1:]):
+        print(f"{low / 10 ** 18:>14.4f} - {high / 10 ** 18:<14.4f} {count:>8} {'#' * int(60 * count / max(profit_counts.max(), 1))}")
+
+    with open(HISTOGRAM_FILENAME, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(("histogram", "low", "high", "count"))
+        for name, counts, edges in (("profit", profit_counts, profit_edges), ("size", size_counts, size_edges)):
+            writer.writerows((name, low, high, count) for count, low, high in zip(counts, edges, edges[1:]))
+
+    starts, counts, totals, maxima = time_series(result)
+    with open(TIME_SERIES_FILENAME, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(("block", "opportunities", "total_profit", "max_profit"))
+        writer.writerows(zip(starts.tolist(), counts.tolist(), totals.tolist(), maxima.tolist()))
+
+    print(f"\nHistograms written to {HISTOGRAM_FILENAME}, time series to {TIME_SERIES_FILENAME}")
+
+
+# Only executes main loop if this file is called directly
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Parameter Sweep (THRESHOLD_SPELL_TO_SSPELL / THRESHOLD_SSPELL_TO_SPELL / SLIPPAGE over recorded history)
+
+- the thresholds in the sSPELL bots were tuned by hand (0.2 * PERCENT, 0.5 * PERCENT, Decimal("0.02") ...)
+- every combination of the grid below is run through backtester.run_backtest() on a process pool,
+  one worker per core
+- each worker opens the Sync history with np.memmap (read-only), so all workers share the same page cache
+  instead of each holding a copy, and prepares the parameter-independent events once
+- the results are ranked by PnL net of gas (gas valued at SPELL_PER_AVAX) and written to a CSV
+
+Usage:
+
+$ python3 parameter_sweep.py rate_history.csv
+"""
+
+import csv
+import itertools
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+from backtester import POOL, load_rate_history, prepare_events, run_backtest
+from sync_history import HISTORY_FILENAME, SyncHistory
+
+# 25 x 25 x 16 = 10,000 combinations
+THRESHOLDS_SPELL_TO_SSPELL = np.round(np.linspace(-0.01, 0.05, 25), 4)
+THRESHOLDS_SSPELL_TO_SPELL = np.round(np.linspace(0.0, 0.06, 25), 4)
+SLIPPAGES = np.round(np.linspace(0.0005, 0.008, 16), 5)
+
+# AVAX price in SPELL, to rank by PnL net of gas (0 ranks by PnL alone)
+SPELL_PER_AVAX = 0
+
+RESULTS_FILENAME = "sweep_results.csv"
+# rows printed after the sweep
+TOP_ROWS = 20
+
+# set in every worker by init_worker()
+_records = None
+_rate_blocks = None
+_rates = None
+_events = None
+
+
+def init_worker(history_filename: str, rate_filename: str) -> None:
+    global _records, _rate_blocks, _rates, _events
+    _records = SyncHistory(history_filename).pool_records(POOL)
+    _rate_blocks, _rates = load_rate_history(rate_filename)
+    _events = prepare_events(_records, _rate_blocks, _rates)
+
+
+def evaluate(params):
+    threshold_spell_to_sspell, threshold_sspell_to_spell, slippage = params
+    result = run_backtest(
+        _records,
+        _rate_blocks,
+        _rates,
+        threshold_spell_to_sspell=threshold_spell_to_sspell,
+        threshold_sspell_to_spell=threshold_sspell_to_spell,
+        slippage=slippage,
+        keep_trades=False,
+        events=_events,
+    )
+    return (
+        threshold_spell_to_sspell,
+        threshold_sspell_to_spell,
+        slippage,
+        result["pnl"] / 10 ** 18,
+        result["fills"],
+        result["reverts"],
+        result["gas"] / 10 ** 18,
+    )
+
+
+def sweep(
+    rate_filename: str,
+    history_filename: str = HISTORY_FILENAME,
+    grid=None,
+    processes: int = None,
+) -> list:
+    """
+    Backtest every (threshold_spell_to_sspell, threshold_sspell_to_spell, slippage) in the grid.
+    Returns rows of (thresholds, slippage, pnl SPELL, fills, reverts, gas AVAX, net SPELL), best first.
+    """
+    if grid is None:
+        grid = itertools.product(
+            THRESHOLDS_SPELL_TO_SSPELL.tolist(), THRESHOLDS_SSPELL_TO_SPELL.tolist(), SLIPPAGES.tolist()
+        )
+    grid = list(grid)
+    processes = processes or os.cpu_count()
+
+    with Pool(processes, initializer=init_worker, initargs=(history_filename, rate_filename)) as pool:
+        # a few hundred tasks per worker keeps the cores busy without per-task overhead
+        chunksize = max(1, len(grid) // (processes * 16))
+        rows = [row + (row[3] - row[6] * SPELL_PER_AVAX,) for row in pool.imap_unordered(evaluate, grid, chunksize)]
+
+    rows.sort(key=lambda row: row[-1], reverse=True)
+    return rows
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python3 parameter_sweep.py rate_history.csv (rows of block,rate)")
+
+    if POOL.lower() not in SyncHistory().pools:
+        sys.exit(f"No recorded history for {POOL}, run `python3 sync_history.py` first")
+
+    start = time.time()
+    rows = sweep(sys.argv[1])
+    print(f"{len(rows)} combinations in {time.time() - start:.1f}s on {os.cpu_count()} cores\n")
+
+    header = ("spell->sspell", "sspell->spell", "slippage", "pnl", "fills", "reverts", "gas", "net")
+    with open(RESULTS_FILENAME, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+    print("".join(f"{title:>15}" for title in header))
+    for row in rows[:TOP_ROWS]:
+        print("".join(f"{value:>15.4f}" if isinstance(value, float) else f"{value:>15}" for value in row))
+    print(f"\nAll results written to {RESULTS_FILENAME}")
+
+
+# Only executes main loop if this file is called directly
+if __name__ == "__main__":
+    main()
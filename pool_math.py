@@ -0,0 +1,149 @@
+"""
+Uniswap V2 Pool Math (exact integer arithmetic)
+
+- the router quotes with integer math: amountInWithFee = amountIn * 997, then floor division
+- mixing ints with Decimal("0.003") and "/" float division does not match the router
+  (see the "Difference" printout in pool_reserves/fun_w_pool_reserves.py) and allocates Decimals on every quote
+- everything here is int numerator / denominator arithmetic, the fee and ratios are Fractions
+- get_amount_out() and get_amount_in() reproduce UniswapV2Library.getAmountOut / getAmountIn bit-for-bit,
+  so a local quote can replace router.getAmountsOut
+
+Formulas (x = reserve in, y = reserve out, fee = n/d):
+
+    getAmountOut:   dy = (dx * (d - n) * y) // (x * d + dx * (d - n))
+    getAmountIn:    dx = (x * dy * d) // ((y - dy) * (d - n)) + 1
+
+Ratio target (largest input whose average swap rate is still at least the target ratio C):
+
+    dy = x0/C - y0/(1 - fee)        (token1 in, token0 out)
+    dx = y0*C - x0/(1 - fee)        (token0 in, token1 out)
+
+Price target (input that moves the marginal rate of the pool to the target, also the profit-maximizing
+arbitrage size against an external price):
+
+    x + (1 - fee) * dx = sqrt((1 - fee) * x * y / target)
+"""
+
+from fractions import Fraction
+from math import isqrt
+
+# TraderJoe, SushiSwap and Uniswap V2 all charge 0.3%
+DEFAULT_FEE = Fraction(3, 1000)
+
+
+def get_amount_out(
+    amount_in: int,
+    reserve_in: int,
+    reserve_out: int,
+    fee: Fraction = DEFAULT_FEE,
+) -> int:
+    """
+    Output for an exact input, identical to UniswapV2Library.getAmountOut()
+    """
+    amount_in_with_fee = amount_in * (fee.denominator - fee.numerator)
+    return (amount_in_with_fee * reserve_out) // (
+        reserve_in * fee.denominator + amount_in_with_fee
+    )
+
+
+def get_amount_in(
+    amount_out: int,
+    reserve_in: int,
+    reserve_out: int,
+    fee: Fraction = DEFAULT_FEE,
+) -> int:
+    """
+    Input required for an exact output, identical to UniswapV2Library.getAmountIn()
+    """
+    assert amount_out < reserve_out, "amount_out must be less than reserve_out"
+    return (reserve_in * amount_out * fee.denominator) // (
+        (reserve_out - amount_out) * (fee.denominator - fee.numerator)
+    ) + 1
+
+
+def get_tokens_out_for_tokens_in(
+    pool_reserves_token0: int,
+    pool_reserves_token1: int,
+    quantity_token0_in: int = 0,
+    quantity_token1_in: int = 0,
+    fee: Fraction = DEFAULT_FEE,
+) -> int:
+    # fails if two input tokens are passed, or if both are 0
+    assert not (quantity_token0_in and quantity_token1_in)
+    assert quantity_token0_in or quantity_token1_in
+
+    fee = Fraction(fee)
+
+    if quantity_token0_in:
+        return get_amount_out(
+            quantity_token0_in, pool_reserves_token0, pool_reserves_token1, fee
+        )
+
+    if quantity_token1_in:
+        return get_amount_out(
+            quantity_token1_in, pool_reserves_token1, pool_reserves_token0, fee
+        )
+
+
+def get_tokens_in_for_ratio_out(
+    pool_reserves_token0: int,
+    pool_reserves_token1: int,
+    token0_out: bool = False,
+    token1_out: bool = False,
+    token0_per_token1=0,
+    fee: Fraction = DEFAULT_FEE,
+) -> int:
+    assert not (token0_out and token1_out)
+    assert token0_per_token1
+
+    # Decimal, float and int ratios are all converted exactly
+    ratio = Fraction(token0_per_token1)
+    fee = Fraction(fee)
+    # (1 - fee) = fee_multiplier / fee.denominator
+    fee_multiplier = fee.denominator - fee.numerator
+
+    # token1 input, token0 output
+    if token0_out:
+        # dy = x0/C - y0/(1 - FEE)
+        dy = (
+            pool_reserves_token0 * ratio.denominator * fee_multiplier
+            - pool_reserves_token1 * fee.denominator * ratio.numerator
+        ) // (ratio.numerator * fee_multiplier)
+        return max(dy, 0)
+
+    # token0 input, token1 output
+    if token1_out:
+        # dx = y0*C - x0/(1 - FEE)
+        dx = (
+            pool_reserves_token1 * ratio.numerator * fee_multiplier
+            - pool_reserves_token0 * fee.denominator * ratio.denominator
+        ) // (ratio.denominator * fee_multiplier)
+        return max(dx, 0)
+
+
+def get_tokens_in_for_price_target(
+    reserve_in: int,
+    reserve_out: int,
+    out_per_in,
+    fee: Fraction = DEFAULT_FEE,
+) -> int:
+    """
+    Input that moves the pool's marginal rate (tokens out per token in, after fee) down to out_per_in.
+
+    When out_per_in is the external price of the input token (in units of the output token),
+    this is the profit-maximizing arbitrage size. Returns 0 if the pool is already at or below the target.
+    """
+    target = Fraction(out_per_in)
+    fee = Fraction(fee)
+    fee_multiplier = fee.denominator - fee.numerator
+
+    # d*x + (d - n)*dx = isqrt((d - n) * d * x * y / target)
+    root = isqrt(
+        fee_multiplier
+        * fee.denominator
+        * reserve_in
+        * reserve_out
+        * target.denominator
+        // target.numerator
+    )
+    return max((root - reserve_in * fee.denominator) // fee_multiplier, 0)
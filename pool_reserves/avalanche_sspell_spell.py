@@ -1,13 +1,27 @@
 
 import sys 
 import time 
-import datetime 
-import requests 
 import os 
-import json 
-from decimal import Decimal 
+from decimal import Decimal
+from fractions import Fraction 
 from brownie import * 
 
+# shared helpers live in the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from reserve_cache import ReserveCache
+from pool_math import get_tokens_in_for_ratio_out, get_tokens_out_for_tokens_in
+from multicall import get_token_balances_batch, get_token_info_batch
+# contract_load() reads ABIs from the on-disk cache, so a restart needs no explorer calls
+from contract_cache import contract_load
+# staking rate published by ethereum_abra_staking_watcher.py into shared memory
+from rate_channel import RateSubscriber
+from block_scheduler import BlockScheduler
+from block_snapshot import BlockSnapshot
+from event_pipeline import EventPipeline
+from sync_dispatch import SyncDispatcher
+from nonce_manager import NonceManager
+from rpc_pool import ENDPOINTS, use_rpc_pool
+
 # Contract addresses (verify on Snowtrace)
 TRADERJOE_ROUTER_CONTRACT_ADDRESS = "0x60aE616a2155Ee3d9A68541Ba4544862310933d4"
 TRADERJOE_POOL_CONTRACT_ADDRESS = "0x033C3Fc1fC13F803A233D262e24d1ec3fd4EFB48"
@@ -21,6 +35,9 @@ load_dotenv()
 # use python-dotenv to get API key
 os.environ.get('SNOWTRACE_TOKEN')
 
+# websocket endpoint for newHeads and Sync subscriptions, without it the bot polls (see block_scheduler.py)
+WEBSOCKET_URL = os.environ.get("WEBSOCKET_URL")
+
 # Helper Values
 SECOND = 1
 MINUTE = 60 * SECOND
@@ -40,20 +57,22 @@ THRESHOLD_SSPELL_TO_SPELL = Decimal("0.05")
 
 SLIPPAGE = Decimal("0.001") # tolerated slippage in swap price (0.1%)
 
-BASE_STAKING_RATE_FILENAME = ".abra_rate"
+PRIORITY_FEE = "5 gwei"
+# max fee = base fee * BASE_FEE_MULTIPLIER + priority fee, room for the base fee to rise before inclusion
+BASE_FEE_MULTIPLIER = 2
 
 # Simulate swaps and approvals
 DRY_RUN = True
 # Quit after the first successful trade
 ONE_SHOT = False
-# How often to run the main loop (in seconds)
+# How often the scheduler checks for a new block (in seconds), see block_scheduler.py
 LOOP_TIME = 1.0
 
 """
 [MAIN PROGRAM LOOP]
 
+apply new Sync events to the cached pool reserves (wait for the next block if nothing changed)
 if token['balance']:
-    get pool reserves 
     check maximum input using get_tokens_in_for_ratio_out()
     check maximum output using get_tokens_out_from_tokens_in()
     call token_swap() using input and output amounts from the two functions 
@@ -66,6 +85,9 @@ def main():
     global spell 
     global sspell 
     global user 
+    global lp_reserves 
+    global nonce_manager 
+    global pending_swaps 
 
     try:
         network.connect("avax-main")
@@ -74,8 +96,14 @@ def main():
             "Could not connect to Avalanche! Verify that brownie lists the Avalanche Mainnet using 'brownie networks list'"
         )
 
+    # with RPC_ENDPOINTS in .env, reads go to the fastest healthy endpoint and slow ones are hedged
+    if ENDPOINTS:
+        use_rpc_pool(ENDPOINTS)
+
     try: 
         user = accounts.load("trade_account")
+        # nonces are tracked locally, so transactions are sent back-to-back without waiting for receipts
+        nonce_manager = NonceManager(user)
     except:
         sys.exit(
             "Could not load account! Verify that your account is listed using 'brownie accounts list' and that you are using the correct password. If you have not added an account, run 'brownie accounts new' now."
@@ -94,6 +122,12 @@ def main():
         TRADERJOE_POOL_CONTRACT_ADDRESS, "TraderJoe LP: SPELL-sSPELL"
     )
 
+    # seed the pool reserves once, then keep them current with Sync events:
+    # pushed over the websocket if there is one, otherwise polled from a Sync filter
+    lp_reserves = ReserveCache(
+        traderjoe_lp, name="TraderJoe LP: SPELL-sSPELL", sync_filter=not WEBSOCKET_URL
+    )
+
     spell = {
         "address": SPELL_CONTRACT_ADDRESS,
         "contract": spell_contract,
@@ -112,43 +146,77 @@ def main():
         "decimals": None,
     }
 
-    spell["symbol"] = get_token_symbol(spell["contract"])
-    spell["name"] = get_token_name(spell["contract"])
-    spell["balance"] = get_token_balance(spell_contract, user)
-    spell["decimals"] = get_token_decimals(spell_contract)
-
-    sspell["symbol"] = get_token_symbol(sspell["contract"])
-    sspell["name"] = get_token_name(sspell["contract"])
-    sspell["balance"] = get_token_balance(sspell_contract, user)
-    sspell["decimals"] = get_token_decimals(sspell_contract)
+    # symbol, name, balance, decimals and router allowance for both tokens in one request
+    token_info = get_token_info_batch(
+        [spell_contract, sspell_contract], user, [traderjoe_router.address]
+    )
+    for token, info in zip([spell, sspell], token_info):
+        if None in (info["symbol"], info["name"], info["balance"], info["decimals"]):
+            sys.exit(f"Could not load token data for {token['address']}!")
+        token["symbol"] = info["symbol"]
+        token["name"] = info["name"]
+        token["balance"] = info["balance"]
+        token["decimals"] = info["decimals"]
+        token["allowance"] = info["allowances"][traderjoe_router.address]
 
     if (spell["balance"] == 0) and (sspell["balance"] == 0):
         sys.exit("No tokens found!")
 
     # Confirm approvals for tokens
     print("\nChecking Approvals:")
+    approvals = []
 
-    if get_approval(spell["contract"], traderjoe_router, user):
+    if spell["allowance"]:
         print(f"• {spell['symbol']} OK")
     else:
-        token_approve(spell["contract"], traderjoe_router)
+        approvals.append(token_approve(spell["contract"], traderjoe_router))
 
-    if get_approval(sspell["contract"], traderjoe_router, user):
+    if sspell["allowance"]:
         print(f"• {sspell['symbol']} OK")
     else:
-        token_approve(sspell["contract"], traderjoe_router)    
+        approvals.append(token_approve(sspell["contract"], traderjoe_router))
+
+    # both approvals are in flight together, wait for them once
+    nonce_manager.wait([tx for tx in approvals if tx is not True])
     
+    # the staking watcher publishes the rate into shared memory, no file I/O in the loop
     try:
-        with open(BASE_STAKING_RATE_FILENAME, "r") as file:
-            base_staking_rate = Decimal(file.read().strip())
-            print(f"\nEthereum L1 Staking Rate: {base_staking_rate}")
+        staking_rate_channel = RateSubscriber()
     except FileNotFoundError:
         sys.exit(
-            "Cannot load the base Abracadabra SPELL/sSPELL staking rate. Run `python3 abra_rate.py` and try again."
+            "Cannot load the base Abracadabra SPELL/sSPELL staking rate. Run `python3 ethereum_abra_staking_watcher.py` and try again."
         )
+    if (result := staking_rate_channel.poll()) is None:
+        sys.exit(
+            "The staking watcher has not published a SPELL/sSPELL staking rate yet. Wait for it and try again."
+        )
+    base_staking_rate = Decimal(str(result))
+    print(f"\nEthereum L1 Staking Rate: {base_staking_rate}")
 
-    network.priority_fee("5 gwei")
+    # wake the main loop on new blocks, Sync events and new staking rates
+    scheduler = BlockScheduler(
+        poll_time=LOOP_TIME, triggers=[staking_rate_channel.pending]
+    )
+    if WEBSOCKET_URL:
+        pipeline = EventPipeline(WEBSOCKET_URL)
+        # blocks wake the loop as they are pushed, polling eth_blockNumber is only the fallback
+        scheduler.subscribe(pipeline)
+        # Syncs are applied on the pipeline thread and wake the loop right away
+        dispatcher = SyncDispatcher(on_update=lambda pool: scheduler.notify(pool.position[0]))
+        dispatcher.add_pool(lp_reserves)
+        dispatcher.attach(pipeline)
+        # the first connection backfills the Syncs since the seed
+        pipeline.last_block = lp_reserves.position[0]
+        pipeline.start()
+    scheduler.start()
+
+    network.priority_fee(PRIORITY_FEE)
     balance_refresh = True
+    recalculate = True
+    # swaps sent by token_swap() that are not confirmed yet
+    pending_swaps = []
+    # ReserveCache position of the last quote
+    quoted_position = None
 
     # 
     # Start of arbitrage loop
@@ -156,22 +224,23 @@ def main():
 
     while True:
 
-        loop_start = time.time()
-
-        try:
-            with open(BASE_STAKING_RATE_FILENAME, "r") as file:
-                if (result := Decimal(file.read().strip())) != base_staking_rate:
-                    base_staking_rate = result 
-                    print(f"Updated staking rate: {base_staking_rate}")
-        except FileNotFoundError:
-            sys.exit(
-                "Cannot load the base Abracadabra SPELL/sSPELL staking rate. Run `python3 ethereum_abracadabra_rate_watcher.py` and try again."
-            )
+        if (result := staking_rate_channel.poll()) is not None:
+            if (result := Decimal(str(result))) != base_staking_rate:
+                base_staking_rate = result 
+                print(f"Updated staking rate: {base_staking_rate}")
+                recalculate = True
 
         if balance_refresh:
-            time.sleep(10)
-            spell["balance"] = get_token_balance(spell_contract, user)
-            sspell["balance"] = get_token_balance(sspell_contract, user)
+            # wait for the swaps to be mined instead of sleeping a fixed 10 seconds
+            nonce_manager.wait(pending_swaps)
+            pending_swaps.clear()
+            balances = get_token_balances_batch([spell_contract, sspell_contract], user)
+            if None in balances:
+                # keep balance_refresh set and try again on the next block
+                print("Exception in balance refresh: balanceOf failed")
+                scheduler.wait()
+                continue
+            spell["balance"], sspell["balance"] = balances
             print("\nAccount Balance:")
             print(
                 f"• Token #1: {int(spell['balance']/(10**spell['decimals']))} {spell['symbol']} ({spell['name']})"
@@ -181,19 +250,57 @@ def main():
             )
             print()
             balance_refresh = False
+            recalculate = True
 
+        # apply any new Sync events to the cached reserves (the pipeline applies them as they arrive)
+        if not WEBSOCKET_URL:
+            try:
+                lp_reserves.update()
+            except Exception as e:
+                print(f"Exception in lp_reserves.update: {e}")
+        if lp_reserves.position != quoted_position:
+            recalculate = True
+
+        # nothing changed since the last quote, so wait for the next block
+        if not recalculate:
+            scheduler.wait()
+            continue
+
+        recalculate = False
+        # both legs evaluate the same view of the chain, at the head: no Sync arrived after the last one applied,
+        # so the cached reserves still hold there, and the balances and base fee are read at that same block
+        reserve0, reserve1, quoted_position = lp_reserves.state
+        snapshot = BlockSnapshot(
+            max(scheduler.block_number or chain.height, quoted_position[0]),
+            values={
+                "reserves": (reserve0, reserve1),
+                "staking_rate": base_staking_rate,
+            },
+            calls={
+                "spell_balance": (spell_contract.balanceOf, [user.address]),
+                "sspell_balance": (sspell_contract.balanceOf, [user.address]),
+            },
+            base_fee=True,
+        )
+        if None in (snapshot["spell_balance"], snapshot["sspell_balance"]):
+            print(f"Could not read balances at block {snapshot.block_number}, skipping")
+            # quote again on the next wake-up
+            quoted_position = None
+            scheduler.wait()
+            continue
+        # no eth_feeHistory / getBlock round-trip when a swap is sent
+        max_fee = (
+            snapshot["base_fee"] * BASE_FEE_MULTIPLIER + Wei(PRIORITY_FEE)
+            if snapshot["base_fee"]
+            else None
+        )
+        # token0 (x) is sSPELL
+        # token1 (y) is SPELL
+        x0, y0 = snapshot["reserves"]
     
         # get quotes and execute SPELL -> sSPELL swaps only if we have a balance of SPELL
 
-        if spell["balance"]:
-
-            try:
-                # token0 (x) is sSPELL
-                # token1 (y) is SPELL
-                x0, y0 = traderjoe_lp.getReserves.call()[0:2]
-            except:
-                # restarts loop if getReserves() fails
-                continue 
+        if snapshot["spell_balance"]:
 
             # find maximum SPELL input at desired sSPELL/SPELL ratio "C"
 
@@ -202,20 +309,18 @@ def main():
                 pool_reserves_token1=y0,
                 # sSPELL (token0) out 
                 token0_out=True,
-                token0_per_token1=Decimal(
-                    str(1 / (base_staking_rate * (1 + THRESHOLD_SPELL_TO_SSPELL)))
-                ),
-                fee=Decimal("0.003"),
+                token0_per_token1=1 / (snapshot["staking_rate"] * (1 + THRESHOLD_SPELL_TO_SSPELL)),
+                fee=Fraction(3, 1000),
             ):
-                if spell_in > spell["balance"]:
-                    spell_in = spell["balance"]
+                if spell_in > snapshot["spell_balance"]:
+                    spell_in = snapshot["spell_balance"]
 
                 # calculate sSPELL output from SPELL input calculated above (used by token_swap to get amountOutMin)
                 sspell_out = get_tokens_out_for_tokens_in(
                     pool_reserves_token0=x0,
                     pool_reserves_token1=y0,
                     quantity_token1_in=spell_in,
-                    fee=Decimal("0.003"),
+                    fee=Fraction(3, 1000),
                 )
 
                 print(
@@ -227,20 +332,14 @@ def main():
                     token_out_quantity=sspell_out,
                     token_out_address=sspell["address"],
                     router=traderjoe_router,
+                    max_fee=max_fee,
                 ):
                     balance_refresh = True 
                     if ONE_SHOT:
                         sys.exit("single shot complete!")
 
         # get quotes and excute sSPELL -> SPELL swaps only if we have a balance of sSPELL
-        if sspell["balance"]:
-
-            try:
-                # token0 (x) is sSPELL
-                # token1 (y) is SPELL 
-                x0, y0 = traderjoe_lp.getReserves.call()[0:2]
-            except:
-                continue 
+        if snapshot["sspell_balance"]:
 
             # finds maximum sSPELL input at desired sSPELL / SPELL ratio "C"
 
@@ -249,20 +348,18 @@ def main():
                 pool_reserves_token1=y0,
                 # SPELL (token1) out 
                 token1_out=True,
-                token0_per_token1=Decimal(
-                    str(1 / (base_staking_rate * (1 + THRESHOLD_SSPELL_TO_SPELL)))
-                ),
-                fee=Decimal("0.003"),
+                token0_per_token1=1 / (snapshot["staking_rate"] * (1 + THRESHOLD_SSPELL_TO_SPELL)),
+                fee=Fraction(3, 1000),
             ):
-                if sspell_in > sspell["balance"]:
-                    sspell_in = sspell["balance"]
+                if sspell_in > snapshot["sspell_balance"]:
+                    sspell_in = snapshot["sspell_balance"]
 
                 # calculate SPELL output from sSPELL input calculated above (used by token_swap to set amountOutMin)
                 spell_out = get_tokens_out_for_tokens_in(
                     pool_reserves_token0=x0,
                     pool_reserves_token1=y0,
                     quantity_token0_in=sspell_in,
-                    fee=Decimal("0.003"),
+                    fee=Fraction(3, 1000),
                 )
 
                 print(
@@ -274,19 +371,14 @@ def main():
                     token_out_quantity=spell_out,
                     token_out_address=spell["address"],
                     router=traderjoe_router,
+                    max_fee=max_fee,
                 ):
                     balance_refresh = True 
                     if ONE_SHOT:
                         sys.exit("single shot conmplete!")
 
-        loop_end = time.time()
-
-        # Control the loop timing more precisely by measuring start and end time and sleeping as needed
-        if (loop_end - loop_start) >= LOOP_TIME:
-            continue 
-        else:
-            time.sleep(LOOP_TIME - (loop_end - loop_start))
-            continue 
+        # wait for the next block (or a new staking rate) instead of sleeping a fixed LOOP_TIME
+        scheduler.wait()
 
     #
     # End of arbitrage loop
@@ -299,85 +391,19 @@ def account_get_balance(account):
         print(f"Exception in account_get_balance: {e}")
 
 
-def contract_load(address, alias):
-    # Attempts to load the saved contract by alias.
-    # If not found, fetch from network explorer and set alias.
-    try:
-        contract = Contract(alias)
-    except ValueError:
-        contract = Contract.from_explorer(address)
-        contract.set_alias(alias)
-    finally:
-        print(f"• {alias}")
-        return contract 
-
-    
-def get_approval(token, router, user):
-    try:
-        return token.allowance.call(user, router.address)
-    except Exception as e:
-        print(f"Exception in get_approval: {e}")
-        return False 
-
-
-def get_token_name(token):
-    try:
-        return token.name.call()
-    except Exception as e:
-        print(f"Exception in get_token_name: {e}")
-        raise 
-
-
-def get_token_symbol(token):
-    try:
-        return token.symbol.call()
-    except Exception as e:
-        print(f"Exception in get_token_symbol: {e}")
-        raise 
-
-
-def get_token_balance(token, user):
-    try:
-        return token.balanceOf.call(user)
-    except Exception as e:
-        print(f"Exception in get_token_balance: {e}")
-        raise 
-
-
-def get_token_decimals(token):
-    try:
-        return token.decimals.call()
-    except Exception as e:
-        print(f"Exception in get_token_decimals: {e}")
-        raise 
-
-
 def token_approve(token, router, value="unlimited"):
     if DRY_RUN:
         return True 
 
     if value == "unlimited":
-        try:
-            token.approve(
-                router,
-                2 ** 256 - 1,
-                {"from": user},
-            )
-            return True 
-        except Exception as e:
-            print(f"Exception in token_approve: {e}")
-            raise 
-    else:
-        try:
-            token.approve(
-                router,
-                value,
-                {"from": user},
-            )
-            return True 
-        except Exception as e:
-            print(f"Exception in token_approve: {e}")
-            raise 
+        value = 2 ** 256 - 1
+
+    # broadcast with the next local nonce, confirmed later with nonce_manager.wait()
+    try:
+        return nonce_manager.transact(token.approve, router, value)
+    except Exception as e:
+        print(f"Exception in token_approve: {e}")
+        raise 
 
 
 def token_swap(
@@ -386,18 +412,22 @@ def token_swap(
     token_out_quantity,
     token_out_address,
     router,
+    max_fee=None,
 ):
     if DRY_RUN:
         return True 
     
     try: 
-        router.swapExactTokensForTokens(
-            token_in_quantity,
-            int(token_out_quantity * (1 - SLIPPAGE)),
-            [token_in_address, token_out_address],
-            user.address,
-            1000 * int(time.time() + 60 * SECOND),
-            {"from": user},
+        pending_swaps.append(
+            nonce_manager.transact(
+                router.swapExactTokensForTokens,
+                token_in_quantity,
+                int(token_out_quantity * (1 - SLIPPAGE)),
+                [token_in_address, token_out_address],
+                user.address,
+                1000 * int(time.time() + 60 * SECOND),
+                tx_params={"max_fee": max_fee} if max_fee else None,
+            )
         )
         return True 
     except Exception as e:
@@ -405,59 +435,6 @@ def token_swap(
         return False 
 
 
-def get_tokens_in_for_ratio_out(
-    pool_reserves_token0,
-    pool_reserves_token1,
-    token0_out=False,
-    token1_out=False,
-    token0_per_token1=0,
-    fee=Decimal("0.0"),
-):
-    assert not (token0_out and token1_out)
-    assert token0_per_token1
-
-    # token1 input, token0 output 
-    if token0_out:
-        # dy = x0/C - y0/(1 - FEE)
-        dy = int(
-            pool_reserves_token0 / token0_per_token1 - pool_reserves_token1 / (1 - fee)
-        )
-        if dy > 0:
-            return dy 
-        else:
-            return 0 
-
-    # token0 input, token1 output
-    if token1_out:
-        # dx = y0*C - x0/(1 - FEE)
-        dx = int(
-            pool_reserves_token1 * token0_per_token1 - pool_reserves_token0 / (1 - fee)
-        )
-        if dx > 0:
-            return dx 
-        else:
-            return 0
-
-
-# TODO: make fully generic with one return, instead of labeling 0/1, use in/out
-def get_tokens_out_for_tokens_in(
-    pool_reserves_token0,
-    pool_reserves_token1,
-    quantity_token0_in=0,
-    quantity_token1_in=0,
-    fee=0,
-):
-    # fails if two input tokens are passed, or if both are 0
-    assert not (quantity_token0_in and quantity_token1_in)
-    assert quantity_token0_in or quantity_token1_in
-
-
-    if quantity_token0_in:
-        return (pool_reserves_token1 * quantity_token0_in * (1 - fee)) // (pool_reserves_token0 + quantity_token0_in * (1 - fee))
-
-    if quantity_token1_in:
-        return (pool_reserves_token0 * quantity_token1_in * (1 - fee)) // (pool_reserves_token1 + quantity_token1_in * (1 - fee))
-
 # Only executes main loop if this file is called directly
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -5,8 +5,15 @@ import requests
 import os
 import json
 from decimal import Decimal
+from fractions import Fraction
 from brownie import *
 
+# shared helpers live in the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from pool_math import get_tokens_in_for_ratio_out, get_tokens_out_for_tokens_in
+from block_scheduler import BlockScheduler
+from event_pipeline import EventPipeline
+
 # use python-dotenv to get API key 
 from dotenv import load_dotenv 
 load_dotenv()
@@ -27,6 +34,9 @@ SSPELL_CONTRACT_ADDRESS = "0x3ee97d514bbef95a2f110e6b9b73824719030f7a"
 # use python-dotenv to get API key
 os.environ.get('SNOWTRACE_TOKEN')
 
+# websocket endpoint for the newHeads subscription, without it the scheduler polls (see block_scheduler.py)
+WEBSOCKET_URL = os.environ.get("WEBSOCKET_URL")
+
 SECOND = 1
 MINUTE = 60 * SECOND
 HOUR = 60 * MINUTE
@@ -50,7 +60,7 @@ BASE_STAKING_RATE_FILENAME = ".abra_rate"
 DRY_RUN = True
 # Quit after the first successful trade
 ONE_SHOT = False
-# How often to run the main loop (in seconds)
+# How often the scheduler checks for a new block (in seconds), see block_scheduler.py
 LOOP_TIME = 1.0
 
 
@@ -141,6 +151,15 @@ def main():
         )
 
     network.priority_fee("5 gwei")
+    # wake the main loop on new blocks, the staking rate file is re-read on every wake-up
+    scheduler = BlockScheduler(poll_time=LOOP_TIME)
+    if WEBSOCKET_URL:
+        # blocks wake the loop as they are pushed, polling eth_blockNumber is only the fallback
+        pipeline = EventPipeline(WEBSOCKET_URL)
+        scheduler.subscribe(pipeline)
+        pipeline.start()
+    scheduler.start()
+
     balance_refresh = True
 
     #
@@ -148,8 +167,6 @@ def main():
     #
     while True:
 
-        loop_start = time.time()
-
         try:
             with open(BASE_STAKING_RATE_FILENAME, "r") as file:
                 if (result := Decimal(file.read().strip())) != base_staking_rate:
@@ -190,10 +207,8 @@ def main():
                 pool_reserves_token1=y0,
                 # sSPELL (token0) out
                 token0_out=True,
-                token0_per_token1=Decimal(
-                    str(1 / (base_staking_rate * (1 + THRESHOLD_SPELL_TO_SSPELL)))
-                ),
-                fee=Decimal("0.003"),
+                token0_per_token1=1 / (base_staking_rate * (1 + THRESHOLD_SPELL_TO_SSPELL)),
+                fee=Fraction(3, 1000),
             ):
 
                 if spell_in > spell["balance"]:
@@ -204,7 +219,7 @@ def main():
                     pool_reserves_token0=x0,
                     pool_reserves_token1=y0,
                     quantity_token1_in=spell_in,
-                    fee=Decimal("0.003"),
+                    fee=Fraction(3, 1000),
                 )
 
                 print(
@@ -237,10 +252,8 @@ def main():
                 pool_reserves_token1=y0,
                 # SPELL (token1) out
                 token1_out=True,
-                token0_per_token1=Decimal(
-                    str(1 / (base_staking_rate * (1 + THRESHOLD_SSPELL_TO_SPELL)))
-                ),
-                fee=Decimal("0.003"),
+                token0_per_token1=1 / (base_staking_rate * (1 + THRESHOLD_SSPELL_TO_SPELL)),
+                fee=Fraction(3, 1000),
             ):
 
                 if sspell_in > sspell["balance"]:
@@ -251,7 +264,7 @@ def main():
                     pool_reserves_token0=x0,
                     pool_reserves_token1=y0,
                     quantity_token0_in=sspell_in,
-                    fee=Decimal("0.003"),
+                    fee=Fraction(3, 1000),
                 )
 
                 print(
@@ -268,14 +281,8 @@ def main():
                     if ONE_SHOT:
                         sys.exit("single shot complete!")
 
-        loop_end = time.time()
-
-        # Control the loop timing more precisely by measuring start and end time and sleeping as needed
-        if (loop_end - loop_start) >= LOOP_TIME:
-            continue
-        else:
-            time.sleep(LOOP_TIME - (loop_end - loop_start))
-            continue
+        # wait for the next block instead of sleeping a fixed LOOP_TIME
+        scheduler.wait()
     #
     # End of arbitrage loop
     #
@@ -394,63 +401,6 @@ def token_swap(
         return False
 
 
-def get_tokens_in_for_ratio_out(
-    pool_reserves_token0,
-    pool_reserves_token1,
-    token0_out=False,
-    token1_out=False,
-    token0_per_token1=0,
-    fee=Decimal("0.0"),
-):
-    assert not (token0_out and token1_out)
-    assert token0_per_token1
-
-    # token1 input, token0 output
-    if token0_out:
-        # dy = x0/C - y0/(1-FEE)
-        dy = int(
-            pool_reserves_token0 / token0_per_token1 - pool_reserves_token1 / (1 - fee)
-        )
-        if dy > 0:
-            return dy
-        else:
-            return 0
-
-    # token0 input, token1 output
-    if token1_out:
-        # dx = y0*C - x0/(1-FEE)
-        dx = int(
-            pool_reserves_token1 * token0_per_token1 - pool_reserves_token0 / (1 - fee)
-        )
-        if dx > 0:
-            return dx
-        else:
-            return 0
-
-
-# TODO: make fully generic with one return, instead of labeling 0/1, use in/out
-def get_tokens_out_for_tokens_in(
-    pool_reserves_token0,
-    pool_reserves_token1,
-    quantity_token0_in=0,
-    quantity_token1_in=0,
-    fee=0,
-):
-    # fails if two input tokens are passed, or if both are 0
-    assert not (quantity_token0_in and quantity_token1_in)
-    assert quantity_token0_in or quantity_token1_in
-
-    if quantity_token0_in:
-        return (pool_reserves_token1 * quantity_token0_in * (1 - fee)) // (
-            pool_reserves_token0 + quantity_token0_in * (1 - fee)
-        )
-
-    if quantity_token1_in:
-        return (pool_reserves_token0 * quantity_token1_in * (1 - fee)) // (
-            pool_reserves_token1 + quantity_token1_in * (1 - fee)
-        )
-
-
 # Only executes main loop if this file is called directly
 if __name__ == "__main__":
     main()
\ No newline at end of file
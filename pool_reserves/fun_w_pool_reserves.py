@@ -2,7 +2,11 @@ import sys
 import time 
 import os 
 from brownie import * 
-from decimal import Decimal
+from fractions import Fraction
+
+# shared helpers (pool_math.py) live in the repository root
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from pool_math import get_tokens_out_for_tokens_in
 
 # use python-dotenv to get API key 
 from dotenv import load_dotenv 
@@ -14,23 +18,6 @@ os.environ.get('SNOWTRACE_TOKEN')
 TRADERJOE_ROUTER_CONTRACT_ADDRESS = "0x60aE616a2155Ee3d9A68541Ba4544862310933d4"
 TOKEN_POOL_CONTRACT_ADDRESS = "0x033C3Fc1fC13F803A233D262e24d1ec3fd4EFB48"
 
-def get_tokens_out_from_tokens_in(
-    pool_reserves_token0,
-    pool_reserves_token1,
-    quantity_token0_in=0,
-    quantity_token1_in=0,
-    fee=0,
-):
-    # fails if two input tokens are passed, or if both are 0
-    assert not (quantity_token0_in and quantity_token1_in)
-    assert quantity_token0_in or quantity_token1_in 
-
-    if quantity_token0_in:
-        return (pool_reserves_token1 * quantity_token0_in * (1 - fee)) // (pool_reserves_token0 + quantity_token0_in * (1 - fee))
-
-    if quantity_token1_in:
-        return (pool_reserves_token0 * quantity_token1_in * (1 - fee)) // (pool_reserves_token1 + quantity_token1_in * (1 - fee))
-
 def contract_load(address, alias):
     # Attempts to load the saved contract by alias.
     # If not found, fetch from network explorer and set alias.
@@ -75,11 +62,11 @@ print(f"token1: \t\t\t{y0}")
 print()
 print("*** Calculating hypothetical swap: 500,000 SPELL to sSPELL @ 0.3% fee ***")
 quote = router.getAmountsOut(500_000 * (10 ** 18), [token1.address, token0.address])[-1]
-tokens_out = get_tokens_out_from_tokens_in(
+tokens_out = get_tokens_out_for_tokens_in(
     pool_reserves_token0=x0,
     pool_reserves_token1=y0,
     quantity_token1_in=500_000 * (10 ** 18),
-    fee=Decimal("0.003"),
+    fee=Fraction(3, 1000),
 )
 
 print()
@@ -88,14 +75,15 @@ quote = router.getAmountsOut(
     500_000 * (10 ** 18),
     [token0.address, token1.address],
 )[-1]
-tokens_out = get_tokens_out_from_tokens_in(
+tokens_out = get_tokens_out_for_tokens_in(
     pool_reserves_token0=x0,
     pool_reserves_token1=y0,
     quantity_token0_in=500_000 * (10 ** 18),
-    fee=Decimal("0.003"),
+    fee=Fraction(3, 1000),
 )
 
 print()
 print(f"Calculated Tokens Out: \t\t{tokens_out}")
 print(f"Router Quoted getAmountsOut: \t{quote}")
+# pool_math uses the router's integer arithmetic, so the difference should be 0
 print(f"Difference: \t\t\t{quote - tokens_out}")
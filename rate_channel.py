@@ -0,0 +1,127 @@
+"""
+Rate Channel (shared memory slot for the SPELL/sSPELL staking rate)
+
+- ethereum_abra_staking_watcher.py used to write the rate to .abra_rate once a minute,
+  and the trading bots re-opened and parsed that file on EVERY loop (open/read/close syscalls each tick)
+- instead, the watcher publishes the rate into a 16 byte shared memory slot: a sequence number and the rate
+- the bot checks the sequence number on each tick, which is a plain memory read (no syscall, no parsing),
+  and sees a new rate the moment the watcher publishes it
+- the slot outlives the watcher: it is never unlinked on exit, so a restarted watcher takes over the same slot
+  and continues its sequence, and running bots see its rates without reopening anything.
+  Deleting it is explicit (RatePublisher.unlink()), bots that are still running would never see a rate again
+
+Seqlock:
+- the writer makes the sequence number odd, writes the rate, then makes it even again
+- a reader that sees an odd sequence number, or a different one before and after reading the rate,
+  caught the writer mid-update and simply reads again
+- a writer that died mid-update leaves the sequence number odd until a new publisher takes over the slot,
+  so a reader only retries READ_RETRIES times, and poll() returns None (the bot keeps its last rate)
+
+Usage:
+
+watcher:
+>>> publisher = RatePublisher()
+>>> publisher.publish(1.4303)
+
+bot:
+>>> subscriber = RateSubscriber()
+>>> if (rate := subscriber.poll()) is not None:
+...     base_staking_rate = rate
+"""
+
+import struct
+from multiprocessing import resource_tracker, shared_memory
+
+ABRA_RATE_CHANNEL = "abra_rate"
+
+# sequence number (uint64), rate (float64)
+SLOT_FORMAT = "<Qd"
+SLOT_SIZE = struct.calcsize(SLOT_FORMAT)
+
+# reads of a slot caught mid-write before giving up, a live writer finishes within a few
+READ_RETRIES = 10_000
+
+
+class RatePublisher:
+    """
+    Owns the shared memory slot. Only one publisher per channel.
+    """
+
+    def __init__(self, name: str = ABRA_RATE_CHANNEL) -> None:
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=SLOT_SIZE)
+        except FileExistsError:
+            # left behind by a previous watcher, take it over
+            self._shm = shared_memory.SharedMemory(name=name)
+        # the slot outlives this process, don't let the resource tracker unlink it on exit
+        resource_tracker.unregister(self._shm._name, "shared_memory")
+        self._sequence = struct.unpack_from("<Q", self._shm.buf, 0)[0]
+        # never start on an odd (mid-write) sequence number
+        self._sequence += self._sequence % 2
+
+    def publish(self, rate: float) -> None:
+        self._sequence += 1
+        struct.pack_into("<Q", self._shm.buf, 0, self._sequence)
+        struct.pack_into("<d", self._shm.buf, 8, rate)
+        self._sequence += 1
+        struct.pack_into("<Q", self._shm.buf, 0, self._sequence)
+
+    def close(self) -> None:
+        self._shm.close()
+
+    def unlink(self) -> None:
+        """
+        Remove the slot for good, running subscribers keep a mapping that is never written again
+        """
+        # unlink() unregisters the segment from the resource tracker, it has to be registered first
+        resource_tracker.register(self._shm._name, "shared_memory")
+        self._shm.unlink()
+
+
+class RateSubscriber:
+    """
+    Reads the slot written by a RatePublisher. Raises FileNotFoundError if no publisher is running.
+    """
+
+    def __init__(self, name: str = ABRA_RATE_CHANNEL) -> None:
+        self._shm = shared_memory.SharedMemory(name=name)
+        # the publisher owns the slot, don't let this process unlink it on exit
+        resource_tracker.unregister(self._shm._name, "shared_memory")
+        self._sequence = 0
+
+    def read(self):
+        """
+        Returns (sequence number, rate). A sequence number of 0 means nothing was published yet.
+        Raises TimeoutError if the slot stays mid-write (the publisher died while writing).
+        """
+        for _ in range(READ_RETRIES):
+            sequence, rate = struct.unpack_from(SLOT_FORMAT, self._shm.buf, 0)
+            if sequence % 2 == 0 and struct.unpack_from("<Q", self._shm.buf, 0)[0] == sequence:
+                return sequence, rate
+        raise TimeoutError(f"Rate slot {self._shm.name} is stuck mid-write")
+
+    def pending(self) -> bool:
+        """
+        True if a rate was published since the last poll(), without consuming it.
+        """
+        sequence = struct.unpack_from("<Q", self._shm.buf, 0)[0]
+        # an odd sequence number is a write in progress (or a dead writer's), not a new rate yet
+        return sequence != self._sequence and sequence % 2 == 0
+
+    def poll(self):
+        """
+        Returns the rate if it was published since the last poll, None otherwise.
+        """
+        if not self.pending():
+            return None
+        try:
+            sequence, rate = self.read()
+        except TimeoutError:
+            return None
+        if not sequence:
+            return None
+        self._sequence = sequence
+        return rate
+
+    def close(self) -> None:
+        self._shm.close()
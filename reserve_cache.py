@@ -0,0 +1,216 @@
+"""
+Reserve Cache (Sync events instead of getReserves polling)
+
+- lp.getReserves.call() is a full RPC round-trip every time, even if nothing changed in the pool
+- every Uniswap V2 style pool (TraderJoe, SushiSwap) emits Sync(reserve0, reserve1) whenever its reserves change
+- seed the reserves ONCE with getReserves() (pinned to a block number),
+  then keep them current by applying Sync events (see event_listners.py)
+- the bot reads reserves from memory and only recomputes quotes when a new Sync arrives
+
+Usage:
+
+>>> lp = contract_load(TRADERJOE_POOL_CONTRACT_ADDRESS, "TraderJoe LP: SPELL-sSPELL")
+>>> lp_reserves = ReserveCache(lp)
+>>> if lp_reserves.update():
+...     x0, y0 = lp_reserves.reserves
+
+NOTE: eth_newFilter is not available on every provider (see event_listners.py),
+if the Sync filter cannot be created the cache falls back to calling getReserves() in update()
+
+Reorgs:
+- a chain reorg replaces recent blocks, and the Sync events already applied from them are no longer canonical
+- ReserveJournal keeps a short per-block undo log (the state of each pool before the block's first Sync),
+  so the caches can roll back to the common ancestor and replay only the new canonical logs,
+  instead of re-reading every pool with getReserves()
+"""
+
+from collections import OrderedDict
+
+from brownie import chain, web3
+
+# blocks of undo history kept by a ReserveJournal, a deeper reorg falls back to getReserves()
+JOURNAL_DEPTH = 64
+
+
+class ReserveCache:
+    """
+    Holds the reserves for a single Uniswap V2 style liquidity pool.
+    Reserves are seeded with getReserves() and updated by Sync events,
+    either pulled from a Sync filter by update() or pushed in by apply_sync().
+    """
+
+    def __init__(
+        self,
+        lp,
+        name: str = None,
+        sync_filter: bool = True,
+    ) -> None:
+        self._lp = lp
+        self.address = lp.address
+        self.name = name if name else lp.address
+        self._sync_filter = None
+
+        # create the filter BEFORE seeding, so no Sync can slip between the two
+        if sync_filter:
+            try:
+                self._sync_filter = web3.eth.contract(
+                    address=lp.address, abi=lp.abi
+                ).events.Sync.create_filter(fromBlock="latest")
+            except Exception as e:
+                print(f"Exception in ReserveCache (Sync filter unavailable): {e}")
+
+        # (reserve0, reserve1, position), replaced as ONE tuple so a thread reading it while Syncs are
+        # applied from another thread (e.g. an EventPipeline) never sees reserves from two different states.
+        # position is the (block number, log index) of the last state applied to the cache
+        self._state = (None, None, (0, 0))
+        self.seed()
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def reserve0(self):
+        return self._state[0]
+
+    @property
+    def reserve1(self):
+        return self._state[1]
+
+    @property
+    def position(self):
+        return self._state[2]
+
+    @property
+    def reserves(self):
+        return self._state[0:2]
+
+    @property
+    def state(self):
+        return self._state
+
+    def restore(self, state) -> None:
+        self._state = tuple(state)
+
+    def seed(self):
+        """
+        Read the reserves with getReserves(), pinned to the current block.
+        Any Sync at or before that block is already reflected and will be ignored.
+        """
+        block_number = chain.height
+        reserve0, reserve1 = self._lp.getReserves.call(block_identifier=block_number)[0:2]
+        # a seed reflects every log in its block, so use an index no log can reach
+        self._state = (reserve0, reserve1, (block_number, 2 ** 32))
+
+    def apply_sync(
+        self,
+        reserve0: int,
+        reserve1: int,
+        block_number: int,
+        log_index: int,
+    ) -> bool:
+        """
+        Apply a single Sync event. Returns True if the cached reserves changed.
+        Events older than the last applied state are ignored.
+        """
+        if (block_number, log_index) <= self.position:
+            return False
+
+        changed = (reserve0, reserve1) != self.reserves
+        self._state = (reserve0, reserve1, (block_number, log_index))
+        return changed
+
+    def update(self) -> bool:
+        """
+        Drain any new Sync events from the filter and apply them in order.
+        Returns True if the cached reserves changed since the last call.
+        """
+        if self._sync_filter is None:
+            reserves = self.reserves
+            self.seed()
+            return self.reserves != reserves
+
+        changed = False
+        for event in self._sync_filter.get_new_entries():
+            if self.apply_sync(
+                reserve0=event["args"]["reserve0"],
+                reserve1=event["args"]["reserve1"],
+                block_number=event["blockNumber"],
+                log_index=event["logIndex"],
+            ):
+                changed = True
+        return changed
+
+
+class ReserveJournal:
+    """
+    Per-block undo log for a set of ReserveCache objects.
+    Call record() before applying a Sync, rollback() when a reorg replaced blocks.
+    """
+
+    def __init__(self, start_block: int = 0, depth: int = JOURNAL_DEPTH) -> None:
+        self.depth = depth
+        # block number -> (block hash, {pool: state before the block})
+        self._blocks = OrderedDict()
+        # newest block that can no longer be undone (the block the caches were seeded at, then pruned blocks)
+        self.floor_block = start_block
+
+    def reset(self, start_block: int) -> None:
+        """
+        Forget all undo history, after the caches were re-seeded at start_block
+        """
+        self._blocks.clear()
+        self.floor_block = start_block
+
+    @property
+    def latest_block(self):
+        return next(reversed(self._blocks)) if self._blocks else None
+
+    def get_block_hash(self, block_number: int):
+        entry = self._blocks.get(block_number)
+        return entry[0] if entry else None
+
+    def record(self, pool, block_number: int, block_hash: str) -> None:
+        """
+        Save the pool's state before its first update in this block
+        """
+        if block_number not in self._blocks:
+            self._blocks[block_number] = (block_hash, {})
+            # logs arrive in block order, anything else (a replay after a rollback) is re-sorted
+            if block_number < next(reversed(self._blocks)):
+                self._blocks = OrderedDict(sorted(self._blocks.items()))
+            while len(self._blocks) > self.depth:
+                self.floor_block = max(self.floor_block, self._blocks.popitem(last=False)[0])
+
+        undo = self._blocks[block_number][1]
+        if pool not in undo:
+            undo[pool] = pool.state
+
+    def can_rollback(self, block_number: int) -> bool:
+        """
+        True if the journal reaches back far enough to undo every block after block_number
+        """
+        return block_number >= self.floor_block
+
+    def rollback(self, block_number: int) -> set:
+        """
+        Undo every block after block_number (the common ancestor), newest first.
+        Returns the pools that were rolled back.
+        """
+        pools = set()
+        while self._blocks and self.latest_block > block_number:
+            _, (_, undo) = self._blocks.popitem(last=True)
+            for pool, state in undo.items():
+                pool.restore(state)
+                pools.add(pool)
+        return pools
+
+    def find_common_ancestor(self, get_canonical_hash):
+        """
+        Newest journaled block whose hash is still canonical, None if no journaled block is.
+        get_canonical_hash(block_number) returns the block hash on the current chain.
+        """
+        for block_number in reversed(self._blocks):
+            if get_canonical_hash(block_number) == self._blocks[block_number][0]:
+                return block_number
+        return None
+
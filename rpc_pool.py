@@ -0,0 +1,295 @@
+"""
+RPC Pool (latency-aware reads across several endpoints)
+
+- the bots bind to ONE brownie network (avax-main, ankr-avax-main, BROWNIE_NETWORK from .env),
+  so one slow provider stalls every getReserves / getAmountsOut, and the tail latency is what misses trades
+- RpcPool holds a keep-alive session to every endpoint (RPC_ENDPOINTS in .env) and sends each request to
+  the healthy endpoint with the lowest latency EWMA (EndpointStats from broadcast_fanout.py)
+- hedging: if the answer has not arrived after that endpoint's p95 latency, the same request goes to the
+  next best endpoint, and whichever answers first wins, so one slow response no longer sets the loop's latency
+- a connection error or HTTP error fails over to the next endpoint immediately,
+  EJECT_ERRORS consecutive failures eject the endpoint for EJECT_TIME seconds
+- JSON-RPC errors (e.g. execution reverted) are answers, not endpoint failures
+- filters (eth_newFilter ... eth_getFilterChanges, used by ReserveCache) only exist on the node that created them,
+  so every call on a filter goes to that node, is never hedged, and never fails over.
+  The pool hands out its own filter ids, two nodes can return the same one
+- RpcPoolProvider plugs the pool into web3, so every brownie contract call goes through it unchanged
+
+Usage:
+
+>>> network.connect("avax-main")
+>>> use_rpc_pool(ENDPOINTS)
+>>> traderjoe_lp.getReserves()   # routed, hedged
+
+$ python3 rpc_pool.py      (demo against local stand-in JSON-RPC servers)
+"""
+
+import itertools
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from web3.providers.base import JSONBaseProvider
+
+from broadcast_fanout import ENDPOINTS, EndpointStats, start_stand_in_server
+
+# seconds to wait for an answer before giving up on a request
+REQUEST_TIMEOUT = 10
+# hedge delay until an endpoint has HEDGE_MIN_SAMPLES latency samples for its p95
+HEDGE_DELAY = 0.25
+HEDGE_MIN_SAMPLES = 20
+HEDGE_PERCENTILE = 95
+# consecutive failures before an endpoint is ejected, and for how long (in seconds)
+EJECT_ERRORS = 3
+EJECT_TIME = 30
+
+# requests that create a filter on the node that answers
+FILTER_CREATE_METHODS = {
+    "eth_newFilter",
+    "eth_newBlockFilter",
+    "eth_newPendingTransactionFilter",
+}
+# requests on an existing filter, params[0] is the filter id
+FILTER_METHODS = {
+    "eth_getFilterChanges",
+    "eth_getFilterLogs",
+    "eth_uninstallFilter",
+}
+
+# requests that are never duplicated
+NO_HEDGE_METHODS = {
+    "eth_sendTransaction",
+    "eth_sendRawTransaction",
+    *FILTER_CREATE_METHODS,
+    *FILTER_METHODS,
+}
+
+
+class RpcPool:
+    """
+    Routes JSON-RPC requests to the fastest healthy endpoint, hedging slow ones
+    """
+
+    def __init__(
+        self,
+        endpoints: list,
+        hedge: bool = True,
+        timeout: float = REQUEST_TIMEOUT,
+    ) -> None:
+        if not endpoints:
+            raise ValueError("RpcPool needs at least one endpoint")
+        self.endpoints = list(endpoints)
+        self.hedge = hedge
+        self.timeout = timeout
+        self.stats = {url: EndpointStats(url) for url in self.endpoints}
+        # requests answered by a hedged duplicate
+        self.hedges = 0
+        self.hedge_wins = 0
+
+        self._sessions = {}
+        for url in self.endpoints:
+            # keep-alive connections, enough for the hedged and concurrent requests
+            session = requests.Session()
+            session.mount(url, requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=16))
+            self._sessions[url] = session
+        # url -> time the endpoint comes back
+        self._ejected_until = {}
+        # pool filter id -> (url, the node's filter id)
+        self._filters = {}
+        self._filter_ids = itertools.count(1)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=len(self.endpoints) * 8)
+
+    def ranked_endpoints(self) -> list:
+        """
+        Healthy endpoints, fastest first (endpoints without samples are tried first).
+        If every endpoint is ejected, all of them are used anyway.
+        """
+        now = time.monotonic()
+        with self._lock:
+            healthy = [url for url in self.endpoints if self._ejected_until.get(url, 0) <= now]
+        return sorted(healthy or self.endpoints, key=lambda url: self.stats[url].ewma or 0.0)
+
+    def _hedge_delay(self, url: str) -> float:
+        stats = self.stats[url]
+        if stats.samples < HEDGE_MIN_SAMPLES:
+            return HEDGE_DELAY
+        return stats.percentile(HEDGE_PERCENTILE)
+
+    def _post(self, url: str, payload):
+        start = time.perf_counter()
+        try:
+            response = self._sessions[url].post(url, json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            reply = response.json()
+        except Exception:
+            self.stats[url].record_error()
+            if self.stats[url].consecutive_errors >= EJECT_ERRORS:
+                with self._lock:
+                    self._ejected_until[url] = time.monotonic() + EJECT_TIME
+                print(f"Ejected {url} for {EJECT_TIME}s")
+            raise
+        self.stats[url].record(time.perf_counter() - start)
+        return reply
+
+    def request(self, method: str, params: list) -> dict:
+        """
+        Returns the JSON-RPC response (with "result" or "error") from the first endpoint to answer
+        """
+        if method in FILTER_METHODS:
+            return self._filter_request(method, params)
+
+        payload = {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params}
+        reply, url = self._race(method, payload)
+
+        if method in FILTER_CREATE_METHODS and "result" in reply:
+            with self._lock:
+                filter_id = hex(next(self._filter_ids))
+                self._filters[filter_id] = (url, reply["result"])
+            reply = dict(reply, result=filter_id)
+        return reply
+
+    def request_batch(self, payloads: list) -> list:
+        """
+        Sends a JSON-RPC batch (a list of requests, see batch_transport.py) as one POST, returns the list of responses.
+        Filter calls have to go through request(), they are pinned to their endpoint.
+        """
+        methods = {payload["method"] for payload in payloads}
+        if methods & (FILTER_CREATE_METHODS | FILTER_METHODS):
+            raise ValueError("Filter requests cannot be sent in a batch")
+        # hedged only if every request in it may be
+        method = next(iter(methods & NO_HEDGE_METHODS), "batch")
+        return self._race(method, payloads)[0]
+
+    def _filter_request(self, method: str, params: list) -> dict:
+        with self._lock:
+            pinned = self._filters.get(params[0])
+        if pinned is None:
+            return {"jsonrpc": "2.0", "id": next(self._ids), "error": {"code": -32000, "message": "filter not found"}}
+
+        url, node_filter_id = pinned
+        payload = {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": [node_filter_id, *params[1:]]}
+        try:
+            reply = self._post(url, payload)
+        except Exception as e:
+            raise ConnectionError(f"{url} holding filter {params[0]} did not answer {method}: {e}")
+
+        if method == "eth_uninstallFilter":
+            with self._lock:
+                self._filters.pop(params[0], None)
+        return reply
+
+    def _race(self, method: str, payload) -> tuple:
+        """
+        (response, url) from the first endpoint to answer, hedging and failing over as configured
+        """
+        candidates = self.ranked_endpoints()
+        hedge = self.hedge and method not in NO_HEDGE_METHODS
+
+        primary = candidates.pop(0)
+        futures = {self._executor.submit(self._post, primary, payload): primary}
+        hedged = False
+        errors = []
+        deadline = time.monotonic() + self.timeout
+
+        while futures:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if hedge and candidates and not hedged:
+                timeout = min(remaining, self._hedge_delay(primary))
+            else:
+                timeout = remaining
+
+            done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if hedge and candidates and not hedged:
+                    # slower than its p95, race a duplicate on the next best endpoint
+                    hedged = True
+                    self.hedges += 1
+                    url = candidates.pop(0)
+                    futures[self._executor.submit(self._post, url, payload)] = url
+                continue
+
+            for future in done:
+                url = futures.pop(future)
+                if future.exception() is None:
+                    if hedged and url != primary:
+                        self.hedge_wins += 1
+                    return future.result(), url
+                errors.append(f"{url}: {future.exception()}")
+                # fail over right away
+                if candidates and not futures:
+                    url = candidates.pop(0)
+                    futures[self._executor.submit(self._post, url, payload)] = url
+
+        raise ConnectionError(f"No endpoint answered {method}: {errors or 'timeout'}")
+
+    def print_stats(self) -> None:
+        print(f"hedged {self.hedges} requests, {self.hedge_wins} answered by the hedge")
+        for stats in sorted(self.stats.values(), key=lambda stats: stats.ewma or float("inf")):
+            print(f"• {stats}")
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        for session in self._sessions.values():
+            session.close()
+
+
+class RpcPoolProvider(JSONBaseProvider):
+    """
+    web3 provider backed by an RpcPool
+    """
+
+    def __init__(self, pool: RpcPool) -> None:
+        super().__init__()
+        self.pool = pool
+
+    def make_request(self, method, params):
+        return self.pool.request(method, params)
+
+    def isConnected(self) -> bool:
+        return True
+
+
+def use_rpc_pool(endpoints: list = ENDPOINTS, hedge: bool = True) -> RpcPool:
+    """
+    Route brownie's web3 through an RpcPool, call after network.connect()
+    """
+    from brownie import web3
+
+    pool = RpcPool(endpoints, hedge=hedge)
+    web3.provider = RpcPoolProvider(pool)
+    return pool
+
+
+def main():
+    # stand-ins for two providers with a slow tail (5% of requests take 300ms longer) and one that is down
+    servers = [
+        start_stand_in_server(delay=0.005, jitter=0.002, spike_probability=0.05, spike_delay=0.300),
+        start_stand_in_server(delay=0.008, jitter=0.002, spike_probability=0.05, spike_delay=0.300),
+    ]
+    endpoints = [url for _, url in servers] + ["http://127.0.0.1:9"]
+
+    for hedge in (False, True):
+        pool = RpcPool(endpoints, hedge=hedge)
+        latencies = []
+        for _ in range(400):
+            start = time.perf_counter()
+            pool.request("eth_blockNumber", [])
+            latencies.append(time.perf_counter() - start)
+
+        latencies.sort()
+        print(f"\nhedge={hedge}: p50 {1000 * latencies[200]:.1f}ms, p95 {1000 * latencies[380]:.1f}ms, p99 {1000 * latencies[396]:.1f}ms")
+        pool.print_stats()
+        pool.close()
+
+    for server, _ in servers:
+        server.shutdown()
+
+
+# Only executes main loop if this file is called directly
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,22 @@ import datetime
 from brownie import *
 import os
 
+from pool_math import get_amount_out
+from reserve_cache import ReserveCache
+from batch_transport import get_batch_transport
+
 # using python-dotenv method
 from dotenv import load_dotenv
 load_dotenv()
 
 os.environ.get('SNOWTRACE_TOKEN')
 
+# Quote all pairs locally from the reserves of the TOKEN/WAVAX pools (one read per pool per block)
+# instead of one router_contract.getAmountsOut call per pair
+LOCAL_QUOTES = True
+# Keep the pool reserves current with Sync events instead of reading getReserves every block
+USE_SYNC_CACHE = False
+
 network.connect('avax-main')
 user = accounts.load('test_account')
 
@@ -63,8 +73,87 @@ token_pairs = [
     (mim, usdc),
 ]
 
+# Underlying TOKEN/WAVAX pools, every two-hop quote through WAVAX is built from these
+if LOCAL_QUOTES:
+    print("Loading Pools:")
+    factory_contract = Contract.from_explorer(router_contract.factory())
+    for token in [dai, mim, usdc, usdt]:
+        lp_contract = Contract.from_explorer(
+            factory_contract.getPair(token["address"], wavax_contract.address)
+        )
+        token["lp"] = lp_contract
+        token["wavax_is_token0"] = lp_contract.token0() == wavax_contract.address
+        if USE_SYNC_CACHE:
+            token["reserves"] = ReserveCache(lp_contract, name=f"{token['symbol']}/WAVAX")
+
+
+def get_wavax_pool_reserves(token, pool_reserves=None):
+    """
+    Returns the (token, WAVAX) reserves of the token's WAVAX pool
+    pool_reserves is the pool's getReserves() result if it was already read (see read_pool_reserves)
+    """
+    if USE_SYNC_CACHE:
+        token["reserves"].update()
+        reserve0, reserve1 = token["reserves"].reserves
+    elif pool_reserves is not None:
+        reserve0, reserve1 = pool_reserves[0:2]
+    else:
+        reserve0, reserve1 = token["lp"].getReserves()[0:2]
+
+    if token["wavax_is_token0"]:
+        return reserve1, reserve0
+    else:
+        return reserve0, reserve1
+
+
+def read_pool_reserves(tokens, block_number):
+    """
+    getReserves() of every token's WAVAX pool in one JSON-RPC batch, pinned to the block
+    """
+    if USE_SYNC_CACHE:
+        return [None] * len(tokens)
+    return get_batch_transport().call_many(
+        [(token["lp"].getReserves, []) for token in tokens],
+        block_identifier=block_number,
+    )
+
+
+def get_local_quote(token_in, token_out, reserves):
+    """
+    Quote 1 token_in -> WAVAX -> token_out using the same integer math as the router
+    """
+    token_in_reserve, wavax_in_reserve = reserves[token_in["address"]]
+    token_out_reserve, wavax_out_reserve = reserves[token_out["address"]]
+    wavax_out = get_amount_out(
+        1 * (10 ** token_in["decimals"]), token_in_reserve, wavax_in_reserve
+    )
+    return get_amount_out(wavax_out, wavax_out_reserve, token_out_reserve)
+
+
 # Main Program
 # condition if qty_out >= 1.01 are trades that deliver a min 1% profit.
+last_block = 0
+while LOCAL_QUOTES:
+    # one read per pool, once per block, then all 12 directed quotes from the same state
+    if (block_number := chain.height) == last_block:
+        time.sleep(0.1)
+        continue
+    last_block = block_number
+
+    tokens = [dai, mim, usdc, usdt]
+    reserves = {
+        token["address"]: get_wavax_pool_reserves(token, pool_reserves)
+        for token, pool_reserves in zip(tokens, read_pool_reserves(tokens, block_number))
+    }
+    for token_in, token_out in token_pairs:
+        qty_out = get_local_quote(token_in, token_out, reserves) / (
+            10 ** token_out["decimals"]
+        )
+        if qty_out >= 1.01:
+            print(
+                f"{datetime.datetime.now().strftime('[%I:%M:%S %p]')} {token_in['symbol']} -> {token_out['symbol']}: ({qty_out:.3f}) [block {last_block}]"
+            )
+
 while True:
     for pair in token_pairs:
         token_in = pair[0]
@@ -100,5 +189,6 @@ Prepare a data structure for each unique token pair
 [MAIN PROGRAM]
 Set up loop
 Fetch and store swap rates
+(LOCAL_QUOTES: read the TOKEN/WAVAX pool reserves once per block and quote every pair locally)
 Print interesting results
 """
\ No newline at end of file
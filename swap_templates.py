@@ -0,0 +1,129 @@
+"""
+Swap Templates (pre-built, pre-signed swapExactTokensForTokens)
+
+- router.swapExactTokensForTokens(..., {"from": user}) builds the transaction when the trigger fires:
+  eth_estimateGas, eth_getTransactionCount, eth_chainId, fee lookups, then signing, several RPC round-trips
+  on the critical path between the decision and the broadcast
+- a SwapTemplate resolves all of that ahead of time for one (router, path):
+    • chain id, gas limit and recipient are fixed
+    • the fee fields are refreshed off the critical path (once per block, see refresh())
+    • the nonce comes from the local NonceManager (no RPC)
+    • the calldata is pre-encoded except for the three words that change: amountIn, amountOutMin, deadline
+- at trigger time: encode three uint256 words, sign, one eth_sendRawTransaction
+
+swapExactTokensForTokens(uint256 amountIn, uint256 amountOutMin, address[] path, address to, uint256 deadline)
+calldata: selector | amountIn | amountOutMin | 0xa0 (offset of path) | to | deadline | len(path) | path...
+
+Usage:
+
+>>> template = SwapTemplate(router.address, [spell_address, sspell_address], user, nonce_manager, priority_fee=Wei("5 gwei"))
+>>> tx_hash = template.send(spell_in, int(sspell_out * (1 - SLIPPAGE)), int(time.time() + 30))  # deadline in seconds
+"""
+
+from brownie import web3
+from eth_account import Account
+
+# keccak256("swapExactTokensForTokens(uint256,uint256,address[],address,uint256)")[:4]
+SWAP_EXACT_TOKENS_FOR_TOKENS_SELECTOR = bytes.fromhex("38ed1739")
+
+# enough for a two-hop swap on TraderJoe / SushiSwap / Uniswap V2
+SWAP_GAS_LIMIT = 250_000
+
+# max fee = base fee * BASE_FEE_MULTIPLIER + priority fee, room for the base fee to rise before inclusion
+BASE_FEE_MULTIPLIER = 2
+
+
+def encode_uint(value: int) -> bytes:
+    return value.to_bytes(32, "big")
+
+
+def encode_address(address: str) -> bytes:
+    return bytes.fromhex(address[2:]).rjust(32, b"\0")
+
+
+class SwapTemplate:
+    """
+    A ready-to-fill swapExactTokensForTokens transaction for one router and path
+    """
+
+    def __init__(
+        self,
+        router_address: str,
+        path: list,
+        account,
+        nonce_manager,
+        gas_limit: int = SWAP_GAS_LIMIT,
+        priority_fee: int = None,
+        recipient: str = None,
+        broadcaster=None,
+    ) -> None:
+        self.router_address = web3.toChecksumAddress(router_address)
+        self.path = path
+        self._nonce_manager = nonce_manager
+        # BroadcastFanout (see broadcast_fanout.py) to send to every endpoint, otherwise brownie's provider
+        self._broadcaster = broadcaster
+        # brownie LocalAccount keeps the key as a hex string, sign without going through brownie
+        self._signer = Account.from_key(account.private_key)
+
+        recipient = recipient or account.address
+        # everything after amountIn and amountOutMin, except the deadline
+        self._calldata_middle = encode_uint(0xA0) + encode_address(recipient)
+        self._calldata_tail = encode_uint(len(path)) + b"".join(
+            encode_address(address) for address in path
+        )
+
+        self._tx = {
+            "chainId": web3.eth.chain_id,
+            "to": self.router_address,
+            "value": 0,
+            "gas": gas_limit,
+            "type": 2,
+        }
+        # pass the bot's priority fee (network.priority_fee), the node's suggestion is only a fallback
+        self.priority_fee = (
+            priority_fee if priority_fee is not None else web3.eth.max_priority_fee
+        )
+        self.refresh()
+
+    def refresh(self, base_fee: int = None) -> None:
+        """
+        Update the fee fields, call once per block outside the critical path.
+        Pass the base fee when several templates share one block lookup.
+        """
+        if base_fee is None:
+            base_fee = web3.eth.get_block("latest")["baseFeePerGas"]
+        self._tx["maxPriorityFeePerGas"] = self.priority_fee
+        self._tx["maxFeePerGas"] = base_fee * BASE_FEE_MULTIPLIER + self.priority_fee
+
+    def encode(self, amount_in: int, amount_out_min: int, deadline: int) -> bytes:
+        return (
+            SWAP_EXACT_TOKENS_FOR_TOKENS_SELECTOR
+            + encode_uint(amount_in)
+            + encode_uint(amount_out_min)
+            + self._calldata_middle
+            + encode_uint(deadline)
+            + self._calldata_tail
+        )
+
+    def sign(self, amount_in: int, amount_out_min: int, deadline: int) -> bytes:
+        """
+        The signed raw transaction, using the next local nonce
+        """
+        tx = dict(self._tx)
+        tx["data"] = self.encode(amount_in, amount_out_min, deadline)
+        tx["nonce"] = self._nonce_manager.next_nonce()
+        return self._signer.sign_transaction(tx).rawTransaction
+
+    def send(self, amount_in: int, amount_out_min: int, deadline: int) -> str:
+        """
+        Sign and broadcast with one eth_sendRawTransaction, returns the transaction hash
+        """
+        raw_transaction = self.sign(amount_in, amount_out_min, deadline)
+        try:
+            if self._broadcaster:
+                return self._broadcaster.send(raw_transaction)[0]
+            return web3.eth.send_raw_transaction(raw_transaction).hex()
+        except Exception:
+            # the nonce was not used, re-sync so the next transaction does not leave a gap
+            self._nonce_manager.sync()
+            raise
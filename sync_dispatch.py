@@ -0,0 +1,173 @@
+"""
+Sync Dispatch (one subscription for every watched pool)
+
+- event_listners.py creates a filter per pool:
+  web3.eth.contract(address=lp.address, abi=lp.abi).events.Sync.create_filter(...)
+  which means one filter (and one poll) per pool, and web3's generic ABI event decoding for every log
+- instead, ONE logs subscription on the Sync topic (optionally limited to an address list) covers every pool,
+  each log is dispatched through a dict of pool address -> ReserveCache, O(1) per log
+- Sync(uint112 reserve0, uint112 reserve1) has no indexed arguments, so the data field is exactly two 32 byte words
+  and decoding is two int() calls on slices of the hex string
+
+Usage:
+
+>>> dispatcher = SyncDispatcher(on_update=lambda pool: scheduler.notify())
+>>> for lp in lps:
+...     dispatcher.add_pool(ReserveCache(lp, sync_filter=False))
+>>> dispatcher.attach(pipeline)
+
+Reorgs (pass a ReserveJournal):
+
+>>> dispatcher = SyncDispatcher(journal=ReserveJournal(start_block=chain.height))
+- a log with "removed": true (sent by eth_subscribe when its block left the canonical chain)
+  rolls the pools back to the state before that block, the node then sends the new canonical logs
+- a log whose blockHash differs from the hash journaled for its block number (polling, no removed logs)
+  rolls back the same way before it is applied
+- recover() finds the common ancestor itself and replays the canonical logs after it
+- reseed() re-reads every pool with getReserves(), when the logs cannot be replayed
+  (a reorg deeper than the journal, or a websocket gap the EventPipeline could not backfill)
+"""
+
+from brownie import web3
+
+from log_backfill import to_int
+
+# keccak256("Sync(uint112,uint112)")
+SYNC_TOPIC = "0x1c411e9a96e071241c2f21f7726b17ae89e3cab4c78be50e062b03a9fffbbad1"
+
+
+def decode_sync_data(data: str):
+    """
+    Returns (reserve0, reserve1) from the hex data field of a Sync log
+    """
+    return int(data[2:66], 16), int(data[66:130], 16)
+
+
+def to_hex(value) -> str:
+    return value if isinstance(value, str) else "0x" + bytes(value).hex()
+
+
+class SyncDispatcher:
+    """
+    Routes Sync logs to the pool objects (ReserveCache or anything with apply_sync()) by pool address.
+    """
+
+    def __init__(self, on_update=None, journal=None) -> None:
+        # lowercase pool address -> pool
+        self._pools = {}
+        # called with the pool whenever a Sync changed its reserves
+        self._on_update = on_update
+        # ReserveJournal, undo history for reorgs
+        self.journal = journal
+
+    def __len__(self) -> int:
+        return len(self._pools)
+
+    @property
+    def addresses(self):
+        return list(self._pools)
+
+    def add_pool(self, pool) -> None:
+        self._pools[pool.address.lower()] = pool
+
+    def remove_pool(self, address: str) -> None:
+        self._pools.pop(address.lower(), None)
+
+    def get_pool(self, address: str):
+        return self._pools.get(address.lower())
+
+    def handle_log(self, log) -> bool:
+        """
+        Apply one Sync log to its pool. Returns True if the pool's reserves changed.
+        """
+        if (pool := self._pools.get(log["address"].lower())) is None:
+            return False
+
+        block_number = to_int(log["blockNumber"])
+        log_index = to_int(log["logIndex"])
+
+        if self.journal is not None:
+            if log.get("removed"):
+                self.rollback(block_number - 1)
+                return False
+
+            block_hash = to_hex(log["blockHash"])
+            journaled_hash = self.journal.get_block_hash(block_number)
+            if journaled_hash is not None and journaled_hash != block_hash:
+                self.rollback(block_number - 1)
+
+            if (block_number, log_index) <= pool.position:
+                return False
+            self.journal.record(pool, block_number, block_hash)
+
+        data = log["data"]
+        if not isinstance(data, str):
+            data = "0x" + bytes(data).hex()
+        reserve0, reserve1 = decode_sync_data(data)
+
+        if pool.apply_sync(
+            reserve0=reserve0,
+            reserve1=reserve1,
+            block_number=block_number,
+            log_index=log_index,
+        ):
+            if self._on_update:
+                self._on_update(pool)
+            return True
+        return False
+
+    def rollback(self, block_number: int) -> set:
+        """
+        Undo every journaled Sync after block_number, returns the pools that changed
+        """
+        pools = self.journal.rollback(block_number)
+        if self._on_update:
+            for pool in pools:
+                self._on_update(pool)
+        return pools
+
+    def recover(self, get_canonical_hash=None, get_logs=None) -> None:
+        """
+        Roll back to the newest journaled block still on the canonical chain, and replay the Sync logs after it.
+        Only when the reorg is deeper than the journal, every pool is re-read with getReserves().
+        get_canonical_hash(block_number) and get_logs(from_block, to_block) default to web3 calls.
+        """
+        if get_canonical_hash is None:
+            get_canonical_hash = lambda block_number: to_hex(web3.eth.get_block(block_number)["hash"])
+        if get_logs is None:
+            get_logs = lambda from_block, to_block: web3.eth.get_logs(
+                {"fromBlock": from_block, "toBlock": to_block, "address": self.addresses, "topics": [SYNC_TOPIC]}
+            )
+
+        ancestor = self.journal.find_common_ancestor(get_canonical_hash)
+        if ancestor is None or not self.journal.can_rollback(ancestor):
+            self.reseed()
+            return
+
+        self.rollback(ancestor)
+        for log in get_logs(ancestor + 1, "latest"):
+            self.handle_log(log)
+
+    def reseed(self) -> None:
+        """
+        Re-read every pool with getReserves(), and start the journal over from there
+        """
+        for pool in self._pools.values():
+            pool.seed()
+            if self._on_update:
+                self._on_update(pool)
+        if self.journal is not None:
+            self.journal.reset(max((pool.position[0] for pool in self._pools.values()), default=0))
+
+    def attach(self, pipeline, filter_addresses: bool = True) -> None:
+        """
+        Subscribe to Sync logs on an EventPipeline, the pools are re-seeded if a reconnect cannot backfill the gap.
+        With filter_addresses=False the node sends every Sync on the chain and unknown pools are skipped locally,
+        which avoids very long address lists that some providers reject.
+        """
+        pipeline.subscribe_logs(
+            self.handle_log,
+            address=self.addresses if filter_addresses else None,
+            topics=[SYNC_TOPIC],
+            on_gap=self.reseed,
+        )
@@ -0,0 +1,237 @@
+"""
+Sync History (historical reserves in an append-only binary file)
+
+- months of reserve history with getReserves() means one call per block per pool, far too slow
+- every reserve change is a Sync log, so the history is exactly the Sync logs of the pools,
+  fetched with parallel eth_getLogs ranges (see log_backfill.py) in windows of WINDOW_SIZE blocks
+- records are appended to flat binary files with a fixed NumPy dtype, one record per Sync:
+  block, log index, pool id, and both reserves split into low/high 64 bit words (uint112 does not fit a uint64)
+- one file per pool (<filename>.<pool id>), so a pool's records are contiguous and pool_records() is the
+  memmap itself, not a filtered copy
+- the files are read with np.memmap: no parsing, the OS pages the records in as they are touched,
+  and every process reading the same file shares the same pages
+- a JSON sidecar (<filename>.json) holds the pool id -> address table and the last block fully written,
+  so an interrupted backfill resumes where it stopped
+
+Usage:
+
+$ python3 sync_history.py
+
+>>> history = SyncHistory("spell_sspell.sync")
+>>> records = history.pool_records("0x033C3Fc1fC13F803A233D262e24d1ec3fd4EFB48")
+>>> reserve0 = reserve_float(records, 0)
+"""
+
+import asyncio
+import glob
+import json
+import os
+import sys
+
+import numpy as np
+from brownie import network, web3
+
+from log_backfill import get_logs_backfill, to_int
+from sync_dispatch import SYNC_TOPIC, decode_sync_data
+
+# pools to record, add neighbouring pools here (address -> name)
+POOLS = {
+    "0x033C3Fc1fC13F803A233D262e24d1ec3fd4EFB48": "TraderJoe LP: SPELL-sSPELL",
+}
+
+HISTORY_FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), "spell_sspell.sync")
+# first block to record, lower it for a longer history
+START_BLOCK = 7_000_000
+
+# blocks written per append, the backfill can resume at any window
+WINDOW_SIZE = 100_000
+
+RECORD_DTYPE = np.dtype(
+    [
+        ("block", "<u8"),
+        ("log_index", "<u4"),
+        ("pool", "<u4"),
+        ("reserve0_lo", "<u8"),
+        ("reserve0_hi", "<u8"),
+        ("reserve1_lo", "<u8"),
+        ("reserve1_hi", "<u8"),
+    ]
+)
+
+MASK_64 = 2 ** 64 - 1
+
+
+def encode_records(logs, pool_ids: dict) -> np.ndarray:
+    """
+    Sync logs (raw JSON-RPC, in chain order) as an array of RECORD_DTYPE
+    """
+    records = np.zeros(len(logs), dtype=RECORD_DTYPE)
+    for i, log in enumerate(logs):
+        reserve0, reserve1 = decode_sync_data(log["data"])
+        records[i] = (
+            to_int(log["blockNumber"]),
+            to_int(log["logIndex"]),
+            pool_ids[log["address"].lower()],
+            reserve0 & MASK_64,
+            reserve0 >> 64,
+            reserve1 & MASK_64,
+            reserve1 >> 64,
+        )
+    return records
+
+
+def reserve_float(records: np.ndarray, token: int) -> np.ndarray:
+    """
+    reserve0 (token=0) or reserve1 (token=1) of every record as float64, for vectorized analysis
+    """
+    return records[f"reserve{token}_hi"] * float(2 ** 64) + records[f"reserve{token}_lo"]
+
+
+def reserve_int(record, token: int) -> int:
+    """
+    Exact reserve0 (token=0) or reserve1 (token=1) of a single record
+    """
+    return (int(record[f"reserve{token}_hi"]) << 64) | int(record[f"reserve{token}_lo"])
+
+
+async def rpc_request(method: str, params: list):
+    """
+    Async JSON-RPC call over brownie's provider, for get_logs_backfill()
+    """
+    response = await asyncio.to_thread(web3.provider.make_request, method, params)
+    if "error" in response:
+        raise ValueError(response["error"])
+    return response["result"]
+
+
+class SyncHistory:
+    """
+    Append-only Sync record files (one per pool) plus their JSON sidecar
+    """
+
+    def __init__(self, filename: str = HISTORY_FILENAME) -> None:
+        self.filename = filename
+        self.meta_filename = filename + ".json"
+
+        if os.path.exists(self.meta_filename):
+            with open(self.meta_filename) as file:
+                meta = json.load(file)
+        else:
+            meta = {"pools": [], "last_block": None}
+        # pool id -> lowercase address
+        self.pools = meta["pools"]
+        # last block whose Sync logs are all in the file
+        self.last_block = meta["last_block"]
+
+        self._truncate_unfinished()
+
+    def __len__(self) -> int:
+        return sum(self._count(pool) for pool in range(len(self.pools)))
+
+    def pool_filename(self, pool: int) -> str:
+        return f"{self.filename}.{pool}"
+
+    def _count(self, pool: int) -> int:
+        filename = self.pool_filename(pool)
+        if not os.path.exists(filename):
+            return 0
+        return os.path.getsize(filename) // RECORD_DTYPE.itemsize
+
+    def _memmap(self, pool: int) -> np.ndarray:
+        count = self._count(pool)
+        if count == 0:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        return np.memmap(self.pool_filename(pool), dtype=RECORD_DTYPE, mode="r", shape=(count,))
+
+    def _truncate_unfinished(self) -> None:
+        """
+        Drop records written after the sidecar was last saved (an interrupted append),
+        including the files of new pools the sidecar does not list yet
+        """
+        for filename in glob.glob(glob.escape(self.filename) + ".*"):
+            pool = filename[len(self.filename) + 1 :]
+            if pool.isdigit() and int(pool) >= len(self.pools):
+                os.remove(filename)
+
+        for pool in range(len(self.pools)):
+            if not os.path.exists(self.pool_filename(pool)):
+                continue
+            count = 0
+            if self.last_block is not None:
+                count = int(np.searchsorted(self._memmap(pool)["block"], self.last_block, side="right"))
+            with open(self.pool_filename(pool), "r+b") as file:
+                file.truncate(count * RECORD_DTYPE.itemsize)
+
+    def _save_meta(self) -> None:
+        temp_filename = self.meta_filename + ".tmp"
+        with open(temp_filename, "w") as file:
+            json.dump({"pools": self.pools, "last_block": self.last_block}, file)
+        os.replace(temp_filename, self.meta_filename)
+
+    def pool_id(self, address: str) -> int:
+        address = address.lower()
+        if address not in self.pools:
+            self.pools.append(address)
+        return self.pools.index(address)
+
+    def append(self, logs, last_block: int) -> None:
+        """
+        Append the Sync logs of every block up to last_block
+        """
+        pool_ids = {address: self.pool_id(address) for address in {log["address"].lower() for log in logs}}
+        records = encode_records(logs, pool_ids)
+        for pool in sorted(pool_ids.values()):
+            with open(self.pool_filename(pool), "ab") as file:
+                file.write(records[records["pool"] == pool].tobytes())
+                file.flush()
+                os.fsync(file.fileno())
+        # the sidecar is saved after the records, so a crash in between only loses the unfinished window
+        self.last_block = last_block
+        self._save_meta()
+
+    def records(self) -> np.ndarray:
+        """
+        Every pool's records merged in chain order (an in-memory copy, use pool_records() for one pool)
+        """
+        records = np.concatenate(
+            [np.zeros(0, dtype=RECORD_DTYPE)] + [self._memmap(pool) for pool in range(len(self.pools))]
+        )
+        return records[np.lexsort((records["log_index"], records["block"]))]
+
+    def pool_records(self, address: str) -> np.ndarray:
+        """
+        The pool's records as a read-only memory-mapped array (zero-copy, shared between processes)
+        """
+        return self._memmap(self.pools.index(address.lower()))
+
+    async def backfill(self, addresses, from_block: int, to_block: int, window_size: int = WINDOW_SIZE) -> None:
+        """
+        Fetch and append the Sync logs of the pools, resuming after last_block
+        """
+        if self.last_block is not None:
+            from_block = max(from_block, self.last_block + 1)
+        log_filter = {"address": list(addresses), "topics": [SYNC_TOPIC]}
+
+        for start in range(from_block, to_block + 1, window_size):
+            end = min(to_block, start + window_size - 1)
+            logs = await get_logs_backfill(rpc_request, log_filter, start, end)
+            self.append(logs, end)
+            print(f"Blocks {start} to {end}: {len(logs)} Sync logs ({len(self)} records)")
+
+
+def main():
+    try:
+        network.connect("avax-main")
+    except:
+        sys.exit(
+            "Could not connect to Avalanche! Verify that brownie lists the Avalanche Mainnet using 'brownie networks list'"
+        )
+
+    history = SyncHistory()
+    print(f"Recording {', '.join(POOLS.values())} to {history.filename}")
+    asyncio.run(history.backfill(POOLS, START_BLOCK, web3.eth.block_number))
+
+
+# Only executes main loop if this file is called directly
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import os
+import sys
+
+import pytest
+
+# the modules live at the repository root and import each other by name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StandInEth:
+    """
+    The web3.eth calls the modules make, answered from plain attributes
+    """
+
+    def __init__(self):
+        # eth_blockNumber, and how often it was read
+        self.head = 0
+        self.polls = 0
+        # eth_getTransactionCount(address, "pending")
+        self.pending = 0
+        # transaction hash -> receipt status
+        self.statuses = {}
+
+    @property
+    def block_number(self):
+        self.polls += 1
+        return self.head
+
+    def get_transaction_count(self, address, block_identifier):
+        assert block_identifier == "pending"
+        return self.pending
+
+    def wait_for_transaction_receipt(self, tx_hash):
+        return {"status": self.statuses[tx_hash]}
+
+
+class StandInWeb3:
+    def __init__(self):
+        self.eth = StandInEth()
+
+
+class StandInChain:
+    # brownie's chain.height
+    height = 0
+
+
+@pytest.fixture
+def patch_web3(monkeypatch):
+    """
+    patch_web3(module) replaces the web3 object the module imported from brownie, and returns the stand-in
+    """
+
+    def patch(module):
+        web3 = StandInWeb3()
+        monkeypatch.setattr(module, "web3", web3)
+        return web3
+
+    return patch
+
+
+@pytest.fixture
+def patch_chain(monkeypatch):
+    """
+    patch_chain(module) replaces the chain object the module imported from brownie, and returns the stand-in
+    """
+
+    def patch(module):
+        chain = StandInChain()
+        monkeypatch.setattr(module, "chain", chain)
+        return chain
+
+    return patch
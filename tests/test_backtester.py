@@ -0,0 +1,93 @@
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+pytest.importorskip("brownie")
+
+from backtester import build_events, run_backtest, screen
+from pool_math import get_amount_out
+from sync_history import MASK_64, RECORD_DTYPE
+
+RESERVE = 10 ** 24
+BALANCE = 100_000 * 10 ** 18
+
+
+def make_records(rows):
+    """
+    (block, log index, reserve0, reserve1) rows as RECORD_DTYPE
+    """
+    records = np.zeros(len(rows), dtype=RECORD_DTYPE)
+    for i, (block, log_index, reserve0, reserve1) in enumerate(rows):
+        records[i] = (block, log_index, 0, reserve0 & MASK_64, reserve0 >> 64, reserve1 & MASK_64, reserve1 >> 64)
+    return records
+
+
+def test_build_events():
+    records = make_records([(10, 0, RESERVE, RESERVE), (12, 0, RESERVE, RESERVE), (12, 3, RESERVE, RESERVE)])
+    blocks, record_index, event_rates = build_events(records, np.array([8, 11]), np.array([1.0, 1.5]))
+    assert list(blocks) == [10, 11, 12]
+    # the last record at or before each block
+    assert list(record_index) == [0, 0, 2]
+    assert list(event_rates) == [1.0, 1.5, 1.5]
+
+
+def test_build_events_starts_at_the_first_rate():
+    records = make_records([(10, 0, RESERVE, RESERVE)])
+    blocks, record_index, event_rates = build_events(records, np.array([15]), np.array([1.0]))
+    assert list(blocks) == [15]
+    assert list(record_index) == [0]
+
+
+def test_build_events_empty():
+    blocks, record_index, event_rates = build_events(make_records([]), np.array([15]), np.array([1.0]))
+    assert len(blocks) == len(record_index) == len(event_rates) == 0
+
+
+def test_screen():
+    reserve = np.array([1.0, 1.0, 1.0])
+    # rate: SPELL per sSPELL, token0 is sSPELL, token1 is SPELL
+    # a fair pool only trades at rates outside (1 - fee) / (1 + 0.05) .. 1 / ((1 + 0.02) * (1 - fee))
+    rates = np.array([0.97, 1.5, 0.5])
+    buy_sspell, sell_sspell = screen(reserve, reserve, rates, 0.02, 0.05)
+    assert list(buy_sspell) == [False, True, False]
+    assert list(sell_sspell) == [False, False, True]
+
+
+def test_fair_pool_does_not_trade():
+    records = make_records([(10, 0, RESERVE, RESERVE), (11, 0, RESERVE, RESERVE)])
+    result = run_backtest(records, np.array([10]), np.array([0.97]), spell_balance=BALANCE)
+    assert result["fills"] == result["reverts"] == result["gas"] == result["pnl"] == 0
+    assert result["blocks"] == 2
+    assert result["spell_balance"] == BALANCE
+
+
+def test_cheap_sspell_is_bought():
+    records = make_records([(10, 0, RESERVE, RESERVE)])
+    result = run_backtest(records, np.array([10]), np.array([1.5]), spell_balance=BALANCE, gas_price=1)
+
+    # the whole balance is below the size that moves the pool to the threshold
+    sspell_out = get_amount_out(BALANCE, RESERVE, RESERVE)
+    assert result["fills"] == 1
+    assert result["trades"] == [(10, "SPELL -> sSPELL", BALANCE, sspell_out)]
+    assert result["spell_balance"] == 0
+    assert result["sspell_balance"] == sspell_out
+    assert result["pnl"] == int(sspell_out * Fraction(3, 2) - BALANCE)
+    assert result["gas"] == 150_000
+
+
+def test_fill_below_amount_out_min_reverts():
+    records = make_records(
+        [
+            (10, 0, RESERVE, RESERVE),
+            # someone else bought sSPELL first, our quote from block 10 no longer fills
+            (11, 0, RESERVE * 9 // 10, RESERVE * 11 // 10),
+        ]
+    )
+    result = run_backtest(
+        records, np.array([10]), np.array([1.5]), spell_balance=BALANCE, gas_price=1, latency_blocks=1
+    )
+    assert result["reverts"] == 1
+    assert result["trades"][0][0] == 11
+    assert result["fills"] == 1
+    assert result["gas"] == 2 * 150_000
@@ -0,0 +1,67 @@
+import random
+from fractions import Fraction
+
+import numpy as np
+
+from batch_quotes import quote_matrix, scan
+from pool_math import get_amount_out
+
+SIZES = [n * 10 ** 18 for n in (1, 1_000, 10_000, 100_000, 1_000_000)]
+
+
+def make_pools(count, seed=1):
+    rng = random.Random(seed)
+    reserves_in = [rng.randrange(10 ** 21, 2 ** 111) for _ in range(count)]
+    reserves_out = [rng.randrange(10 ** 21, 2 ** 111) for _ in range(count)]
+    return reserves_in, reserves_out
+
+
+def exact_scan(reserves_in, reserves_out, amounts_in, ratios):
+    return [
+        (pool_index, size_index, amount_in, get_amount_out(amount_in, reserve_in, reserve_out))
+        for pool_index, (reserve_in, reserve_out, ratio) in enumerate(zip(reserves_in, reserves_out, ratios))
+        for size_index, amount_in in enumerate(amounts_in)
+        if get_amount_out(amount_in, reserve_in, reserve_out) >= ratio * amount_in
+    ]
+
+
+def test_quote_matrix_is_close_to_the_exact_quotes():
+    reserves_in, reserves_out = make_pools(20)
+    quotes = quote_matrix(reserves_in, reserves_out, SIZES)
+    exact = np.array([[float(get_amount_out(size, x, y)) for size in SIZES] for x, y in zip(reserves_in, reserves_out)])
+    assert quotes.shape == (20, len(SIZES))
+    assert np.allclose(quotes, exact, rtol=1e-12)
+
+
+def test_scan_matches_the_exact_math():
+    reserves_in, reserves_out = make_pools(200)
+    ratio = Fraction(1)
+    assert scan(reserves_in, reserves_out, SIZES, ratio) == exact_scan(
+        reserves_in, reserves_out, SIZES, [ratio] * len(reserves_in)
+    )
+
+
+def test_scan_with_a_ratio_per_pool():
+    reserves_in, reserves_out = make_pools(50)
+    ratios = [Fraction(y, x) * Fraction(99, 100) for x, y in zip(reserves_in, reserves_out)]
+    results = scan(reserves_in, reserves_out, SIZES, ratios)
+    assert results == exact_scan(reserves_in, reserves_out, SIZES, ratios)
+    assert results
+
+
+def test_scan_borderline_is_decided_by_the_exact_math():
+    reserve_in, reserve_out = 3 * 10 ** 24 + 7, 5 * 10 ** 24 + 11
+    amount_in = 12_345 * 10 ** 18 + 1
+    amount_out = get_amount_out(amount_in, reserve_in, reserve_out)
+
+    # exactly at the threshold passes, one wei above it does not, though both are the same in float64
+    at = Fraction(amount_out, amount_in)
+    above = Fraction(amount_out + 1, amount_in)
+    assert float(at) == float(above)
+    assert scan([reserve_in], [reserve_out], [amount_in], at) == [(0, 0, amount_in, amount_out)]
+    assert scan([reserve_in], [reserve_out], [amount_in], above) == []
+
+
+def test_scan_without_pools():
+    assert scan([], [], SIZES, Fraction(1)) == []
+    assert scan([], [], SIZES, []) == []
@@ -0,0 +1,143 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("brownie")
+pytest.importorskip("requests")
+
+import batch_transport
+from batch_transport import BatchTransport
+
+
+class StandInCall:
+    """
+    Looks like a brownie ContractCall: returns its number times 10, number 0 reverts
+    """
+
+    _address = "0x0000000000000000000000000000000000000001"
+
+    def __init__(self, number):
+        self.number = number
+
+    def encode_input(self, *args):
+        return hex(self.number)
+
+    def decode_output(self, data):
+        return int(data, 16) * 10
+
+
+def start_batch_server():
+    """
+    JSON-RPC batch server answering in reverse order, returns (server, url, batch sizes)
+    """
+    batches = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            requests = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            batches.append(len(requests))
+            replies = []
+            for request in reversed(requests):
+                if request["method"] != "eth_call" or request["params"][0]["data"] == "0x0":
+                    replies.append({"jsonrpc": "2.0", "id": request["id"], "error": {"message": "execution reverted"}})
+                else:
+                    replies.append({"jsonrpc": "2.0", "id": request["id"], "result": request["params"][0]["data"]})
+            body = json.dumps(replies).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", batches
+
+
+@pytest.fixture
+def servers():
+    started = []
+
+    def start():
+        server, url, batches = start_batch_server()
+        started.append(server)
+        return url, batches
+
+    yield start
+    for server in started:
+        server.shutdown()
+
+
+class StandInProvider:
+    def __init__(self, endpoint_uri=None, pool=None):
+        self.endpoint_uri = endpoint_uri
+        if pool is not None:
+            self.pool = pool
+
+
+class StandInWeb3:
+    def __init__(self, provider):
+        self.provider = provider
+
+
+def test_call_many_in_one_batch(servers):
+    url, batches = servers()
+    transport = BatchTransport(url)
+    assert transport.call_many([(StandInCall(n), []) for n in (1, 2, 0, 3)]) == [10, 20, None, 30]
+    assert batches == [4]
+
+
+def test_requests_from_threads_are_coalesced(servers):
+    url, batches = servers()
+    transport = BatchTransport(url, window=0.05)
+    results = [None] * 10
+
+    def read(n):
+        results[n] = transport.eth_call(StandInCall(n + 1)).result()
+
+    threads = [threading.Thread(target=read, args=(n,)) for n in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [10 * (n + 1) for n in range(10)]
+    assert sum(batches) == 10 and len(batches) < 10
+
+
+def test_json_rpc_error_raises(servers):
+    url, _ = servers()
+    with pytest.raises(ValueError):
+        BatchTransport(url).request("eth_blockNumber", [])
+
+
+def test_endpoint_is_looked_up_on_every_send(servers, monkeypatch):
+    first_url, first_batches = servers()
+    second_url, second_batches = servers()
+    web3 = StandInWeb3(StandInProvider(first_url))
+    monkeypatch.setattr(batch_transport, "web3", web3)
+
+    transport = BatchTransport()
+    transport.call_many([(StandInCall(1), [])])
+    web3.provider = StandInProvider(second_url)
+    transport.call_many([(StandInCall(2), [])])
+    assert first_batches == [1] and second_batches == [1]
+
+
+def test_batches_go_through_the_rpc_pool(servers, monkeypatch):
+    pytest.importorskip("web3")
+    from rpc_pool import RpcPool
+
+    url, batches = servers()
+    pool = RpcPool(["http://127.0.0.1:9", url])
+    # the dead endpoint ranks first, the pool fails over
+    pool.stats[url].record(1.0)
+    monkeypatch.setattr(batch_transport, "web3", StandInWeb3(StandInProvider(pool=pool)))
+
+    assert BatchTransport().call_many([(StandInCall(n), []) for n in (1, 2)]) == [10, 20]
+    assert batches == [2]
+    assert pool.stats["http://127.0.0.1:9"].errors == 1
+    pool.close()
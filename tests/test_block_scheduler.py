@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("brownie")
+
+import block_scheduler
+from block_scheduler import BlockScheduler
+
+
+class StandInPipeline:
+    def subscribe_new_heads(self, handler):
+        self.new_head = handler
+
+
+@pytest.fixture
+def web3(patch_web3):
+    web3 = patch_web3(block_scheduler)
+    web3.eth.head = 100
+    return web3
+
+
+def test_pushed_block_wakes_wait(web3):
+    scheduler = BlockScheduler(fallback_time=5.0, watch_blocks=False)
+    pipeline = StandInPipeline()
+    scheduler.subscribe(pipeline)
+
+    threading.Timer(0.05, pipeline.new_head, args=({"number": hex(101)},)).start()
+    start = time.monotonic()
+    assert scheduler.wait() == 101
+    assert time.monotonic() - start < 1.0
+
+
+def test_polling_is_only_a_fallback(web3):
+    scheduler = BlockScheduler(fallback_time=0.3, poll_time=0.01)
+    pipeline = StandInPipeline()
+    scheduler.subscribe(pipeline)
+    pipeline.new_head({"number": hex(100)})
+    scheduler.start()
+
+    time.sleep(0.2)
+    # the subscription is live, eth_blockNumber is not polled
+    assert web3.eth.polls == 0
+
+    time.sleep(0.3)
+    # silent for longer than fallback_time, polling takes over
+    assert web3.eth.polls > 0
+    scheduler.stop()
+
+
+def test_polling_without_subscription(web3):
+    scheduler = BlockScheduler(fallback_time=0.3, poll_time=0.01)
+    scheduler.start()
+    assert scheduler.wait() == 100
+    # the same block does not wake the loop again
+    assert scheduler.wait() is None
+    scheduler.stop()
+
+
+def test_notify_keeps_the_newest_block(web3):
+    scheduler = BlockScheduler(watch_blocks=False)
+    scheduler.notify(12)
+    scheduler.notify(11)
+    scheduler.notify()
+    assert scheduler.wait() == 12
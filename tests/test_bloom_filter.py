@@ -0,0 +1,59 @@
+import pytest
+
+pytest.importorskip("brownie")
+eth_utils = pytest.importorskip("eth_utils")
+
+from bloom_filter import BloomLogWatcher, bloom_mask, to_bytes
+from sync_dispatch import SYNC_TOPIC
+
+POOL = "0x033C3Fc1fC13F803A233D262e24d1ec3fd4EFB48"
+TOKEN = "0xCE1bFFBD5374Dac86a2893119683F4911a2F7814"
+OTHER_POOL = "0xA389f9430876455C36478DeEa9769B7Ca4E3DDB1"
+# keccak256("Transfer(address,address,uint256)")
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+
+
+def geth_bloom(values) -> bytes:
+    """
+    logsBloom the way go-ethereum builds it (core/types/bloom9.go): bit v is bit v % 8 of byte 255 - v // 8
+    """
+    bloom = bytearray(256)
+    for value in values:
+        value_hash = eth_utils.keccak(value)
+        for i in (0, 2, 4):
+            v = ((value_hash[i] << 8) | value_hash[i + 1]) & 2047
+            bloom[255 - v // 8] |= 1 << (v % 8)
+    return bytes(bloom)
+
+
+def test_mask_matches_the_geth_reference_bloom():
+    # TestBloomExtensively in go-ethereum's core/types/bloom9_test.go
+    bloom = 0
+    for i in range(100):
+        bloom |= bloom_mask(f"xxxxxxxxxx data {i} yyyyyyyyyyyyyy".encode())
+    assert eth_utils.keccak(bloom.to_bytes(256, "big")).hex() == (
+        "c8d3ca65cdb4874300a9e39475508f23ed6da09fdbc487f89a2dcf50b09eb263"
+    )
+
+
+def test_block_with_a_sync_log_matches():
+    # one Sync from the pool and one Transfer from a token
+    logs_bloom = "0x" + geth_bloom(
+        [to_bytes(POOL), to_bytes(SYNC_TOPIC), to_bytes(TOKEN), to_bytes(TRANSFER_TOPIC)]
+    ).hex()
+    assert BloomLogWatcher([POOL], [SYNC_TOPIC], print).might_match(logs_bloom)
+    assert BloomLogWatcher([OTHER_POOL, POOL], [SYNC_TOPIC], print).might_match(logs_bloom)
+
+
+def test_block_without_the_pool_or_topic_does_not_match():
+    logs_bloom = geth_bloom([to_bytes(TOKEN), to_bytes(TRANSFER_TOPIC), to_bytes(OTHER_POOL), to_bytes(SYNC_TOPIC)])
+    # no log from the pool
+    assert not BloomLogWatcher([POOL], [SYNC_TOPIC], print).might_match(logs_bloom)
+
+    logs_bloom = geth_bloom([to_bytes(POOL), to_bytes(TRANSFER_TOPIC)])
+    # a log from the pool, but not a Sync
+    watcher = BloomLogWatcher([POOL], [SYNC_TOPIC], print)
+    assert not watcher.might_match(logs_bloom)
+    # no eth_getLogs for a block that cannot match
+    assert watcher.check_block({"logsBloom": logs_bloom, "hash": "0x01"}) == []
+    assert (watcher.blocks_checked, watcher.blocks_fetched) == (1, 0)
@@ -0,0 +1,85 @@
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("web3")
+
+from web3 import Web3
+
+from broadcast_fanout import BroadcastFanout, EndpointStats, start_stand_in_server
+
+RAW_TRANSACTION = "0x02f8" + "00" * 16
+
+
+@pytest.fixture
+def servers():
+    started = []
+
+    def start(**kwargs):
+        server, url = start_stand_in_server(**kwargs)
+        started.append(server)
+        return url
+
+    yield start
+    for server in started:
+        server.shutdown()
+
+
+def test_hash_is_computed_locally(servers):
+    url = servers(delay=0.001)
+    fanout = BroadcastFanout([url])
+    tx_hash, first = fanout.send(RAW_TRANSACTION)
+    assert tx_hash == Web3.keccak(hexstr=RAW_TRANSACTION).hex()
+    assert first == url
+    assert fanout.stats[url].first == 1
+    fanout.close()
+
+
+def test_nonce_too_low_alone_is_not_an_acceptance(servers):
+    url = servers(delay=0.001, reject="nonce too low")
+    fanout = BroadcastFanout([url])
+    with pytest.raises(ValueError):
+        fanout.send(RAW_TRANSACTION)
+    assert fanout.stats[url].first == 0
+    fanout.close()
+
+
+def test_nonce_too_low_never_counts_as_first(servers):
+    known = servers(delay=0.001, reject="nonce too low")
+    accepting = servers(delay=0.050)
+    fanout = BroadcastFanout([known, accepting])
+    tx_hash, first = fanout.send(RAW_TRANSACTION)
+    assert tx_hash == Web3.keccak(hexstr=RAW_TRANSACTION).hex()
+    assert first == accepting
+    assert fanout.stats[known].first == 0
+    # not an endpoint failure either
+    assert fanout.stats[known].errors == 0
+    fanout.close()
+
+
+def test_already_known_is_an_acceptance(servers):
+    endpoints = [servers(delay=0.001, reject="already known") for _ in range(2)]
+    fanout = BroadcastFanout(endpoints)
+    tx_hash, first = fanout.send(RAW_TRANSACTION)
+    assert tx_hash == Web3.keccak(hexstr=RAW_TRANSACTION).hex()
+    assert first in endpoints
+    fanout.close()
+
+
+def test_rejected_by_every_endpoint(servers):
+    endpoints = [servers(delay=0.001, reject="transaction underpriced") for _ in range(2)]
+    fanout = BroadcastFanout(endpoints)
+    with pytest.raises(ValueError):
+        fanout.send(RAW_TRANSACTION)
+    assert all(fanout.stats[url].errors == 1 for url in endpoints)
+    fanout.close()
+
+
+def test_endpoint_stats_percentile():
+    stats = EndpointStats("http://localhost")
+    assert stats.percentile(95) is None
+    for latency in range(1, 101):
+        stats.record(latency / 1000)
+    stats.record_error()
+    assert stats.percentile(50) == pytest.approx(0.051)
+    assert stats.consecutive_errors == 1
+    assert stats.error_rate == pytest.approx(1 / 101)
@@ -0,0 +1,168 @@
+import asyncio
+import functools
+import json
+
+import pytest
+
+websockets = pytest.importorskip("websockets")
+from websockets.asyncio.server import serve
+
+import event_pipeline
+from event_pipeline import EventPipeline
+from log_backfill import get_logs_backfill
+
+
+class StandInNode:
+    """
+    Websocket JSON-RPC node, each connection is scripted by the test:
+    connection(number, subscribe_params) returns ("error", message) or ("events", [results], close)
+    """
+
+    def __init__(self, connection):
+        self._connection = connection
+        self.connections = 0
+        self.requests = []
+        self.block_number = 0
+        # eth_getLogs result, None for an error
+        self.logs = []
+
+    async def handle(self, websocket):
+        self.connections += 1
+        number = self.connections
+        async for message in websocket:
+            message = json.loads(message)
+            self.requests.append(message["method"])
+            reply = {"jsonrpc": "2.0", "id": message["id"]}
+
+            if message["method"] == "eth_blockNumber":
+                await websocket.send(json.dumps({**reply, "result": hex(self.block_number)}))
+            elif message["method"] == "eth_getLogs":
+                if self.logs is None:
+                    await websocket.send(json.dumps({**reply, "error": {"code": -32000, "message": "header not found"}}))
+                else:
+                    await websocket.send(json.dumps({**reply, "result": self.logs}))
+            elif message["method"] == "eth_subscribe":
+                script = self._connection(number, message["params"])
+                if script[0] == "error":
+                    await websocket.send(json.dumps({**reply, "error": {"code": -32000, "message": script[1]}}))
+                    continue
+                await websocket.send(json.dumps({**reply, "result": "0x1"}))
+                _, results, close = script
+                for result in results:
+                    await websocket.send(
+                        json.dumps(
+                            {
+                                "jsonrpc": "2.0",
+                                "method": "eth_subscription",
+                                "params": {"subscription": "0x1", "result": result},
+                            }
+                        )
+                    )
+                if close:
+                    return
+
+
+async def run_until(node, pipeline, done, timeout=5.0):
+    """
+    Run the pipeline against the node until done() or the timeout
+    """
+    async with serve(node.handle, "127.0.0.1", 0) as server:
+        pipeline.url = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+        task = asyncio.create_task(pipeline.run())
+        try:
+            async with asyncio.timeout(timeout):
+                while not done():
+                    await asyncio.sleep(0.01)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+def log(block_number, log_index=0):
+    return {"address": "0xAa", "blockNumber": hex(block_number), "logIndex": hex(log_index)}
+
+
+def test_events_are_handled_in_order():
+    node = StandInNode(lambda number, params: ("events", [log(5), log(5, 1), log(6)], False))
+    pipeline = EventPipeline(None)
+    handled = []
+    pipeline.subscribe_logs(handled.append, topics=["0x01"])
+
+    asyncio.run(run_until(node, pipeline, lambda: len(handled) == 3))
+    assert handled == [log(5), log(5, 1), log(6)]
+    assert pipeline.last_block == 6
+    assert node.connections == 1
+
+
+def test_rpc_error_reconnects():
+    def connection(number, params):
+        if number == 1:
+            return ("error", "subscription limit reached")
+        return ("events", [{"number": hex(7)}], False)
+
+    node = StandInNode(connection)
+    pipeline = EventPipeline(None, reconnect_delay=0.01)
+    handled = []
+    pipeline.subscribe_new_heads(handled.append)
+
+    asyncio.run(run_until(node, pipeline, lambda: handled))
+    assert handled == [{"number": hex(7)}]
+    assert node.connections == 2
+
+
+def test_handlers_cannot_await_requests():
+    node = StandInNode(lambda number, params: ("events", [{"number": hex(7)}], False))
+    pipeline = EventPipeline(None, queue_size=1)
+    errors = []
+
+    async def handler(header):
+        try:
+            await pipeline.request("eth_blockNumber", [])
+        except RuntimeError as e:
+            errors.append(e)
+
+    pipeline.subscribe_new_heads(handler)
+    asyncio.run(run_until(node, pipeline, lambda: errors))
+    assert "eth_blockNumber" not in node.requests
+
+
+def reconnecting_node():
+    """
+    The first connection pushes the log of block 5 and drops, the next one is at block 8 and pushes block 9 live
+    """
+
+    def connection(number, params):
+        if number == 1:
+            return ("events", [log(5)], True)
+        return ("events", [log(9)], False)
+
+    node = StandInNode(connection)
+    node.block_number = 8
+    return node
+
+
+def test_reconnect_backfills_the_gap():
+    node = reconnecting_node()
+    node.logs = [log(5), log(6)]
+    pipeline = EventPipeline(None, reconnect_delay=0.01)
+    handled = []
+    pipeline.subscribe_logs(handled.append, topics=["0x01"])
+
+    asyncio.run(run_until(node, pipeline, lambda: len(handled) == 4))
+    # block 5 is fetched again, the live log is held back until the backfill is queued
+    assert handled == [log(5), log(5), log(6), log(9)]
+
+
+def test_unfetchable_gap_calls_on_gap(monkeypatch):
+    monkeypatch.setattr(event_pipeline, "get_logs_backfill", functools.partial(get_logs_backfill, retry_delay=0))
+    node = reconnecting_node()
+    node.logs = None
+    pipeline = EventPipeline(None, reconnect_delay=0.01)
+    handled = []
+    gaps = []
+    pipeline.subscribe_logs(handled.append, topics=["0x01"], on_gap=lambda: gaps.append(pipeline.last_block))
+
+    asyncio.run(run_until(node, pipeline, lambda: len(handled) == 2))
+    assert gaps == [5]
+    assert handled == [log(5), log(9)]
+    assert node.connections == 2
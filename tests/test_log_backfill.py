@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from log_backfill import get_logs_backfill
+
+LOGS = [{"blockNumber": hex(block), "logIndex": "0x0"} for block in range(1000)]
+
+
+class StandInNode:
+    """
+    eth_getLogs over LOGS (one log per block), capped at max_blocks per request,
+    failing the first `failures` requests with `error`
+    """
+
+    def __init__(self, max_blocks=10, failures=0, error=ValueError("header not found")):
+        self.max_blocks = max_blocks
+        self.failures = failures
+        self.error = error
+        self.requests = 0
+
+    async def request(self, method, params):
+        assert method == "eth_getLogs"
+        self.requests += 1
+        if self.failures:
+            self.failures -= 1
+            raise self.error
+        start, end = int(params[0]["fromBlock"], 16), int(params[0]["toBlock"], 16)
+        if end - start + 1 > self.max_blocks:
+            raise ValueError({"code": -32005, "message": "query returned more than 10000 results"})
+        return LOGS[start : end + 1]
+
+
+def backfill(node, **kwargs):
+    return asyncio.run(get_logs_backfill(node.request, {"topics": ["0x01"]}, 0, 999, retry_delay=0, **kwargs))
+
+
+def test_capped_ranges_are_split():
+    assert backfill(StandInNode(max_blocks=10)) == LOGS
+
+
+def test_range_grows_after_success():
+    node = StandInNode(max_blocks=1000)
+    assert backfill(node, chunk_size=100, concurrency=1) == LOGS
+    # 100, then 200, 400 and the last 300 blocks
+    assert node.requests == 4
+
+
+def test_transient_errors_are_retried():
+    node = StandInNode(max_blocks=1000, failures=2)
+    assert backfill(node, concurrency=1) == LOGS
+    assert node.requests == 3
+
+
+def test_persistent_errors_raise():
+    node = StandInNode(max_blocks=1000, failures=10, error=ConnectionError("websocket closed"))
+    with pytest.raises(ConnectionError):
+        backfill(node, concurrency=1, retries=2)
+    assert node.requests == 3
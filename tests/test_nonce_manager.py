@@ -0,0 +1,66 @@
+import pytest
+
+pytest.importorskip("brownie")
+
+import nonce_manager
+from nonce_manager import NonceManager
+
+
+class StandInAccount:
+    address = "0x00000000000000000000000000000000000000Bb"
+
+
+class StandInReceipt:
+    def __init__(self, status):
+        self.status = status
+        self.waited = None
+
+    def wait(self, required_confs):
+        self.waited = required_confs
+
+
+@pytest.fixture
+def web3(patch_web3):
+    web3 = patch_web3(nonce_manager)
+    web3.eth.pending = 7
+    return web3
+
+
+def test_nonces_are_consecutive(web3):
+    manager = NonceManager(StandInAccount())
+    sent = []
+    for _ in range(3):
+        manager.transact(lambda *args: sent.append(args), "arg")
+    assert [tx["nonce"] for _, tx in sent] == [7, 8, 9]
+    assert all(tx["required_confs"] == 0 for _, tx in sent)
+
+
+def test_transact_passes_gas_limit_and_tx_params(web3):
+    manager = NonceManager(StandInAccount())
+    tx = manager.transact(lambda tx: tx, gas_limit=50_000, tx_params={"priority_fee": 1})
+    assert tx["gas_limit"] == 50_000
+    assert tx["priority_fee"] == 1
+    assert tx["nonce"] == 7
+
+
+def test_failed_broadcast_resyncs(web3):
+    manager = NonceManager(StandInAccount())
+    manager.transact(lambda tx: tx)
+
+    def fail(tx):
+        raise ValueError("nonce too low")
+
+    # another sender used 8 and 9 in the meantime
+    web3.eth.pending = 10
+    with pytest.raises(ValueError):
+        manager.transact(fail)
+    assert manager.transact(lambda tx: tx)["nonce"] == 10
+
+
+def test_wait_returns_reverted_receipts_and_hashes(web3):
+    manager = NonceManager(StandInAccount())
+    mined, reverted = StandInReceipt(1), StandInReceipt(0)
+    web3.eth.statuses = {"0x01": 1, "0x02": 0}
+
+    assert manager.wait([mined, None, reverted, "0x01", "0x02"], required_confs=2) == [reverted, "0x02"]
+    assert mined.waited == reverted.waited == 2
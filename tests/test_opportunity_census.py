@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("brownie")
+
+from opportunity_census import census, census_pools, time_series
+from sync_history import MASK_64, RECORD_DTYPE, SyncHistory
+
+
+def make_records(rows):
+    """
+    (block, log index, reserve0, reserve1) rows as RECORD_DTYPE
+    """
+    records = np.zeros(len(rows), dtype=RECORD_DTYPE)
+    for i, (block, log_index, reserve0, reserve1) in enumerate(rows):
+        records[i] = (block, log_index, 0, reserve0 & MASK_64, reserve0 >> 64, reserve1 & MASK_64, reserve1 >> 64)
+    return records
+
+
+RESERVE = 10 ** 24
+
+
+def test_one_row_per_block_with_the_last_state():
+    records = make_records(
+        [
+            (10, 0, RESERVE, RESERVE),
+            # mispriced mid-block, back to fair by the end of it
+            (11, 0, RESERVE, 2 * RESERVE),
+            (11, 5, RESERVE, RESERVE),
+        ]
+    )
+    result = census(records, np.array([10]), np.array([1.0]))
+    assert list(result["block"]) == [10, 11]
+    assert np.allclose(result["profit"], 0)
+
+
+def test_price_change_blocks_are_included():
+    records = make_records([(10, 0, RESERVE, RESERVE)])
+    # the fair price moves at block 15 while the pool stays put
+    result = census(records, np.array([10, 15]), np.array([1.0, 1.2]))
+    assert list(result["block"]) == [10, 15]
+    assert result["profit"][0] == pytest.approx(0, abs=1)
+    assert result["profit"][1] > 0
+    # token0 is worth more than the pool pays for it, so token1 goes in
+    assert not result["token0_in"][1]
+
+
+def test_no_records_after_the_first_price():
+    records = make_records([(10, 0, RESERVE, RESERVE)])
+    result = census(make_records([]), np.array([20]), np.array([1.0]))
+    assert len(result["block"]) == 0
+    starts, counts, totals, maxima = time_series(result)
+    assert len(starts) == len(counts) == 0
+
+    result = census(records, np.zeros(0, dtype=np.int64), np.zeros(0))
+    assert len(result["block"]) == 0
+
+
+def test_pools_are_combined(tmp_path):
+    history = SyncHistory(str(tmp_path / "census.sync"))
+    logs = []
+    for address, reserve1 in (("0x" + "aa" * 20, RESERVE), ("0x" + "bb" * 20, 2 * RESERVE)):
+        logs.append(
+            {
+                "address": address,
+                "blockNumber": hex(10),
+                "logIndex": hex(len(logs)),
+                "data": "0x" + f"{RESERVE:064x}" + f"{reserve1:064x}",
+            }
+        )
+    history.append(logs, last_block=10)
+
+    prices = (np.array([10]), np.array([1.0]))
+    result = census_pools(history, {"0x" + "aa" * 20: prices, "0x" + "bb" * 20: prices})
+    assert list(result["pool"]) == [0, 1]
+    assert result["profit"][0] == pytest.approx(0, abs=1)
+    assert result["profit"][1] > 0
+    starts, counts, totals, maxima = time_series(result, min_profit=1.0)
+    assert list(counts) == [1]
@@ -0,0 +1,83 @@
+from decimal import Decimal
+from fractions import Fraction
+
+import pytest
+
+from pool_math import (
+    get_amount_in,
+    get_amount_out,
+    get_tokens_in_for_price_target,
+    get_tokens_in_for_ratio_out,
+    get_tokens_out_for_tokens_in,
+)
+
+X = 1_234_567 * 10 ** 18
+Y = 2_345_678 * 10 ** 18
+
+
+def uniswap_get_amount_out(amount_in, reserve_in, reserve_out):
+    # UniswapV2Library.getAmountOut
+    amount_in_with_fee = amount_in * 997
+    return amount_in_with_fee * reserve_out // (reserve_in * 1000 + amount_in_with_fee)
+
+
+def uniswap_get_amount_in(amount_out, reserve_in, reserve_out):
+    # UniswapV2Library.getAmountIn
+    return reserve_in * amount_out * 1000 // ((reserve_out - amount_out) * 997) + 1
+
+
+@pytest.mark.parametrize("amount", [1, 10 ** 6, 10 ** 18 + 7, 5_000 * 10 ** 18, X])
+def test_amounts_match_the_router(amount):
+    assert get_amount_out(amount, X, Y) == uniswap_get_amount_out(amount, X, Y)
+    assert get_amount_in(amount, X, Y) == uniswap_get_amount_in(amount, X, Y)
+
+
+def test_amount_in_is_the_smallest_input_for_the_output():
+    amount_out = 1_000 * 10 ** 18
+    amount_in = get_amount_in(amount_out, X, Y)
+    assert get_amount_out(amount_in, X, Y) >= amount_out
+    assert get_amount_out(amount_in - 2, X, Y) < amount_out
+
+
+def test_amount_in_rejects_the_whole_reserve():
+    with pytest.raises(AssertionError):
+        get_amount_in(Y, X, Y)
+
+
+def test_tokens_out_for_either_side():
+    assert get_tokens_out_for_tokens_in(X, Y, quantity_token0_in=10 ** 18) == get_amount_out(10 ** 18, X, Y)
+    assert get_tokens_out_for_tokens_in(X, Y, quantity_token1_in=10 ** 18) == get_amount_out(10 ** 18, Y, X)
+    with pytest.raises(AssertionError):
+        get_tokens_out_for_tokens_in(X, Y, quantity_token0_in=1, quantity_token1_in=1)
+
+
+@pytest.mark.parametrize("ratio", [Fraction(1, 2), Decimal("0.5"), 0.5])
+def test_ratio_target_is_the_largest_input_at_the_ratio(ratio):
+    # token1 in, token0 out: the pool pays ~0.526 token0 per token1, the target is 0.5
+    dy = get_tokens_in_for_ratio_out(X, Y, token0_out=True, token0_per_token1=ratio)
+    assert dy > 0
+    assert Fraction(get_amount_out(dy, Y, X), dy) >= Fraction(1, 2) * Fraction(999_999, 1_000_000)
+    assert Fraction(get_amount_out(dy * 101 // 100, Y, X), dy * 101 // 100) < Fraction(1, 2)
+
+
+def test_ratio_target_out_of_reach():
+    assert get_tokens_in_for_ratio_out(X, Y, token0_out=True, token0_per_token1=1) == 0
+    assert get_tokens_in_for_ratio_out(X, Y, token1_out=True, token0_per_token1=Fraction(1, 2)) == 0
+
+
+def test_price_target_maximizes_profit():
+    # the input token is worth 1.5 output tokens outside the pool, the pool pays ~1.9
+    price = Fraction(3, 2)
+    size = get_tokens_in_for_price_target(X, Y, price)
+
+    def profit(amount_in):
+        return get_amount_out(amount_in, X, Y) - price * amount_in
+
+    assert size > 0
+    assert profit(size) > 0
+    assert profit(size) >= profit(size * 99 // 100)
+    assert profit(size) >= profit(size * 101 // 100)
+
+
+def test_price_target_already_reached():
+    assert get_tokens_in_for_price_target(X, Y, 2) == 0
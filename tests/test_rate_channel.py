@@ -0,0 +1,73 @@
+import os
+import struct
+
+import pytest
+
+from rate_channel import RatePublisher, RateSubscriber
+
+
+@pytest.fixture
+def channel():
+    name = f"test_rate_{os.getpid()}"
+    yield name
+    publisher = RatePublisher(name)
+    publisher.unlink()
+    publisher.close()
+
+
+def test_poll_returns_each_rate_once(channel):
+    publisher = RatePublisher(channel)
+    subscriber = RateSubscriber(channel)
+    assert not subscriber.pending()
+    assert subscriber.poll() is None
+
+    publisher.publish(1.25)
+    assert subscriber.pending()
+    assert subscriber.poll() == 1.25
+    assert subscriber.poll() is None
+    subscriber.close()
+    publisher.close()
+
+
+def test_subscriber_survives_a_publisher_restart(channel):
+    publisher = RatePublisher(channel)
+    subscriber = RateSubscriber(channel)
+    publisher.publish(1.25)
+    assert subscriber.poll() == 1.25
+    publisher.close()
+
+    restarted = RatePublisher(channel)
+    restarted.publish(1.5)
+    assert subscriber.pending()
+    assert subscriber.poll() == 1.5
+    # the sequence continues, it never goes odd (mid-write) or back to 0
+    sequence, rate = subscriber.read()
+    assert sequence == 4 and rate == 1.5
+    subscriber.close()
+    restarted.close()
+
+
+def test_publisher_dying_mid_write(channel):
+    publisher = RatePublisher(channel)
+    subscriber = RateSubscriber(channel)
+    publisher.publish(1.25)
+    assert subscriber.poll() == 1.25
+
+    # the writer made the sequence number odd, then died
+    struct.pack_into("<Q", publisher._shm.buf, 0, 3)
+    publisher.close()
+    assert not subscriber.pending()
+    assert subscriber.poll() is None
+    with pytest.raises(TimeoutError):
+        subscriber.read()
+
+    restarted = RatePublisher(channel)
+    restarted.publish(1.5)
+    assert subscriber.poll() == 1.5
+    subscriber.close()
+    restarted.close()
+
+
+def test_subscriber_without_publisher(channel):
+    with pytest.raises(FileNotFoundError):
+        RateSubscriber(channel + "_missing")
@@ -0,0 +1,181 @@
+import pytest
+
+pytest.importorskip("brownie")
+
+import reserve_cache
+from reserve_cache import ReserveCache, ReserveJournal
+from sync_dispatch import SyncDispatcher
+
+ADDRESS = "0x00000000000000000000000000000000000000Aa"
+
+
+class StandInGetReserves:
+    def __init__(self, reserves):
+        self.reserves = reserves
+        self.calls = []
+
+    def call(self, block_identifier=None):
+        self.calls.append(block_identifier)
+        return (*self.reserves, 0)
+
+
+class StandInLp:
+    def __init__(self, reserves, address=ADDRESS):
+        self.address = address
+        self.getReserves = StandInGetReserves(reserves)
+
+
+@pytest.fixture(autouse=True)
+def chain(patch_chain):
+    chain = patch_chain(reserve_cache)
+    chain.height = 100
+    return chain
+
+
+def make_cache(reserves=(1000, 2000), address=ADDRESS):
+    return ReserveCache(StandInLp(reserves, address), sync_filter=False)
+
+
+def block_hash(block_number, fork=""):
+    return f"0x{fork}{block_number:x}"
+
+
+def sync_log(reserves, block_number, log_index=0, fork="", removed=False, address=ADDRESS):
+    return {
+        "address": address,
+        "blockNumber": hex(block_number),
+        "logIndex": hex(log_index),
+        "blockHash": block_hash(block_number, fork),
+        "data": "0x" + "".join(f"{reserve:064x}" for reserve in reserves),
+        "removed": removed,
+    }
+
+
+def test_seed_is_pinned_to_the_current_block():
+    cache = make_cache()
+    assert cache.reserves == (1000, 2000)
+    assert cache.position[0] == 100
+    assert cache._lp.getReserves.calls == [100]
+
+
+def test_apply_sync_ignores_logs_at_or_before_the_seed():
+    cache = make_cache()
+    assert not cache.apply_sync(1, 2, 100, 5)
+    assert cache.apply_sync(1100, 1900, 101, 0)
+    assert cache.state == (1100, 1900, (101, 0))
+    assert not cache.apply_sync(1, 2, 101, 0)
+    assert not cache.apply_sync(1100, 1900, 101, 3)
+    assert cache.position == (101, 3)
+
+
+def test_update_without_filter_reseeds():
+    cache = make_cache()
+    assert not cache.update()
+    cache._lp.getReserves.reserves = (900, 2100)
+    assert cache.update()
+    assert cache.reserves == (900, 2100)
+
+
+def test_journal_rollback_restores_the_state_before_each_block():
+    cache = make_cache()
+    journal = ReserveJournal(start_block=100)
+    seeded = cache.state
+    for block_number in (101, 102, 103):
+        journal.record(cache, block_number, block_hash(block_number))
+        cache.apply_sync(block_number, block_number, block_number, 0)
+        # a second Sync in the same block keeps the first undo entry
+        journal.record(cache, block_number, block_hash(block_number))
+        cache.apply_sync(block_number, block_number + 1, block_number, 1)
+    after_101 = (101, 102, (101, 1))
+
+    assert journal.latest_block == 103
+    assert journal.rollback(101) == {cache}
+    assert cache.state == after_101
+    assert journal.latest_block == 101
+    assert journal.rollback(100) == {cache}
+    assert cache.state == seeded
+    assert journal.rollback(100) == set()
+
+
+def test_journal_depth_sets_the_floor():
+    cache = make_cache()
+    journal = ReserveJournal(start_block=100, depth=2)
+    for block_number in (101, 102, 103):
+        journal.record(cache, block_number, block_hash(block_number))
+    assert journal.floor_block == 101
+    assert not journal.can_rollback(100)
+    assert journal.can_rollback(101)
+    journal.reset(110)
+    assert journal.latest_block is None
+    assert journal.floor_block == 110
+
+
+def test_find_common_ancestor():
+    cache = make_cache()
+    journal = ReserveJournal(start_block=100)
+    for block_number in (101, 102, 103):
+        journal.record(cache, block_number, block_hash(block_number))
+    canonical = {101: block_hash(101), 102: block_hash(102, "f"), 103: block_hash(103, "f")}
+    assert journal.find_common_ancestor(canonical.get) == 101
+    assert journal.find_common_ancestor(lambda block_number: None) is None
+
+
+def test_dispatcher_rolls_back_on_removed_logs():
+    cache = make_cache()
+    updated = []
+    dispatcher = SyncDispatcher(on_update=updated.append, journal=ReserveJournal(start_block=100))
+    dispatcher.add_pool(cache)
+
+    assert dispatcher.handle_log(sync_log((1100, 1900), 101))
+    assert dispatcher.handle_log(sync_log((1200, 1800), 102))
+    # the node reports block 102 left the canonical chain
+    assert not dispatcher.handle_log(sync_log((1200, 1800), 102, removed=True))
+    assert cache.state == (1100, 1900, (101, 0))
+    assert dispatcher.handle_log(sync_log((1300, 1700), 102, fork="f"))
+    assert cache.state == (1300, 1700, (102, 0))
+    assert updated == [cache] * 4
+
+
+def test_dispatcher_rolls_back_on_a_new_block_hash():
+    cache = make_cache()
+    dispatcher = SyncDispatcher(journal=ReserveJournal(start_block=100))
+    dispatcher.add_pool(cache)
+    dispatcher.handle_log(sync_log((1100, 1900), 101))
+    dispatcher.handle_log(sync_log((1200, 1800), 102, log_index=4))
+
+    # polling never sees removed logs, only a block 102 with another hash and an earlier log index
+    assert dispatcher.handle_log(sync_log((1300, 1700), 102, log_index=1, fork="f"))
+    assert cache.state == (1300, 1700, (102, 1))
+    assert dispatcher.journal.get_block_hash(102) == block_hash(102, "f")
+
+
+def test_dispatcher_recover_replays_after_the_ancestor():
+    cache = make_cache()
+    dispatcher = SyncDispatcher(journal=ReserveJournal(start_block=100))
+    dispatcher.add_pool(cache)
+    for block_number in (101, 102, 103):
+        dispatcher.handle_log(sync_log((block_number, block_number), block_number))
+
+    canonical = {101: block_hash(101), 102: block_hash(102, "f"), 103: block_hash(103, "f")}
+    replayed = []
+
+    def get_logs(from_block, to_block):
+        replayed.append(from_block)
+        return [sync_log((7, 7), 102, fork="f")]
+
+    dispatcher.recover(canonical.get, get_logs)
+    assert replayed == [102]
+    assert cache.state == (7, 7, (102, 0))
+
+
+def test_dispatcher_recover_reseeds_past_the_journal(chain):
+    cache = make_cache()
+    dispatcher = SyncDispatcher(journal=ReserveJournal(start_block=100))
+    dispatcher.add_pool(cache)
+    dispatcher.handle_log(sync_log((1100, 1900), 101))
+
+    chain.height = 120
+    cache._lp.getReserves.reserves = (5, 6)
+    dispatcher.recover(lambda block_number: None, lambda from_block, to_block: [])
+    assert cache.state == (5, 6, (120, 2 ** 32))
+    assert dispatcher.journal.floor_block == 120
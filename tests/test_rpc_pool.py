@@ -0,0 +1,92 @@
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("web3")
+
+import rpc_pool
+from rpc_pool import RpcPool
+
+ENDPOINTS = ["http://a", "http://b", "http://c"]
+
+
+class Reply:
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+
+class StandInSession:
+    """
+    Answers like a node: every node numbers its filters from 0x1, other calls return the node's url
+    """
+
+    def __init__(self, pool, url):
+        self.pool = pool
+        self.url = url
+
+    def post(self, url, json, timeout):
+        self.pool.posts.append((url, json["method"], json["params"]))
+        if url in self.pool.down:
+            raise ConnectionError("down")
+        result = "0x1" if json["method"] == "eth_newFilter" else [url]
+        return Reply({"jsonrpc": "2.0", "id": json["id"], "result": result})
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def pool():
+    pool = RpcPool(ENDPOINTS)
+    pool.posts = []
+    pool.down = set()
+    pool._sessions = {url: StandInSession(pool, url) for url in ENDPOINTS}
+    yield pool
+    pool.close()
+
+
+def test_filter_calls_stay_on_the_creating_endpoint(pool, monkeypatch):
+    monkeypatch.setattr(pool, "ranked_endpoints", lambda: ["http://a", "http://b", "http://c"])
+    first = pool.request("eth_newFilter", [{"address": "0x1"}])["result"]
+    monkeypatch.setattr(pool, "ranked_endpoints", lambda: ["http://b", "http://a", "http://c"])
+    second = pool.request("eth_newFilter", [{"address": "0x2"}])["result"]
+    # both nodes answered 0x1, the pool ids differ
+    assert first != second
+
+    assert pool.request("eth_getFilterChanges", [first])["result"] == ["http://a"]
+    assert pool.request("eth_getFilterChanges", [second])["result"] == ["http://b"]
+    assert ("http://a", "eth_getFilterChanges", ["0x1"]) in pool.posts
+
+    pool.request("eth_uninstallFilter", [first])
+    assert "error" in pool.request("eth_getFilterChanges", [first])
+
+
+def test_filter_calls_do_not_fail_over(pool, monkeypatch):
+    monkeypatch.setattr(pool, "ranked_endpoints", lambda: list(ENDPOINTS))
+    filter_id = pool.request("eth_newFilter", [{}])["result"]
+    pool.down.add("http://a")
+    with pytest.raises(ConnectionError):
+        pool.request("eth_getFilterChanges", [filter_id])
+    assert [url for url, method, _ in pool.posts if method == "eth_getFilterChanges"] == ["http://a"]
+
+
+def test_reads_fail_over_and_eject(pool, monkeypatch):
+    monkeypatch.setattr(rpc_pool, "EJECT_ERRORS", 2)
+    pool.down.add("http://a")
+    # a ranks first until it is ejected
+    pool.stats["http://b"].record(1.0)
+    pool.stats["http://c"].record(1.0)
+    for _ in range(3):
+        assert pool.request("eth_blockNumber", [])["result"] != ["http://a"]
+    assert "http://a" not in pool.ranked_endpoints()
+    assert [url for url, _, _ in pool.posts].count("http://a") == 2
+
+
+def test_filter_methods_are_never_hedged():
+    for method in rpc_pool.FILTER_CREATE_METHODS | rpc_pool.FILTER_METHODS:
+        assert method in rpc_pool.NO_HEDGE_METHODS
@@ -0,0 +1,45 @@
+import pytest
+
+pytest.importorskip("brownie")
+pytest.importorskip("eth_account")
+eth_abi = pytest.importorskip("eth_abi")
+# eth_abi 2.x (brownie's pin) calls it encode_abi
+abi_encode = getattr(eth_abi, "encode", None) or eth_abi.encode_abi
+
+import swap_templates
+from swap_templates import SwapTemplate
+
+ROUTER = "0x60aE616a2155Ee3d9A68541Ba4544862310933d4"
+PATH = ["0xCE1bFFBD5374Dac86a2893119683F4911a2F7814", "0x3Ee97d514BBef95a2f110e6B9b73824719030f7a"]
+# a throwaway key, never funded
+PRIVATE_KEY = "0x" + "11" * 32
+
+
+class StandInAccount:
+    address = "0x19E7E376E7C213B7E7e7e46cc70A5dD086DAff2A"
+    private_key = PRIVATE_KEY
+
+
+@pytest.fixture
+def template(patch_web3):
+    web3 = patch_web3(swap_templates)
+    web3.toChecksumAddress = lambda address: address
+    web3.eth.chain_id = 43114
+    web3.eth.get_block = lambda block_identifier: {"baseFeePerGas": 25 * 10 ** 9}
+    return SwapTemplate(ROUTER, PATH, StandInAccount(), nonce_manager=None, priority_fee=5 * 10 ** 9)
+
+
+def test_calldata_matches_the_abi_encoding(template):
+    amount_in, amount_out_min, deadline = 10 ** 22 + 1, 2 ** 112 - 1, 1_700_000_000
+    expected = bytes.fromhex("38ed1739") + abi_encode(
+        ["uint256", "uint256", "address[]", "address", "uint256"],
+        [amount_in, amount_out_min, PATH, StandInAccount.address, deadline],
+    )
+    assert template.encode(amount_in, amount_out_min, deadline) == expected
+
+
+def test_fees_follow_the_base_fee(template):
+    assert template._tx["maxPriorityFeePerGas"] == 5 * 10 ** 9
+    assert template._tx["maxFeePerGas"] == 55 * 10 ** 9
+    template.refresh(base_fee=10 * 10 ** 9)
+    assert template._tx["maxFeePerGas"] == 25 * 10 ** 9
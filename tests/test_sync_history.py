@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("brownie")
+
+from sync_history import RECORD_DTYPE, SyncHistory, reserve_float, reserve_int
+
+POOL_A = "0x00000000000000000000000000000000000000aa"
+POOL_B = "0x00000000000000000000000000000000000000bb"
+
+
+def sync_log(address, block, log_index, reserve0, reserve1):
+    return {
+        "address": address,
+        "blockNumber": hex(block),
+        "logIndex": hex(log_index),
+        "data": "0x" + f"{reserve0:064x}" + f"{reserve1:064x}",
+    }
+
+
+@pytest.fixture
+def filename(tmp_path):
+    return str(tmp_path / "test.sync")
+
+
+def test_reserves_round_trip(filename):
+    # uint112 reserves do not fit a uint64
+    reserve0, reserve1 = 2 ** 111 + 12345, 10 ** 24
+    history = SyncHistory(filename)
+    history.append([sync_log(POOL_A, 10, 0, reserve0, reserve1)], last_block=10)
+
+    record = SyncHistory(filename).pool_records(POOL_A)[0]
+    assert reserve_int(record, 0) == reserve0
+    assert reserve_int(record, 1) == reserve1
+    assert reserve_float(np.array([record]), 1)[0] == pytest.approx(1e24)
+
+
+def test_pool_records_are_a_shared_memmap(filename):
+    history = SyncHistory(filename)
+    history.append(
+        [
+            sync_log(POOL_A, 10, 0, 1, 2),
+            sync_log(POOL_B, 10, 1, 3, 4),
+            sync_log(POOL_A, 11, 0, 5, 6),
+        ],
+        last_block=11,
+    )
+    history = SyncHistory(filename)
+    records = history.pool_records(POOL_A)
+    assert isinstance(records, np.memmap)
+    assert list(records["block"]) == [10, 11]
+    assert list(history.pool_records(POOL_B)["block"]) == [10]
+    # merged in chain order
+    assert [(int(r["block"]), int(r["log_index"])) for r in history.records()] == [(10, 0), (10, 1), (11, 0)]
+    assert len(history) == 3
+
+
+def test_unfinished_append_is_truncated(filename):
+    history = SyncHistory(filename)
+    history.append([sync_log(POOL_A, 10, 0, 1, 2), sync_log(POOL_B, 10, 1, 3, 4)], last_block=10)
+
+    # a crash after writing the records of the next window, before the sidecar was saved
+    for pool in range(2):
+        records = np.zeros(2, dtype=RECORD_DTYPE)
+        records["block"] = [20, 21]
+        with open(history.pool_filename(pool), "ab") as file:
+            file.write(records.tobytes())
+
+    history = SyncHistory(filename)
+    assert history.last_block == 10
+    assert len(history) == 2
+    assert list(history.pool_records(POOL_A)["block"]) == [10]
+
+
+def test_unlisted_pool_files_are_removed(filename):
+    history = SyncHistory(filename)
+    history.append([sync_log(POOL_A, 10, 0, 1, 2)], last_block=10)
+
+    # a crash after writing the file of a new pool, before the sidecar listed it
+    records = np.zeros(1, dtype=RECORD_DTYPE)
+    records["block"] = 20
+    with open(history.pool_filename(1), "wb") as file:
+        file.write(records.tobytes())
+
+    history = SyncHistory(filename)
+    history.append([sync_log(POOL_B, 20, 0, 3, 4)], last_block=20)
+    assert list(history.pool_records(POOL_B)["block"]) == [20]
+    assert len(history) == 2
+
+
+def test_empty_history(filename):
+    history = SyncHistory(filename)
+    assert len(history) == 0
+    assert history.last_block is None
+    assert len(history.records()) == 0
@@ -0,0 +1,54 @@
+import pytest
+
+from token_graph import TokenGraph
+
+RESERVE = 10 ** 24
+
+
+def make_triangle(graph):
+    # A, B and C all worth the same, every pool priced fairly
+    for pool, token0, token1 in (("AB", "A", "B"), ("BC", "B", "C"), ("CA", "C", "A")):
+        assert graph.update_pool(pool, token0, token1, RESERVE, RESERVE) is None
+
+
+def test_fair_pools_have_no_cycle():
+    graph = TokenGraph()
+    make_triangle(graph)
+    assert graph.find_cycle() is None
+    assert sorted(graph.tokens) == ["A", "B", "C"]
+
+
+def test_cycle_is_found_then_cleared_after_rebalancing(monkeypatch):
+    graph = TokenGraph()
+    make_triangle(graph)
+
+    # B is 10% cheaper in the AB pool: A -> B -> C -> A returns more A
+    edges, profit = graph.update_pool("AB", "A", "B", RESERVE, 11 * RESERVE // 10)
+    assert [(token_in, token_out) for _, token_in, token_out in edges] in (
+        [("A", "B"), ("B", "C"), ("C", "A")],
+        [("B", "C"), ("C", "A"), ("A", "B")],
+        [("C", "A"), ("A", "B"), ("B", "C")],
+    )
+    assert profit == pytest.approx(1.1 * 0.997 ** 3)
+
+    # the open cycle is re-checked from the updated edges only, never with a full search
+    monkeypatch.setattr(graph, "find_cycle", lambda: pytest.fail("full search"))
+    assert graph.update_pool("DE", "D", "E", RESERVE, RESERVE) is not None
+
+    # the arbitrage rebalanced the pool
+    assert graph.update_pool("AB", "A", "B", RESERVE, RESERVE) is None
+    assert graph.update_pool("BC", "B", "C", RESERVE, 2 * RESERVE) is not None
+
+
+def test_small_mispricing_is_eaten_by_the_fee():
+    graph = TokenGraph()
+    make_triangle(graph)
+    # 0.5% is less than three 0.3% fees
+    assert graph.update_pool("AB", "A", "B", RESERVE, 1005 * RESERVE // 1000) is None
+
+
+def test_empty_pool_is_not_traded_through():
+    graph = TokenGraph()
+    make_triangle(graph)
+    graph.update_pool("CA", "C", "A", 0, 0)
+    assert graph.update_pool("AB", "A", "B", RESERVE, 2 * RESERVE) is None
@@ -0,0 +1,212 @@
+"""
+Token Graph (negative cycle arbitrage detector)
+
+- tokens are nodes, every pool adds two directed edges (token0 -> token1 and token1 -> token0)
+- edge weight = -log(marginal rate after fee), so a cycle of swaps that returns more tokens
+  than it started with is a cycle whose weights sum to less than zero (a "negative cycle")
+- Bellman-Ford / SPFA finds negative cycles, but re-running it over the whole graph for every Sync is wasteful
+
+Incremental updates:
+- the graph keeps a distance ("potential") for every token from a virtual source connected to all tokens
+- while there is no negative cycle, every edge satisfies distance[out] <= distance[in] + weight
+- a pool update that INCREASES an edge weight can never break that, so nothing needs to be re-checked
+- a pool update that DECREASES an edge weight is relaxed, and SPFA continues only from the tokens it touched,
+  so the cost of an update is proportional to the affected neighbourhood, not the whole graph
+- any new negative cycle must contain one of the updated edges, so it is found by that local search
+- a found cycle leaves the potentials half-relaxed, so the graph keeps the potentials of the last update without
+  a cycle, plus every edge that got cheaper since: the next update restores those potentials and re-checks only
+  those edges, until the cycle is gone (e.g. the pool was rebalanced) and the potentials are valid again
+
+NOTE: the marginal rate ignores price impact, a cycle found here is a candidate, size it with pool_math.py
+
+Usage:
+
+>>> graph = TokenGraph()
+>>> for lp in pools:
+...     graph.update_pool(lp.address, lp.token0, lp.token1, *lp.reserves)
+>>> if cycle := graph.update_pool(lp.address, lp.token0, lp.token1, reserve0, reserve1):
+...     edges, profit = cycle
+"""
+
+from collections import deque
+from fractions import Fraction
+from math import exp, log
+
+from pool_math import DEFAULT_FEE
+
+# ignore relaxations smaller than this, so float rounding cannot cycle forever
+EPSILON = 1e-12
+
+
+class TokenGraph:
+    """
+    Directed graph of tokens and pools, weighted by -log(marginal rate).
+    update_pool() returns a (edges, profit) tuple if the update created a profitable cycle, None otherwise.
+    Each edge is a (pool, token_in, token_out) tuple, profit is the product of the marginal rates (> 1.0).
+    """
+
+    def __init__(self) -> None:
+        # token -> list of edges leaving the token
+        self._edges_out = {}
+        # (pool, token_in, token_out) -> weight
+        self._weights = {}
+        # token -> potential, see module notes
+        self._distance = {}
+        # set after a negative cycle is found, the potentials are no longer valid
+        self._stale = False
+        # while stale: the potentials before the cycle (None after find_cycle()), and the edges that got cheaper since
+        self._valid_distance = None
+        self._dirty = set()
+
+    @property
+    def tokens(self):
+        return list(self._distance)
+
+    def _add_token(self, token) -> None:
+        if token not in self._distance:
+            self._distance[token] = 0.0
+            self._edges_out[token] = []
+
+    def update_pool(
+        self,
+        pool,
+        token0,
+        token1,
+        reserve0: int,
+        reserve1: int,
+        fee: Fraction = DEFAULT_FEE,
+    ):
+        """
+        Set the two edges of a pool from its reserves and search for a negative cycle through them.
+        """
+        self._add_token(token0)
+        self._add_token(token1)
+
+        fee_multiplier = 1 - float(fee)
+        if not (reserve0 and reserve1):
+            # an empty pool cannot be traded through
+            weights = {(pool, token0, token1): None, (pool, token1, token0): None}
+        else:
+            weights = {
+                (pool, token0, token1): -log(fee_multiplier * reserve1 / reserve0),
+                (pool, token1, token0): -log(fee_multiplier * reserve0 / reserve1),
+            }
+
+        decreased = []
+        for edge, weight in weights.items():
+            old_weight = self._weights.get(edge)
+            if weight is None:
+                if edge in self._weights:
+                    del self._weights[edge]
+                    self._edges_out[edge[1]].remove(edge)
+                continue
+            if old_weight is None:
+                self._edges_out[edge[1]].append(edge)
+            self._weights[edge] = weight
+            if old_weight is None or weight < old_weight:
+                decreased.append(edge)
+
+        if self._stale:
+            if self._valid_distance is None:
+                return self.find_cycle()
+            # every edge that did not get cheaper since still satisfies the potentials from before the cycle
+            self._dirty.update(decreased)
+            self._distance = {token: self._valid_distance.get(token, 0.0) for token in self._distance}
+            self._stale = False
+            decreased = self._dirty
+
+        valid_distance = dict(self._distance)
+        if cycle := self._relax(decreased):
+            self._valid_distance = valid_distance
+            self._dirty = set(decreased)
+            return cycle
+        self._valid_distance = None
+        self._dirty = set()
+        return None
+
+    def _relax(self, edges):
+        """
+        Relax only the given edges (the ones that got cheaper), then continue from the tokens they touched
+        """
+        queue = deque()
+        pred = {}
+        length = {}
+        for edge in edges:
+            # removed since (an emptied pool)
+            if edge not in self._weights:
+                continue
+            _, token_in, token_out = edge
+            if (
+                self._distance[token_in] + self._weights[edge]
+                < self._distance[token_out] - EPSILON
+            ):
+                self._distance[token_out] = self._distance[token_in] + self._weights[edge]
+                pred[token_out] = edge
+                length[token_out] = 1
+                queue.append(token_out)
+
+        return self._search(queue, pred, length)
+
+    def find_cycle(self):
+        """
+        Full SPFA over every token, used at startup and after a cycle invalidated the potentials.
+        """
+        for token in self._distance:
+            self._distance[token] = 0.0
+        self._stale = False
+        # no valid potentials to go back to, a cycle found here is re-checked with another full search
+        self._valid_distance = None
+        self._dirty = set()
+        return self._search(deque(self._distance), {}, {})
+
+    def _search(self, queue, pred, length):
+        """
+        SPFA from the queued tokens. A path of at least len(tokens) edges means a negative cycle.
+        """
+        queued = set(queue)
+        token_count = len(self._distance)
+
+        while queue:
+            token_in = queue.popleft()
+            queued.discard(token_in)
+            for edge in self._edges_out[token_in]:
+                token_out = edge[2]
+                distance = self._distance[token_in] + self._weights[edge]
+                if distance < self._distance[token_out] - EPSILON:
+                    self._distance[token_out] = distance
+                    pred[token_out] = edge
+                    length[token_out] = length.get(token_in, 0) + 1
+                    if length[token_out] >= token_count:
+                        if cycle := self._extract_cycle(token_out, pred):
+                            self._stale = True
+                            return cycle
+                    if token_out not in queued:
+                        queue.append(token_out)
+                        queued.add(token_out)
+        return None
+
+    def _extract_cycle(self, token, pred):
+        """
+        Walk the predecessor edges back from token until a token repeats.
+        """
+        seen = set()
+        while token not in seen:
+            if token not in pred:
+                return None
+            seen.add(token)
+            token = pred[token][1]
+
+        edges = []
+        start = token
+        while True:
+            edge = pred[token]
+            edges.append(edge)
+            token = edge[1]
+            if token == start:
+                break
+        edges.reverse()
+
+        total_weight = sum(self._weights[edge] for edge in edges)
+        if total_weight >= -EPSILON:
+            return None
+        return edges, exp(-total_weight)